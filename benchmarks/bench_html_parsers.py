@@ -0,0 +1,73 @@
+"""Benchmark parse and extract time of each html parser backend on the
+fixtures in tests/html.
+
+Run from the repo root: python -m benchmarks.bench_html_parsers
+"""
+import time
+from typing import Callable
+
+from src.transformer import Transformer
+from src.input_html_extractor import InputHtmlExtractor
+from src.common.html_parser import get_available_parsers, parse_html
+
+NUM_ROUNDS = 5
+LIST_PAGE_FILE = 'tests/html/property_list_page.html'
+DETAIL_PAGE_FILE = 'tests/html/single_property_page.html'
+
+
+def read_bytes(file_name: str) -> bytes:
+    with open(file_name, 'rb') as file:
+        return file.read()
+
+
+def best_of(fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(NUM_ROUNDS):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def extract_list_page(transformer: Transformer) -> None:
+    for card in transformer.get_all_properties():
+        transformer.get_address(card)
+        transformer.get_price(card)
+        transformer.get_property_id(card)
+        transformer.get_move_in_date(card)
+        transformer.get_property_images(card)
+        transformer.get_agency_logo(card)
+        transformer.get_agency_property_listings_url(card)
+
+
+def extract_detail_page(transformer: Transformer, page) -> None:
+    transformer.get_listing_title(page)
+    transformer.get_listing_description(page)
+    transformer.get_num_bedrooms(page)
+    transformer.get_num_bathrooms(page)
+    transformer.get_num_garages(page)
+    transformer.get_property_features(page)
+    transformer.get_google_maps_location_url(page)
+    transformer.get_gps_coordinates(page)
+    transformer.get_suburb(page)
+    transformer.get_state_and_territory(page)
+    transformer.get_postcode(page)
+    transformer.get_agent_name(page)
+    transformer.get_off_market_status(page)
+
+
+if __name__ == "__main__":
+    list_page = read_bytes(LIST_PAGE_FILE)
+    detail_page = read_bytes(DETAIL_PAGE_FILE)
+    print("{0:<12} {1:>14} {2:>16} {3:>16} {4:>18}".format(
+        'backend', 'parse list ms', 'extract list ms', 'parse detail ms', 'extract detail ms'))
+    for backend in get_available_parsers():
+        list_html = parse_html(list_page, backend)
+        detail_html = parse_html(detail_page, backend)
+        transformer = Transformer(InputHtmlExtractor(list_html))
+        print("{0:<12} {1:>14.2f} {2:>16.2f} {3:>16.2f} {4:>18.2f}".format(
+            backend,
+            best_of(lambda: parse_html(list_page, backend)) * 1000,
+            best_of(lambda: extract_list_page(transformer)) * 1000,
+            best_of(lambda: parse_html(detail_page, backend)) * 1000,
+            best_of(lambda: extract_detail_page(transformer, detail_html)) * 1000))
@@ -0,0 +1,100 @@
+"""Memory per listing and conversion cost at 100k rows: the slotted
+PropertyListing and the columnar PropertyBatch against the listing class as it
+was before (a dataclass with a __dict__) and its vars() dicts.
+
+Run from the repo root: python -m benchmarks.bench_property_batch
+"""
+import time
+import dataclasses
+import tracemalloc
+from typing import Any, Callable, List
+
+import pandas as pd
+
+from src.property_dataclass import PropertyBatch, PropertyListing
+
+NUM_ROWS = 100000
+
+# PropertyListing before it had slots
+DictPropertyListing = dataclasses.make_dataclass(
+    'DictPropertyListing',
+    [(field.name, field.type) for field in dataclasses.fields(PropertyListing)],
+    init=False)
+
+
+def fill(listing: Any, index: int) -> Any:
+    # Values shaped like a crawled listing, each row with its own strings
+    for field in dataclasses.fields(PropertyListing):
+        if field.type is bool:
+            value = index % 2 == 0
+        elif field.type is str:
+            value = "{0} {1}".format(field.name, index)
+        else:
+            value = ["{0} {1} {2}".format(field.name, index, i) for i in range(3)]
+        setattr(listing, field.name, value)
+    return listing
+
+
+def fill_shared(listing: Any, index: int) -> Any:
+    # Every row points at the same values, so only the per row overhead is measured
+    for field in dataclasses.fields(PropertyListing):
+        setattr(listing, field.name, field.name)
+    return listing
+
+
+def to_bulk_params(listings: List[Any]) -> List[dict]:
+    # What save_bulk did before PropertyBatch
+    rows = [vars(listing) for listing in listings]
+    columns = {key for row in rows for key in row}
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def measure(name: str, build: Callable[[], Any]) -> Any:
+    """Print time and memory taken by build, and give back what it built"""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start_time
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0:<40} {1:>10.3f} s {2:>12.1f} MB {3:>10.0f} bytes/row".format(
+        name, seconds, size / 1024 / 1024, size / NUM_ROWS))
+    return result
+
+
+def best_time(name: str, fn: Callable[[], Any], rounds: int = 3) -> None:
+    timings = []
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start_time)
+    print("{0:<40} {1:>10.3f} s".format(name, min(timings)))
+
+
+if __name__ == "__main__":
+    print("Building {0} listings\n".format(NUM_ROWS))
+    dict_listings: List[Any] = measure(
+        "dataclass with __dict__", lambda: [fill(DictPropertyListing(), i) for i in range(NUM_ROWS)])
+    slotted_listings: List[PropertyListing] = measure(
+        "slotted PropertyListing", lambda: [fill(PropertyListing(), i) for i in range(NUM_ROWS)])
+    # Only the batch is kept, like the crawler's write buffer once a listing is appended
+    batch: PropertyBatch = measure(
+        "PropertyBatch", lambda: PropertyBatch.from_listings(fill(PropertyListing(), i) for i in range(NUM_ROWS)))
+
+    print("\nOverhead per row, values shared by every row\n")
+    measure("dataclass with __dict__", lambda: [fill_shared(DictPropertyListing(), i) for i in range(NUM_ROWS)])
+    measure("slotted PropertyListing", lambda: [fill_shared(PropertyListing(), i) for i in range(NUM_ROWS)])
+    measure("PropertyBatch", lambda: PropertyBatch.from_listings(
+        fill_shared(PropertyListing(), i) for i in range(NUM_ROWS)))
+
+    print("\nConverting {0} listings\n".format(NUM_ROWS))
+    # vars() hands back the instance's own __dict__, nothing is copied
+    best_time("vars() (before)", lambda: [vars(listing) for listing in dict_listings])
+    best_time("to_dict()", lambda: [listing.to_dict() for listing in slotted_listings])
+    best_time("PropertyBatch.from_listings", lambda: PropertyBatch.from_listings(slotted_listings))
+    best_time("save_bulk params from vars() (before)", lambda: to_bulk_params(dict_listings))
+    best_time("PropertyBatch.to_db_params", batch.to_db_params)
+    best_time("pandas from vars() dicts (before)",
+              lambda: pd.DataFrame([vars(listing) for listing in dict_listings]))
+    best_time("PropertyBatch.to_pandas", batch.to_pandas)
+    best_time("PropertyBatch.to_arrow", batch.to_arrow)
@@ -0,0 +1,295 @@
+"""Benchmark suite over the html fixtures in tests/html, with JSON baselines.
+
+Times parsing each fixture, Transformer.get_all_properties, every field getter
+on its own, collect_info_from_list_page / collect_info_from_detail_page, and
+an end-to-end run of TenantAppCrawler against mocked HTTP and an in-memory
+SQLite DB. Each case reports the median of its rounds.
+
+Run from the repo root:
+    python -m benchmarks.bench_suite                    # compare with the baseline
+    python -m benchmarks.bench_suite --update-baseline  # save the results as the new baseline
+
+Exits with 1 if a case got slower than its baseline by more than --threshold.
+Baselines are only comparable on the same machine and html parser, so
+regenerate the baseline before comparing on a new one.
+"""
+import io
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import platform
+import datetime
+import statistics
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from unittest import mock
+
+import requests
+from bs4 import BeautifulSoup
+from sqlalchemy import Boolean, Column, JSON, MetaData, Table, Text, create_engine
+from sqlalchemy.pool import StaticPool
+
+from src.common.html_parser import get_default_parser, parse_html, set_default_parser
+from src.common.rate_limiter import AimdRateLimiter
+from src.input_html_extractor import InputHtmlExtractor
+from src.property_database import PropertyDatabase
+from src.property_dataclass import PropertyListing
+from src.tenantapp_crawler import DEFAULT_WRITE_BATCH_SIZE, TenantAppCrawler
+from src.transformer import Transformer
+
+DEFAULT_ROUNDS = 15
+DEFAULT_THRESHOLD = 0.2  # 20% slower than the baseline is a regression
+# Cases this much slower or less are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.0002
+DEFAULT_BASELINE_FILE = 'benchmarks/baseline.json'
+END_TO_END_CONCURRENCY = 4
+
+LIST_PAGE_FILE = 'tests/html/property_list_page.html'
+DETAIL_PAGE_FILE = 'tests/html/single_property_page.html'
+AGENCY_PAGE_FILE = 'tests/html/agency_listings.html'
+
+LIST_PAGE_FIELDS = ('get_address', 'get_price', 'get_agency_property_listings_url', 'get_agency_logo',
+                    'get_property_images', 'get_property_url', 'get_property_id', 'get_move_in_date')
+DETAIL_PAGE_FIELDS = ('get_listing_title', 'get_listing_description', 'get_num_bedrooms', 'get_num_bathrooms',
+                      'get_num_garages', 'get_property_features', 'get_google_maps_location_url',
+                      'get_gps_coordinates', 'get_suburb', 'get_state_and_territory', 'get_postcode',
+                      'get_agent_name', 'get_off_market_status')
+
+
+def read_bytes(file_name: str) -> bytes:
+    with open(file_name, 'rb') as file:
+        return file.read()
+
+
+@contextlib.contextmanager
+def quiet() -> Iterator[None]:
+    """Hide the crawler's prints and logs, e.g the fixtures have no agency details"""
+    logging.disable(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def time_case(fn: Callable[[], Any], rounds: int, setup: Callable[[], Any] = None) -> float:
+    """Median seconds of fn over the rounds, after one warm up call
+
+    Args:
+        fn (Callable[[], Any]): code being timed, given the result of setup if there is one
+        rounds (int): number of timed calls
+        setup (Callable[[], Any], optional): untimed preparation run before each call. Defaults to None.
+
+    Returns:
+        float: median seconds of one call
+    """
+    timings = []
+    for i in range(rounds + 1):
+        args = (setup(),) if setup is not None else ()
+        start_time = time.perf_counter()
+        fn(*args)
+        if i > 0:
+            timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+
+class InMemoryPropertyDatabase(PropertyDatabase):
+    """PropertyDatabase on an in-memory SQLite DB, with the columns of
+    PropertyListing, so the crawler's queries and inserts really run
+    """
+
+    def create_db_engine(self):
+        # One connection shared by the fetcher's threads, or each would get its own empty DB
+        return create_engine('sqlite://',
+                             connect_args={'check_same_thread': False},
+                             poolclass=StaticPool)
+
+    def get_real_estate_table(self) -> Table:
+        self.metadata = MetaData()
+        column_types = {bool: Boolean, str: Text}
+        table = Table('propertylistings', self.metadata,
+                      *[Column(field.name, column_types.get(field.type, JSON))
+                        for field in PropertyListing.__dataclass_fields__.values()])
+        self.metadata.create_all(self.dbEngine)
+        return table
+
+
+def mock_response(url: str, content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response._content = content
+    response.elapsed = datetime.timedelta(0)
+    return response
+
+
+def run_end_to_end(list_page: bytes, detail_page: bytes) -> int:
+    """Crawl VIC with every page served from the fixtures and the listings
+    saved to an in-memory DB
+
+    Args:
+        list_page (bytes): served for every list page
+        detail_page (bytes): served for every detail page
+
+    Returns:
+        int: number of listings saved
+    """
+    def get(url: str, **kwargs) -> requests.Response:
+        return mock_response(url, detail_page if '/ViewListing/' in url else list_page)
+
+    database = InMemoryPropertyDatabase()
+    with mock.patch('src.common.http_client.requests.get', side_effect=get), \
+            quiet():
+        crawler = TenantAppCrawler(db=database,
+                                   concurrency=END_TO_END_CONCURRENCY,
+                                   write_batch_size=DEFAULT_WRITE_BATCH_SIZE)
+        # Only the crawler's own work is timed, not the politeness delays
+        crawler.fetcher.per_host_delay = 0
+        crawler.http_client.rate_limiter = crawler.fetcher.rate_limiter = AimdRateLimiter(
+            initial_rate=10 ** 6, max_rate=10 ** 6)
+        crawler.http_client.cache = None
+        if not crawler.run('vic-rental-properties'):
+            raise RuntimeError("End-to-end crawl failed")
+    return len(database.select_all())
+
+
+def get_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    list_page = read_bytes(LIST_PAGE_FILE)
+    detail_page = read_bytes(DETAIL_PAGE_FILE)
+    agency_page = read_bytes(AGENCY_PAGE_FILE)
+
+    list_html: BeautifulSoup = parse_html(list_page)
+    detail_html: BeautifulSoup = parse_html(detail_page)
+    transformer = Transformer(InputHtmlExtractor(list_html))
+    cards = transformer.get_all_properties()
+
+    with quiet():
+        crawler = TenantAppCrawler(db=None)
+        listing = crawler.collect_info_from_list_page(transformer, cards[0])
+
+    def collect_info_from_detail_page() -> None:
+        with quiet():
+            crawler.collect_info_from_detail_page(
+                transformer, detail_html, copy.copy(listing))
+
+    cases = [
+        ('parse.list_page', lambda: parse_html(list_page)),
+        ('parse.detail_page', lambda: parse_html(detail_page)),
+        ('parse.agency_page', lambda: parse_html(agency_page)),
+        ('transformer.get_all_properties', transformer.get_all_properties),
+    ]
+    # Each getter over every card of the list page
+    cases += [('extract.list.{0}'.format(name),
+               lambda getter=getattr(transformer, name): [getter(card) for card in cards])
+              for name in LIST_PAGE_FIELDS]
+    cases += [('extract.detail.{0}'.format(name),
+               lambda getter=getattr(transformer, name): getter(detail_html))
+              for name in DETAIL_PAGE_FIELDS]
+    cases += [
+        ('crawler.collect_info_from_list_page',
+         lambda: [crawler.collect_info_from_list_page(transformer, card) for card in cards]),
+        ('crawler.collect_info_from_detail_page', collect_info_from_detail_page),
+        ('end_to_end.tenantapp_crawler', lambda: run_end_to_end(list_page, detail_page)),
+    ]
+    return cases
+
+
+def run_suite(rounds: int = DEFAULT_ROUNDS, case_filter: str = None) -> Dict[str, Any]:
+    """Time every case of the suite
+
+    Args:
+        rounds (int, optional): timed calls of each case. Defaults to DEFAULT_ROUNDS.
+        case_filter (str, optional): only run cases whose name contains this. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: environment of the run and median seconds of each case
+    """
+    results: Dict[str, float] = {}
+    for name, fn in get_cases():
+        if case_filter is not None and case_filter not in name:
+            continue
+        results[name] = time_case(fn, rounds)
+        print("{0:<48} {1:>10.3f} ms".format(name, results[name] * 1000))
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'parser': get_default_parser(),
+        'rounds': rounds,
+        'cases': results,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any],
+                        baseline: Dict[str, Any],
+                        threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Print how each case moved since the baseline
+
+    Args:
+        results (Dict[str, Any]): output of run_suite
+        baseline (Dict[str, Any]): output of an earlier run_suite
+        threshold (float, optional): relative slowdown counted as a regression. Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        List[str]: names of the cases that regressed
+    """
+    if baseline.get('parser') != results.get('parser'):
+        print("Warning: baseline was made with the {0} parser, this run used {1}".format(
+            baseline.get('parser'), results.get('parser')))
+    regressions = []
+    print("\n{0:<48} {1:>12} {2:>12} {3:>9}".format('case', 'baseline ms', 'current ms', 'change'))
+    for name, seconds in results['cases'].items():
+        baseline_seconds = baseline['cases'].get(name)
+        if baseline_seconds is None:
+            print("{0:<48} {1:>12} {2:>12.3f} {3:>9}".format(name, '-', seconds * 1000, 'new'))
+            continue
+        change = seconds / baseline_seconds - 1 if baseline_seconds > 0 else 0.0
+        regressed = change > threshold and seconds - baseline_seconds > MIN_REGRESSION_SECONDS
+        if regressed:
+            regressions.append(name)
+        print("{0:<48} {1:>12.3f} {2:>12.3f} {3:>+8.1%}{4}".format(
+            name, baseline_seconds * 1000, seconds * 1000, change, ' REGRESSION' if regressed else ''))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing, extraction and an end-to-end crawl on the html fixtures")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS,
+                        help="Timed calls of each case, the median is kept. Default is 15")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown over the baseline counted as a regression, 0.2 is 20%%. Default is 0.2")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE_FILE,
+                        help="JSON baseline to compare with or update. Default is benchmarks/baseline.json")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Save the results as the new baseline instead of comparing")
+    parser.add_argument("--filter", type=str, default=None,
+                        help="Only run cases whose name contains this")
+    parser.add_argument("--parser", type=str, default=None,
+                        help="Html parser backend to benchmark. Default is html.parser or the HTML_PARSER env var")
+    args = parser.parse_args()
+    if args.parser is not None:
+        set_default_parser(args.parser)
+
+    results = run_suite(args.rounds, args.filter)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print("\nBaseline saved to {0}".format(args.baseline))
+        sys.exit(0)
+
+    try:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print("\nNo baseline at {0}, run with --update-baseline first".format(args.baseline))
+        sys.exit(0)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print("\n{0} cases regressed by more than {1:.0%}: {2}".format(
+            len(regressions), args.threshold, ", ".join(regressions)))
+        sys.exit(1)
+    print("\nNo regression over {0:.0%}".format(args.threshold))
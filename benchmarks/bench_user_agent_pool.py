@@ -0,0 +1,47 @@
+"""Micro-benchmark comparing the old per-request csv reload of user agents with
+the preloaded UserAgentPool.
+
+Run from the repo root: python -m benchmarks.bench_user_agent_pool
+"""
+import random
+import timeit
+
+from src.common.user_agent_rotator import UserAgentPool, load_user_headers
+
+NUM_LEGACY_CALLS = 5
+NUM_POOL_CALLS = 100000
+
+
+def legacy_get_random_user_agent() -> str:
+    # What get_random_user_agent used to do on every single request
+    headers = load_user_headers()
+    return random.choice(list(headers))
+
+
+def report(name: str, total_seconds: float, calls: int) -> float:
+    per_call = total_seconds / calls
+    print("{0:<32} {1:>10} calls {2:>14.3f} us/call".format(
+        name, calls, per_call * 1e6))
+    return per_call
+
+
+if __name__ == "__main__":
+    legacy = report("legacy csv reload + choice",
+                    timeit.timeit(legacy_get_random_user_agent,
+                                  number=NUM_LEGACY_CALLS),
+                    NUM_LEGACY_CALLS)
+
+    report("UserAgentPool.from_csv (once)",
+           timeit.timeit(UserAgentPool.from_csv, number=1), 1)
+
+    pool = UserAgentPool.from_csv()
+    pooled = report("UserAgentPool.sample",
+                    timeit.timeit(pool.sample, number=NUM_POOL_CALLS),
+                    NUM_POOL_CALLS)
+
+    mobile_pool = pool.filter(hardware_type='Mobile')
+    report("filtered (Mobile) sample",
+           timeit.timeit(mobile_pool.sample, number=NUM_POOL_CALLS),
+           NUM_POOL_CALLS)
+
+    print("\nSpeed up per request: {0:.0f}x".format(legacy / pooled))
@@ -0,0 +1,256 @@
+"""Local stand-in for tenantapp.com.au, to load test the crawlers on one machine.
+
+Serves synthetic pages made from the fixtures in tests/html:
+- /Rentals/{state_uri}?page=k: list page with the first k * 10 listings of
+  the state, like the site's "Load more" pagination
+- /Rentals/ViewListing/{id}: detail page of any id, with the off market
+  banner for about --off-market-rate of them
+- /Rentals/Agency/{name}: agency page
+
+Responses can be slowed down by --latency and fail at --error-rate (500/503)
+and --throttle-rate (429). Big list pages are streamed card by card.
+
+Run from the repo root, then point the entry points at it:
+    python -m benchmarks.mock_tenantapp_server --listings 10000 --port 8080
+    TENANTAPP_BASE_URL=http://localhost:8080 python -m src.tenantapp_crawler --paginated --rate 500 --max-rate 2000
+"""
+import re
+import time
+import random
+import threading
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+from src.common.constants import PROPERTIES_PER_PAGE, STATES_URI
+
+LIST_PAGE_FILE = 'tests/html/property_list_page.html'
+DETAIL_PAGE_FILE = 'tests/html/single_property_page.html'
+AGENCY_PAGE_FILE = 'tests/html/agency_listings.html'
+
+DEFAULT_NUM_LISTINGS = 1000  # per state
+DEFAULT_NUM_AGENCIES = 100
+DEFAULT_OFF_MARKET_RATE = 0.1
+FIRST_LISTING_ID = 1000000
+STATE_ID_SPACING = 1000000  # ids of each state start this far apart
+OFF_MARKET_BANNER = b'<div class="top-bar-limit">This property has been leased</div>'
+CARDS_PER_WRITE = 50
+
+CARD_PATTERN = re.compile(rb'<article class="[^"]*property-card-container.*?</article>\s*', re.DOTALL)
+CARD_ID_PATTERN = re.compile(rb'id="card-(\d+)"')
+DETAIL_PAGE_ID_PATTERN = re.compile(rb'id="carousel-(\d+)"')
+AGENCY_PATTERN = re.compile(rb'/Rentals/Agency/([^"]+)"')
+NUM_PROPERTIES_PATTERN = re.compile(rb'(<b class="search-text-highlighted">)\d+(</b>)')
+LIST_PAGE_PATH = re.compile(r'^/Rentals/([a-z]+-rental-properties)/?$')
+DETAIL_PAGE_PATH = re.compile(r'^/Rentals/ViewListing/(\d+)/?$')
+AGENCY_PAGE_PATH = re.compile(r'^/Rentals/Agency/([^/]+)/?$')
+
+
+def read_bytes(file_name: str) -> bytes:
+    with open(file_name, 'rb') as file:
+        return file.read()
+
+
+class MockTenantAppSite:
+    """Generates the pages of the mock site. Every state has num_listings
+    listings with made up ids, spread over num_agencies agencies
+    """
+
+    def __init__(self,
+                 num_listings: int = DEFAULT_NUM_LISTINGS,
+                 num_agencies: int = DEFAULT_NUM_AGENCIES,
+                 off_market_rate: float = DEFAULT_OFF_MARKET_RATE) -> None:
+        self.num_listings = num_listings
+        self.num_agencies = max(1, num_agencies)
+        self.off_market_rate = off_market_rate
+
+        list_page = read_bytes(LIST_PAGE_FILE)
+        cards = list(CARD_PATTERN.finditer(list_page))
+        self.list_page_header: bytes = NUM_PROPERTIES_PATTERN.sub(
+            rb'\g<1>' + str(num_listings).encode() + rb'\g<2>', list_page[:cards[0].start()])
+        self.list_page_footer: bytes = list_page[cards[-1].end():]
+        # The first card with its id and agency swapped for each listing
+        card = cards[0].group(0)
+        self.card_id: bytes = CARD_ID_PATTERN.search(card).group(1)
+        self.card_agency: bytes = AGENCY_PATTERN.search(card).group(1)
+        self.card_parts = [part.split(self.card_agency) for part in card.split(self.card_id)]
+
+        self.detail_page: bytes = read_bytes(DETAIL_PAGE_FILE)
+        self.detail_page_id: bytes = DETAIL_PAGE_ID_PATTERN.search(self.detail_page).group(1)
+        self.agency_page: bytes = read_bytes(AGENCY_PAGE_FILE)
+
+    def get_listing_id(self, state_uri: str, index: int) -> int:
+        return FIRST_LISTING_ID + list(STATES_URI.values()).index(state_uri) * STATE_ID_SPACING + index
+
+    def get_agency_name(self, listing_id: int) -> bytes:
+        return "agency{0}".format(listing_id % self.num_agencies).encode()
+
+    def is_off_market(self, listing_id: int) -> bool:
+        # Same answer every time a listing is requested
+        return random.Random(listing_id).random() < self.off_market_rate
+
+    def create_card(self, listing_id: int) -> bytes:
+        agency = self.get_agency_name(listing_id)
+        return str(listing_id).encode().join(agency.join(parts) for parts in self.card_parts)
+
+    def get_list_page(self, state_uri: str, page: int = 1) -> Iterator[bytes]:
+        """Chunks of the list page, which holds the listings of pages 1 to page
+
+        Args:
+            state_uri (str): uri for each state
+            page (int, optional): page number, as in ?page=. Defaults to 1.
+
+        Yields:
+            Iterator[bytes]: parts of the page, to be written one after the other
+        """
+        num_cards = min(self.num_listings, max(1, page) * PROPERTIES_PER_PAGE)
+        yield self.list_page_header
+        for start in range(0, num_cards, CARDS_PER_WRITE):
+            yield b''.join(self.create_card(self.get_listing_id(state_uri, index))
+                           for index in range(start, min(num_cards, start + CARDS_PER_WRITE)))
+        yield self.list_page_footer
+
+    def get_detail_page(self, listing_id: int) -> bytes:
+        page = self.detail_page.replace(self.detail_page_id, str(listing_id).encode())
+        if self.is_off_market(listing_id):
+            page = page.replace(b'<body class="rentals">', b'<body class="rentals">' + OFF_MARKET_BANNER, 1)
+        return page
+
+    def get_agency_page(self, name: str) -> bytes:
+        return self.agency_page
+
+
+class MockTenantAppHandler(BaseHTTPRequestHandler):
+    """Answers GET requests from the site of its server, with the latency and
+    errors the server was created with
+    """
+    # Without a Content-Length, closing the connection ends a streamed list page
+    protocol_version = 'HTTP/1.0'
+
+    def do_GET(self) -> None:
+        server: MockTenantAppServer = self.server
+        server.count('requests')
+        if server.latency > 0:
+            time.sleep(server.random.uniform(0, 2 * server.latency))
+
+        draw = server.random.random()
+        if draw < server.throttle_rate:
+            server.count('throttled')
+            self.send_error_page(429, {'Retry-After': '1'})
+            return
+        if draw < server.throttle_rate + server.error_rate:
+            server.count('errors')
+            self.send_error_page(server.random.choice((500, 503)))
+            return
+
+        url = urlparse(self.path)
+        match = LIST_PAGE_PATH.match(url.path)
+        if match and match.group(1) in STATES_URI.values():
+            page = parse_qs(url.query).get('page', ['1'])[0]
+            self.send_page(server.site.get_list_page(match.group(1), int(page) if page.isdigit() else 1))
+            return
+        match = DETAIL_PAGE_PATH.match(url.path)
+        if match:
+            self.send_page([server.site.get_detail_page(int(match.group(1)))], send_length=True)
+            return
+        match = AGENCY_PAGE_PATH.match(url.path)
+        if match:
+            self.send_page([server.site.get_agency_page(match.group(1))], send_length=True)
+            return
+        self.send_error_page(404)
+
+    def send_page(self, chunks, send_length: bool = False) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if send_length:
+            self.send_header('Content-Length', str(len(chunks[0])))
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Streamed probes stop reading once they've seen the banner
+            pass
+
+    def send_error_page(self, status_code: int, headers: dict = None) -> None:
+        self.send_response(status_code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockTenantAppServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self,
+                 address,
+                 site: MockTenantAppSite,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 verbose: bool = False) -> None:
+        super().__init__(address, MockTenantAppHandler)
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.verbose = verbose
+        self.random = random.Random()
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'throttled': 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local mock of tenantapp.com.au for load testing the crawlers")
+    parser.add_argument("--host", type=str, default='127.0.0.1',
+                        help="Address to listen on. Default is 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="Port to listen on. Default is 8080")
+    parser.add_argument("--listings", type=int, default=DEFAULT_NUM_LISTINGS,
+                        help="Number of listings of each state. Default is 1000")
+    parser.add_argument("--agencies", type=int, default=DEFAULT_NUM_AGENCIES,
+                        help="Number of agencies the listings are spread over. Default is 100")
+    parser.add_argument("--off-market-rate", type=float, default=DEFAULT_OFF_MARKET_RATE,
+                        help="Share of detail pages with the off market banner. Default is 0.1")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Mean seconds added to every response, drawn between 0 and twice this. Default is 0")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 500 or 503. Default is 0")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 429. Default is 0")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log every request")
+    args = parser.parse_args()
+
+    server = MockTenantAppServer((args.host, args.port),
+                                 MockTenantAppSite(args.listings, args.agencies, args.off_market_rate),
+                                 latency=args.latency,
+                                 error_rate=args.error_rate,
+                                 throttle_rate=args.throttle_rate,
+                                 verbose=args.verbose)
+    print("Mock tenantapp.com.au serving {0} listings per state on {1}".format(
+        args.listings, server.base_url))
+    print("Run the crawlers with TENANTAPP_BASE_URL={0}".format(server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("Served {0}".format(server.counters))
@@ -1,23 +1,60 @@
 import time
-import requests
+import asyncio
 import argparse
 import logging
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
 from datetime import datetime
 from bs4 import BeautifulSoup
 
 from src.transformer import Transformer
 from src.property_database import PropertyDatabase
 from src.input_html_extractor import InputHtmlExtractor
-from src.common.user_agent_rotator import get_random_user_agent
+from src.common.html_parser import PARSER_BACKENDS, get_default_parser, parse_html, set_default_parser
+from src.common.constants import AGENCY_DETAIL_HTML_ATTRS, ATTRIBUTE_VALUE
+from src.common.response_cache import configure_response_cache
+from src.common.rate_limiter import DEFAULT_INITIAL_RATE, DEFAULT_MAX_RATE, configure_rate_limiter
+from src.common.async_fetcher import AsyncFetcher, DEFAULT_CONCURRENCY
+from src.common.checkpoint import CheckpointJournal
+from src.common.sharding import Shard
+from src.common.metrics import DB_WRITE, DEFAULT_METRICS_DIR, EXTRACT, FETCH, PARSE, Metrics
+from src.common.http_client import HttpClient, MarkerDetector
 from tests.test_utils import read_html_from_local_file, write_html_to_local_file
 
-MAX_RETRY = 15
-DELAY_TIME = 1
+# The banner with the agency's name and address is near the top of the agency
+# page, only download until a bit after it starts
+AGENCY_BANNER_MARKER: bytes = AGENCY_DETAIL_HTML_ATTRS['agency_banner'][ATTRIBUTE_VALUE].encode('utf-8')
+AGENCY_BANNER_BYTES = 8 * 1024
+
+# Listings read before their agency pages are fetched, the more the more of them share an agency
+DEFAULT_GROUP_SIZE = 1000
+NOT_AVAILABLE = "N/A"
 
 
 class AgencyCrawler:
-    def __init__(self, db: PropertyDatabase) -> None:
+    def __init__(self,
+                 db: PropertyDatabase,
+                 checkpoint: CheckpointJournal = None,
+                 shard: Shard = None,
+                 metrics: Metrics = None,
+                 metrics_dir: str = None,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 group_size: int = DEFAULT_GROUP_SIZE) -> None:
         self.db = db
+        # Per stage latencies and throughput, written out at the end of the run if metrics_dir is set
+        self.metrics = metrics if metrics is not None else Metrics('agency_crawler')
+        self.metrics_dir = metrics_dir
+        # Only listings whose agency url hashes to this shard are checked, so each
+        # agency page is only requested by one worker
+        self.shard = shard if shard is not None else Shard()
+        # Journal of checked listings, to carry on from there in the next run
+        self.checkpoint = checkpoint
+        self.http_client = HttpClient()
+        # Agency pages of a group of listings are fetched concurrently, once per agency
+        self.fetcher = AsyncFetcher(
+            concurrency, rate_limiter=self.http_client.rate_limiter)
+        self.group_size = max(1, group_size)
+        # (agency_name, agency_address) of every agency fetched so far, by agency url
+        self.agency_details: Dict[str, Tuple[str, str]] = {}
 
     def request_html_from_url(self, url: str) -> BeautifulSoup:
         """Attempt to send a request to TenantApp page, setting the timeout for
@@ -29,69 +66,302 @@ class AgencyCrawler:
         Returns:
             BeautifulSoup: html content of the page
         """
-        print("\nSending GET request to {0}".format(url))
-        attempt = 0
-        while attempt != MAX_RETRY:
+        with self.metrics.time(FETCH):
+            return self.http_client.get_html(url, parse_html)
+
+    def request_agency_banner_html(self, url: str) -> Tuple[BeautifulSoup, bool]:
+        """Stream the agency page and stop a few KB after the agency banner starts
+
+        Args:
+            url (str): url of the agency's page
+
+        Returns:
+            Tuple[BeautifulSoup, bool]: html of the downloaded part of the page, and
+                whether that's the whole page
+        """
+        detector = MarkerDetector([AGENCY_BANNER_MARKER], AGENCY_BANNER_BYTES)
+        with self.metrics.time(FETCH):
+            result = self.http_client.stream_until(url, detector)
+        if result is None:
+            return None, False
+        with self.metrics.time(PARSE):
+            html = parse_html(result.content)
+        return html, result.complete
+
+    def get_properties_without_agency_details(self) -> Iterator[Mapping[str, Any]]:
+        after = self.checkpoint.last_key if self.checkpoint is not None else None
+        return self.db.stream_where_no_agency_details(
+            ['property_id', 'agency_property_listings_url'], after=after)
+
+    def request_agency_details(self, url: str) -> Tuple[str, str]:
+        """Fetch the agency page and extract the agency's name and address
+
+        Args:
+            url (str): url of the agency's page
+
+        Returns:
+            Tuple[str, str]: agency name and address, N/A if the page has no banner,
+                None if the page couldn't be loaded
+        """
+        transformer: Transformer = Transformer(InputHtmlExtractor(None))
+        try:
+            agency_page, complete = self.request_agency_banner_html(url)
+            if agency_page is None:
+                return None
             try:
-                user_agent: dict[str, str] = get_random_user_agent()
-                response = requests.get(url, timeout=15, headers=user_agent)
+                with self.metrics.time(EXTRACT):
+                    agency_banner = transformer.get_agency_banner(agency_page)
+                    agency_name = transformer.get_agency_name(agency_page)
+            except AttributeError:
+                if complete:
+                    raise
+                # Banner wasn't in the part we downloaded, check the whole page
+                self.metrics.increment('full_page_refetches')
+                agency_page = self.request_html_from_url(url)
+                with self.metrics.time(EXTRACT):
+                    agency_banner = transformer.get_agency_banner(agency_page)
+                    agency_name = transformer.get_agency_name(agency_page)
+            print(f"Agency banner: {agency_banner}\n")
+            print(f"Agency name: {agency_name}")
+            agency_address = transformer.get_agency_address(
+                agency_banner, agency_name)
+            print(f"Agency address: {agency_address}\n")
+            return agency_name, agency_address
+        except Exception as e:
+            logging.exception(f"Failed to get agency detail: {e}")
+            if "'NoneType' object has no attribute 'get_text'" in str(e):
+                print("Saving agency name and address as N/A")
+                return NOT_AVAILABLE, NOT_AVAILABLE
+            return None
+
+    def get_groups(self, properties: Iterator[Mapping[str, Any]]) -> Iterator[Dict[str, List[Mapping[str, Any]]]]:
+        """Listings of this shard, group_size at a time, grouped by agency url
+
+        Args:
+            properties (Iterator[Mapping[str, Any]]): rows without agency details
+
+        Yields:
+            Iterator[Dict[str, List[Mapping[str, Any]]]]: rows of each agency url, in the order they were read
+        """
+        groups: Dict[str, List[Mapping[str, Any]]] = {}
+        num_rows = 0
+        for p in properties:
+            url = p['agency_property_listings_url']
+            if url is None or not self.shard.owns(url):
+                continue
+            groups.setdefault(url, []).append(p)
+            num_rows += 1
+            if num_rows >= self.group_size:
+                yield groups
+                groups = {}
+                num_rows = 0
+        if groups:
+            yield groups
+
+    def get_last_row(self, groups: Dict[str, List[Mapping[str, Any]]]) -> Mapping[str, Any]:
+        # Rows are read by (ad_posted_date, property_id) with missing dates last
+        return max((rows[-1] for rows in groups.values()), key=lambda row: (
+            row['ad_posted_date'] is None, row['ad_posted_date'] or 0, row['property_id']))
 
-                print("Got response from {0} in {1} seconds".format(
-                    url, response.elapsed.total_seconds()))
-                return BeautifulSoup(response.content, "html.parser")
-            except Exception as e:
-                print(
-                    "Attempt #{0} failed with exception {1}".format(attempt, e))
-                attempt += 1
-                time.sleep(DELAY_TIME)
+    async def update_groups(self, groups: Dict[str, List[Mapping[str, Any]]]) -> None:
+        """Fetch the page of each agency not fetched yet, all at once, then update
+        every listing of each agency with one UPDATE
 
-        return None
+        Args:
+            groups (Dict[str, List[Mapping[str, Any]]]): rows of each agency url
+        """
+        last_row = self.get_last_row(groups)
+        page_requests = {url: asyncio.ensure_future(self.fetcher.fetch(self.request_agency_details, url))
+                         for url in groups if url not in self.agency_details}
+        self.metrics.increment('agency_pages_fetched', len(page_requests))
+        try:
+            for url, rows in groups.items():
+                self.metrics.increment('listings_checked', len(rows))
+                self.shard.record_processed(len(rows))
+                if url in page_requests:
+                    try:
+                        details = await page_requests[url]
+                    except Exception as e:
+                        logging.exception(f"Failed to fetch agency {url}: {e}")
+                        details = None
+                    if details is None:
+                        self.metrics.increment('agency_pages_failed')
+                        continue
+                    self.agency_details[url] = details
+                else:
+                    self.metrics.increment('agency_memo_hits')
+                agency_name, agency_address = self.agency_details[url]
+                print(f"Updating {len(rows)} rows of {url} in DB....\n\n")
+                try:
+                    with self.metrics.time(DB_WRITE):
+                        num_updated = self.db.update_agency_details_of_agency(
+                            url, agency_name, agency_address)
+                except Exception as e:
+                    logging.exception(f"Failed to update agency {url}: {e}")
+                    continue
+                self.metrics.increment('listings_updated', num_updated)
+        finally:
+            # A resumed run carries on after the last row read of the group, whatever
+            # happened to it. Agencies that failed are tried again in the next full run
+            if self.checkpoint is not None:
+                self.checkpoint.record(last_row['agency_property_listings_url'],
+                                       (last_row['ad_posted_date'], last_row['property_id']))
 
-    def get_properties_without_agency_details(self):
-        on_market = self.db.select_where_no_agency_details()
-        properties = [{**row} for row in on_market]
-        return properties
+    def report(self) -> str:
+        counters = self.metrics.counters
+        num_checked = counters.get('listings_checked', 0)
+        num_fetched = counters.get('agency_pages_fetched', 0)
+        num_memo_hits = counters.get('agency_memo_hits', 0)
+        return ("Agency dedupe: {0} listings checked with {1} agency page fetches, "
+                "{2:.1%} of listings shared a fetch, {3:.1%} of agencies were already fetched").format(
+            num_checked, num_fetched,
+            1 - num_fetched / num_checked if num_checked else 0,
+            num_memo_hits / (num_memo_hits + num_fetched) if num_memo_hits + num_fetched else 0)
 
     def get_agency_details(self):
         print(f"\nCollecting agency names and addresses...\n")
-        transformer: Transformer = Transformer(InputHtmlExtractor(None))
         properties = self.get_properties_without_agency_details()
-        print("\nThere are {0} urls to be checked".format(len(properties)))
-        count: int = 0
 
         # 59 d minutes from now - due to 1hr time limit on CircleCI Free Plan
         timeout = time.time() + 60*59
-        for p in properties:
-            try:
-                url = p['agency_property_listings_url']
+        finished = False
+        try:
+            for count, groups in enumerate(self.get_groups(properties), 1):
                 if time.time() > timeout:
                     print(f"Reaching time limit, stopping now...")
                     break
-                count += 1
-                print(
-                    f"\n{count}. Checking url... {url} for property id {p['property_id']}\n")
-                agency_page: BeautifulSoup = self.request_html_from_url(url)
-                if agency_page is not None:
-                    agency_banner = transformer.get_agency_banner(agency_page)
-                    print(f"Agency banner: {agency_banner}\n")
-
-                    agency_name = transformer.get_agency_name(agency_page)
-                    print(f"Agency name: {agency_name}")
-                    agency_address = transformer.get_agency_address(
-                        agency_banner, agency_name)
-                    print(f"Agency address: {agency_address}\n")
-                    print("Updating row in DB....\n\n")
-                    self.db.update_agency_details(
-                        p['property_id'], url, agency_name, agency_address)
-            except Exception as e:
-                logging.exception(f"Failed to get agency detail: {e}")
-                if "'NoneType' object has no attribute 'get_text'" in str(e):
-                    print("Saving agency name and address as N/A")
-                    self.db.update_agency_details(
-                        p['property_id'], url, "N/A", "N/A")
+                print(f"\n{count}. Checking {len(groups)} agencies of {sum(map(len, groups.values()))} properties\n")
+                try:
+                    asyncio.run(self.update_groups(groups))
+                except Exception as e:
+                    logging.exception(f"Failed to get agency details: {e}")
+            else:
+                finished = True
+        finally:
+            self.fetcher.close()
+            if self.checkpoint is not None:
+                if finished:
+                    # The next resumed run starts over instead of finding nothing after last_key
+                    self.checkpoint.reset()
+                self.checkpoint.close()
+        print(self.http_client.report())
+        print(self.shard.report())
+        print(self.report())
+        print(self.metrics.report())
+        if self.metrics_dir is not None:
+            self.metrics.write(self.metrics_dir)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Crawl agency names and addresses from tenantapp.com.au")
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Carry on after the last listing checked by the previous run",
+        required=False
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=0,
+        help="Index of this worker's shard, from 0 to --num-shards - 1. Default is 0",
+        required=False
+    )
+
+    parser.add_argument(
+        "--num-shards",
+        type=int,
+        default=1,
+        help="Number of workers splitting the work by a hash of agency url. Default is 1, no sharding",
+        required=False
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Max number of agency pages being fetched at the same time. Default is 1",
+        required=False
+    )
+
+    parser.add_argument(
+        "--group-size",
+        type=int,
+        default=DEFAULT_GROUP_SIZE,
+        help="Listings grouped by agency before their agency pages are fetched. Default is 1000",
+        required=False
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the on-disk response cache. Default is no cache, or the HTTP_CACHE_DIR env var",
+        required=False
+    )
+
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay pages from the response cache only, never touching the network",
+        required=False
+    )
+
+    parser.add_argument(
+        "--parser",
+        type=str,
+        choices=PARSER_BACKENDS,
+        default=get_default_parser(),
+        help="Html parser backend used for every page. Default is html.parser or the HTML_PARSER env var",
+        required=False
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_INITIAL_RATE,
+        help="Requests per second to start at, tuned up and down from there by the rate limiter. Default is 2",
+        required=False
+    )
+
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Requests per second the rate limiter never goes above. Default is 20",
+        required=False
+    )
+
+    parser.add_argument(
+        "--metrics-dir",
+        type=str,
+        default=DEFAULT_METRICS_DIR,
+        help="Directory the JSON and Prometheus metrics of the run are written to. Default is metrics, or the METRICS_DIR env var",
+        required=False
+    )
+
+    # Parsing command args
+    args = parser.parse_args()
+    print(f"Html parser: {args.parser}")
+    set_default_parser(args.parser)
+    print(f"Rate limit: {args.rate} requests/s, max {args.max_rate}")
+    configure_rate_limiter(args.rate, args.max_rate)
+    if args.cache_dir is not None or args.offline:
+        print(f"Response cache: {args.cache_dir}, offline: {args.offline}")
+        configure_response_cache(args.cache_dir, args.offline)
+
+    print(f"Concurrency: {args.concurrency}, group size: {args.group_size}")
+    print(f"Resume: {args.resume}")
+    shard = Shard(args.shard, args.num_shards)
+    print(f"Shard: {shard}")
+    job = f"agency_crawler{shard.name}"
+    checkpoint = CheckpointJournal(job, args.resume)
+    print(f"Metrics dir: {args.metrics_dir}")
+
     db = PropertyDatabase()
-    ac = AgencyCrawler(db)
+    ac = AgencyCrawler(db, checkpoint, shard, Metrics(job), args.metrics_dir,
+                       concurrency=args.concurrency, group_size=args.group_size)
     ac.get_agency_details()
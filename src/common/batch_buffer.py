@@ -0,0 +1,120 @@
+import time
+import atexit
+import logging
+import threading
+from typing import Any, Callable, List
+
+DEFAULT_MAX_ROWS = 100
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_MAX_INTERVAL = 30.0  # seconds
+
+
+class BatchBuffer:
+    """Write-behind buffer which collects items and hands them to flush_fn in
+    one batch once it holds max_rows items, roughly max_bytes bytes, or its
+    oldest item has waited max_interval seconds.
+
+    Limits are checked whenever an item is appended, there is no background
+    thread, because the DB connection the flush uses isn't thread safe.
+    Whatever is left is flushed on close(), when leaving a `with` block (even
+    on an exception) and when the interpreter exits.
+
+    on_flushed is called with the items of every batch flush_fn took without
+    raising, e.g to journal them only once they're really in the DB.
+
+    Items are collected in a list, or in whatever new_items makes (anything
+    with append and len, e.g a PropertyBatch).
+    """
+
+    def __init__(self,
+                 flush_fn: Callable[[List[Any]], None],
+                 max_rows: int = DEFAULT_MAX_ROWS,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_interval: float = DEFAULT_MAX_INTERVAL,
+                 size_fn: Callable[[Any], int] = None,
+                 name: str = "buffer",
+                 on_flushed: Callable[[List[Any]], None] = None,
+                 new_items: Callable[[], Any] = list) -> None:
+        self.flush_fn = flush_fn
+        self.on_flushed = on_flushed
+        self.max_rows = max(1, max_rows)
+        self.max_bytes = max_bytes
+        self.max_interval = max_interval
+        self.size_fn = size_fn
+        self.name = name
+        self.new_items = new_items
+        self.items: List[Any] = new_items()
+        self.num_bytes: int = 0
+        self.oldest_item_time: float = None
+        self.lock = threading.RLock()
+
+        self.num_flushes: int = 0
+        self.num_flushed_items: int = 0
+        self.flush_latencies: List[float] = []
+        atexit.register(self.flush)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __enter__(self) -> 'BatchBuffer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, item: Any) -> None:
+        with self.lock:
+            if not self.items:
+                self.oldest_item_time = time.monotonic()
+            self.items.append(item)
+            if self.size_fn is not None:
+                self.num_bytes += self.size_fn(item)
+            if self.should_flush():
+                self.flush()
+
+    def should_flush(self) -> bool:
+        return len(self.items) >= self.max_rows \
+            or (self.size_fn is not None and self.num_bytes >= self.max_bytes) \
+            or time.monotonic() - self.oldest_item_time >= self.max_interval
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.items:
+                return
+            items = self.items
+            self.items = self.new_items()
+            self.num_bytes = 0
+            self.oldest_item_time = None
+
+            start_time = time.perf_counter()
+            flushed = False
+            try:
+                self.flush_fn(items)
+                flushed = True
+            except Exception as e:
+                logging.exception("Failed to flush {0} items from {1}: {2}".format(
+                    len(items), self.name, e))
+            latency = time.perf_counter() - start_time
+
+            self.num_flushes += 1
+            self.num_flushed_items += len(items)
+            self.flush_latencies.append(latency)
+            print("Flushed {0} items from {1} in {2:.3f} seconds".format(
+                len(items), self.name, latency))
+            if flushed and self.on_flushed is not None:
+                try:
+                    self.on_flushed(items)
+                except Exception as e:
+                    logging.exception("Failed to handle {0} items flushed from {1}: {2}".format(
+                        len(items), self.name, e))
+
+    def close(self) -> None:
+        self.flush()
+        atexit.unregister(self.flush)
+        if self.num_flushes > 0:
+            print("{0}: {1} items in {2} flushes, avg {3:.3f}s, max {4:.3f}s per flush".format(
+                self.name,
+                self.num_flushed_items,
+                self.num_flushes,
+                sum(self.flush_latencies) / self.num_flushes,
+                max(self.flush_latencies)))
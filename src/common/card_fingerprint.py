@@ -0,0 +1,110 @@
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src.common.property_id_index import PropertyIdIndex
+from src.property_dataclass import PropertyListing
+
+# What a list page card shows, and so what its fingerprint covers
+CARD_FIELDS = ('address', 'price', 'move_in_date', 'property_images')
+
+# Status of a card against the entry we already have for its listing
+NEW = 'new'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+UNFINGERPRINTED = 'unfingerprinted'  # entry saved before fingerprints were stored
+
+NO_FINGERPRINT = 0
+FIELD_SEPARATOR = '\x1f'
+IMAGE_SEPARATOR = '\x1e'
+
+
+def get_card_fingerprint(data: PropertyListing) -> str:
+    """Hash of the card fields of a listing. Values are stripped and the images
+    compared as a set, so only a real change on the card gives a new fingerprint
+
+    Args:
+        data (PropertyListing): listing with the fields of its list page card
+
+    Returns:
+        str: 16 hex characters (8 byte blake2b digest)
+    """
+    values = []
+    for name in CARD_FIELDS:
+        value = getattr(data, name, None)
+        if isinstance(value, (list, tuple)):
+            value = IMAGE_SEPARATOR.join(sorted({str(item).strip() for item in value if item}))
+        values.append('' if value is None else str(value).strip())
+    return hashlib.blake2b(FIELD_SEPARATOR.join(values).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def get_card_fields(data: PropertyListing) -> Dict[str, Any]:
+    """Card fields and fingerprint of a listing, to update its existing entry with"""
+    fields = {name: getattr(data, name, None) for name in CARD_FIELDS}
+    fields['property_id'] = data.property_id
+    fields['card_fingerprint'] = data.card_fingerprint
+    return fields
+
+
+def compare_card_fingerprints(stored: Optional[str], current: str) -> str:
+    """Status of a known listing given the fingerprint of its entry and of its card"""
+    if not stored:
+        return UNFINGERPRINTED
+    return UNCHANGED if stored == current else CHANGED
+
+
+def to_int(fingerprint: Optional[str]) -> int:
+    try:
+        return int(fingerprint, 16) if fingerprint else NO_FINGERPRINT
+    except ValueError:
+        return NO_FINGERPRINT
+
+
+class CardFingerprintIndex(PropertyIdIndex):
+    """PropertyIdIndex which also holds the card fingerprint of each on market
+    listing we have, to tell whether a card is new, unchanged or changed without
+    a DB round trip.
+
+    Fingerprints are kept as 8 byte ints in an array lined up with the sorted
+    numeric ids, so they add 8 bytes per listing. A listing whose entry has no
+    fingerprint yet is stored with 0.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, Optional[str]]] = ()) -> None:
+        numeric_fingerprints: Dict[int, int] = {}
+        self.other_fingerprints: Dict[str, int] = {}
+        for property_id, fingerprint in rows:
+            if self.is_numeric(property_id):
+                numeric_fingerprints[int(property_id)] = to_int(fingerprint)
+            elif property_id is not None:
+                self.other_fingerprints[property_id] = to_int(fingerprint)
+        super().__init__()
+        self.numeric_ids = array('Q', sorted(numeric_fingerprints))
+        self.fingerprints: array = array('Q', (numeric_fingerprints[value] for value in self.numeric_ids))
+        self.other_ids = set(self.other_fingerprints)
+
+    def get_fingerprint(self, property_id: str) -> Optional[str]:
+        """Stored fingerprint of a known listing, None if unknown or not fingerprinted"""
+        value = self.other_fingerprints.get(property_id, NO_FINGERPRINT)
+        position = self.find(int(property_id)) if self.is_numeric(property_id) else None
+        if position is not None:
+            value = self.fingerprints[position]
+        return format(value, '016x') if value != NO_FINGERPRINT else None
+
+    def get_status(self, property_id: str, fingerprint: str) -> str:
+        if property_id not in self:
+            return NEW
+        return compare_card_fingerprints(self.get_fingerprint(property_id), fingerprint)
+
+    def set(self, property_id: str, fingerprint: Optional[str]) -> None:
+        position = self.find(int(property_id)) if self.is_numeric(property_id) else None
+        if position is not None:
+            self.fingerprints[position] = to_int(fingerprint)
+            return
+        # Listings first seen during the crawl go in the small dict, the arrays stay as loaded
+        self.other_fingerprints[property_id] = to_int(fingerprint)
+        self.other_ids.add(property_id)
+
+    def add(self, property_id: str) -> None:
+        if property_id not in self:
+            self.set(property_id, None)
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+from datetime import datetime
+from typing import Any, Set, Tuple
+
+DEFAULT_CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', '.checkpoints')
+
+
+class CheckpointJournal:
+    """Append-only journal of the work a time-limited job has finished, so the
+    next run can carry on from there with --resume instead of starting again
+    from the oldest rows.
+
+    Each job (and state) has its own json lines file. Every finished url is
+    appended along with the (ad_posted_date, property_id) key of its row, if
+    the job reads rows in that order. Without resume, or once a job has gone
+    through all of its rows, the journal is emptied and the job starts from the
+    beginning.
+    """
+
+    def __init__(self, job: str, resume: bool = False, directory: str = DEFAULT_CHECKPOINT_DIR) -> None:
+        self.job = job
+        self.path = os.path.join(directory, "{0}.jsonl".format(job))
+        self.last_key: Tuple[Any, str] = None
+        self.finished_urls: Set[str] = set()
+        os.makedirs(directory, exist_ok=True)
+
+        if resume:
+            self.load()
+            print("Resuming {0} after key {1}, {2} urls already done".format(
+                job, self.last_key, len(self.finished_urls)))
+        self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self.file.tell() > 0 and not self.ends_with_newline():
+            self.file.write("\n")
+
+    def ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Last line can be cut short if the job was killed while writing it
+                    continue
+                if entry.get('url') is not None:
+                    self.finished_urls.add(entry['url'])
+                if entry.get('key') is not None:
+                    self.last_key = self.decode_key(entry['key'])
+
+    @staticmethod
+    def encode_key(key: Tuple[Any, str]) -> list:
+        posted_date, property_id = key
+        if isinstance(posted_date, datetime):
+            posted_date = posted_date.isoformat()
+        return [posted_date, property_id]
+
+    @staticmethod
+    def decode_key(key: list) -> Tuple[Any, str]:
+        posted_date, property_id = key
+        if posted_date is not None:
+            try:
+                posted_date = datetime.fromisoformat(posted_date)
+            except ValueError:
+                pass
+        return posted_date, property_id
+
+    def is_finished(self, url: str) -> bool:
+        return url in self.finished_urls
+
+    def record(self, url: str, key: Tuple[Any, str] = None) -> None:
+        """Mark the url as done
+
+        Args:
+            url (str): url that was processed
+            key (Tuple[Any, str], optional): (ad_posted_date, property_id) of its row. Defaults to None.
+        """
+        self.finished_urls.add(url)
+        entry = {'url': url, 'time': time.time()}
+        if key is not None:
+            self.last_key = key
+            entry['key'] = self.encode_key(key)
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def reset(self) -> None:
+        """Empty the journal once the job has gone through all of its rows, so the
+        next resumed run starts a new pass from the beginning"""
+        print("{0} went through all of its rows, emptying its journal".format(self.job))
+        self.last_key = None
+        self.finished_urls = set()
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class FullSweepSchedule:
+    """When a job last went over everything rather than only what's new, so
+    incremental runs can still do a full sweep every interval_hours to catch
+    what they might have missed. Kept in a small file next to the journals.
+    """
+
+    def __init__(self, job: str, interval_hours: float, directory: str = DEFAULT_CHECKPOINT_DIR) -> None:
+        self.path = os.path.join(directory, "{0}.full_sweep".format(job))
+        self.interval_hours = interval_hours
+        os.makedirs(directory, exist_ok=True)
+
+    def get_last_sweep_time(self) -> float:
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return float(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_due(self) -> bool:
+        last_sweep_time = self.get_last_sweep_time()
+        return last_sweep_time is None or time.time() - last_sweep_time >= self.interval_hours * 3600
+
+    def record(self) -> None:
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(str(time.time()))
@@ -1,4 +1,8 @@
-BASE_URL: str = 'https://tenantapp.com.au'
+import os
+
+DEFAULT_BASE_URL: str = 'https://tenantapp.com.au'
+# Can point every entry point at another host, e.g the local mock server of benchmarks/mock_tenantapp_server.py
+BASE_URL: str = os.environ.get('TENANTAPP_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
 
 STATES_URI: dict[str, str] = {
     'wa': 'wa-rental-properties',
@@ -11,6 +15,18 @@ STATES_URI: dict[str, str] = {
     'nt': 'nt-rental-properties'
 }
 
+# Spellings of state_and_territory found in the DB for each state uri, upper cased
+STATE_AND_TERRITORY_ALIASES: dict[str, list[str]] = {
+    'wa-rental-properties': ['WA'],
+    'act-rental-properties': ['ACT'],
+    'sa-rental-properties': ['SA'],
+    'tas-rental-properties': ['TAS', 'TASMANIA'],
+    'qld-rental-properties': ['QLD', 'QUEENSLAND'],
+    'nsw-rental-properties': ['NSW'],
+    'vic-rental-properties': ['VIC', 'VICTORIA'],
+    'nt-rental-properties': ['NT'],
+}
+
 PROPERTIES_PER_PAGE: int = 10
 
 TAG_NAME = 'tag'
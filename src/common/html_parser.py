@@ -0,0 +1,158 @@
+import os
+from typing import Dict, List, Union
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional, only needed for the fast path
+    LexborHTMLParser = None
+
+# Backends understood by BeautifulSoup, plus selectolax's lexbor engine
+BEAUTIFULSOUP_PARSERS = ('html.parser', 'lxml', 'html5lib')
+SELECTOLAX_PARSER = 'selectolax'
+PARSER_BACKENDS = BEAUTIFULSOUP_PARSERS + (SELECTOLAX_PARSER,)
+DEFAULT_PARSER = 'html.parser'
+
+# BeautifulSoup leaves text inside these tags out of get_text()
+EXCLUDED_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+_default_parser: str = os.environ.get('HTML_PARSER', DEFAULT_PARSER)
+
+
+def is_parser_available(backend: str) -> bool:
+    if backend == SELECTOLAX_PARSER:
+        return LexborHTMLParser is not None
+    try:
+        BeautifulSoup('', backend)
+        return True
+    except Exception:
+        return False
+
+
+def get_available_parsers() -> List[str]:
+    return [backend for backend in PARSER_BACKENDS if is_parser_available(backend)]
+
+
+def get_default_parser() -> str:
+    return _default_parser
+
+
+def set_default_parser(backend: str) -> None:
+    """Select the backend used by parse_html when none is given, e.g from a
+    --parser cli flag. Can also be set with the HTML_PARSER env var
+
+    Args:
+        backend (str): one of PARSER_BACKENDS
+    """
+    global _default_parser
+    if backend not in PARSER_BACKENDS:
+        raise ValueError("Unknown html parser {0}, choose one of {1}".format(
+            backend, PARSER_BACKENDS))
+    if not is_parser_available(backend):
+        raise ImportError(
+            "Html parser {0} is not installed".format(backend))
+    _default_parser = backend
+
+
+def parse_html(content: Union[bytes, str], backend: str = None) -> Union[BeautifulSoup, 'SelectolaxTag']:
+    """Parse a page with the selected backend. Whatever the backend, the result
+    supports the BeautifulSoup calls InputHtmlExtractor and Transformer rely on
+
+    Args:
+        content (Union[bytes, str]): raw html
+        backend (str, optional): one of PARSER_BACKENDS. Defaults to get_default_parser().
+
+    Returns:
+        Union[BeautifulSoup, SelectolaxTag]: parsed page
+    """
+    backend = backend or _default_parser
+    if backend == SELECTOLAX_PARSER:
+        if LexborHTMLParser is None:
+            raise ImportError(
+                "Html parser {0} is not installed".format(backend))
+        return SelectolaxTag(LexborHTMLParser(content).root)
+    # html.parser keeps \r\n in text while the other backends turn it into \n as
+    # the html spec says. It's left as is so the default parser stores exactly
+    # what it always has, compare across backends with normalize_newlines
+    return BeautifulSoup(content, backend)
+
+
+def normalize_newlines(content: Union[bytes, str]) -> Union[bytes, str]:
+    if isinstance(content, bytes):
+        return content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class SelectolaxTag:
+    """Wraps a selectolax lexbor node so it behaves like a BeautifulSoup Tag for
+    the small part of the bs4 api the extractor uses: find, find_all, get_text
+    and reading attributes with tag['attr'].
+
+    Searches are turned into css selectors and run in lexbor's C engine, which
+    is where the speed up over BeautifulSoup comes from.
+    """
+
+    def __init__(self, node) -> None:
+        self.node = node
+
+    @property
+    def name(self) -> str:
+        return self.node.tag
+
+    @property
+    def attrs(self) -> Dict[str, str]:
+        return self.node.attributes
+
+    def __getitem__(self, key: str) -> str:
+        value = self.node.attributes[key]
+        return value.split() if key == 'class' else value
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self.node.attributes else default
+
+    def __str__(self) -> str:
+        return self.node.html
+
+    @staticmethod
+    def to_css_selector(name: str = None, attrs: Dict[str, str] = None, class_: str = None) -> str:
+        attrs = dict(attrs or {})
+        if class_ is not None:
+            attrs['class'] = class_
+        selector = name if name else '*'
+        for key, value in attrs.items():
+            if value is None:
+                continue
+            value = value.replace('\\', '\\\\').replace('"', '\\"')
+            # bs4 matches a class attr on any one of its classes, or on the whole string
+            operator = '~=' if key == 'class' and ' ' not in value else '='
+            selector += '[{0}{1}"{2}"]'.format(key, operator, value)
+        return selector
+
+    def find_all(self, name: str = None, attrs: Dict[str, str] = None, class_: str = None) -> List['SelectolaxTag']:
+        selector = self.to_css_selector(name, attrs, class_)
+        # lexbor includes the node itself in the matches, bs4 only searches its descendants
+        return [SelectolaxTag(node) for node in self.node.css(selector)
+                if node.mem_id != self.node.mem_id]
+
+    def find(self, name: str = None, attrs: Dict[str, str] = None, class_: str = None) -> 'SelectolaxTag':
+        selector = self.to_css_selector(name, attrs, class_)
+        node = self.node.css_first(selector)
+        if node is None or node.mem_id != self.node.mem_id:
+            return SelectolaxTag(node) if node is not None else None
+        matches = self.find_all(name, attrs, class_)
+        return matches[0] if matches else None
+
+    def get_text(self) -> str:
+        if self.node.tag in EXCLUDED_TEXT_TAGS:
+            return self.node.text(deep=True, separator='', strip=False)
+        texts: List[str] = []
+        self.collect_text(self.node, texts)
+        return ''.join(texts)
+
+    @classmethod
+    def collect_text(cls, node, texts: List[str]) -> None:
+        for child in node.iter(include_text=True):
+            if child.tag == '-text':
+                texts.append(child.text_content)
+            elif child.is_element_node and child.tag not in EXCLUDED_TEXT_TAGS:
+                cls.collect_text(child, texts)
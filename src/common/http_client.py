@@ -0,0 +1,282 @@
+import time
+import requests
+import threading
+import dataclasses
+from typing import Any, Callable, List, Tuple
+
+from src.common.constants import BASE_URL, DEFAULT_BASE_URL
+from src.common.rate_limiter import AimdRateLimiter, get_default_rate_limiter
+from src.common.response_cache import ResponseCache, get_default_cache
+from src.common.retry_policy import IncompletePageError, RetryPolicy
+from src.common.user_agent_rotator import get_random_user_agent
+
+REQUEST_TIMEOUT = 15
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def rebase_url(url: str) -> str:
+    """Send urls of tenantapp.com.au, e.g the ones saved in the DB, to BASE_URL
+    when it's overridden by the TENANTAPP_BASE_URL env var
+
+    Args:
+        url (str): url of a page
+
+    Returns:
+        str: same url on BASE_URL
+    """
+    if BASE_URL != DEFAULT_BASE_URL and url.startswith(DEFAULT_BASE_URL):
+        return BASE_URL + url[len(DEFAULT_BASE_URL):]
+    return url
+
+
+class MarkerDetector:
+    """Incremental search for any of the markers in a response being streamed.
+
+    Once a marker is found, the detector keeps asking for `bytes_after_marker`
+    more bytes so that the html around the marker (e.g a whole banner) is
+    downloaded too before the stream is stopped.
+    """
+
+    def __init__(self, markers: List[bytes], bytes_after_marker: int = 0) -> None:
+        self.markers = markers
+        self.bytes_after_marker = bytes_after_marker
+        self.longest_marker: int = max(len(marker) for marker in markers)
+        self.reset()
+
+    def reset(self) -> None:
+        self.content = bytearray()
+        self.marker_end: int = None
+
+    @property
+    def found(self) -> bool:
+        return self.marker_end is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add the next chunk of the body
+
+        Args:
+            chunk (bytes): next chunk of the response
+
+        Returns:
+            bool: True once we've read enough and the download can stop
+        """
+        # Markers can be split between 2 chunks, so search from a bit before the new chunk
+        search_from = max(0, len(self.content) - self.longest_marker + 1)
+        self.content += chunk
+        if self.marker_end is None:
+            for marker in self.markers:
+                position = self.content.find(marker, search_from)
+                if position != -1:
+                    self.marker_end = position + len(marker)
+                    break
+        return self.found and len(self.content) >= self.marker_end + self.bytes_after_marker
+
+
+@dataclasses.dataclass
+class StreamResult:
+    content: bytes
+    marker_found: bool
+    complete: bool  # the whole body was downloaded
+    bytes_read: int  # bytes received over the wire, before decompression
+    bytes_saved: int  # bytes we didn't download, if the server told us the length
+    seconds: float
+    seconds_saved: float  # estimated from the download rate of the bytes we did read
+
+
+class HttpClient:
+    """Sends GET requests to tenantapp.com.au with a random user agent, setting
+    the timeout for each request as 15s. Failed requests are retried (or not)
+    as the retry policy decides.
+
+    Shared by the crawlers so they all fetch pages the same way. If a response
+    cache is set (or configured as the default one), pages are looked up there
+    first and successful responses stored in it.
+
+    Every request that goes over the network, retries included, waits for a
+    token from the rate limiter and reports back how it went.
+    """
+
+    def __init__(self,
+                 cache: ResponseCache = None,
+                 retry_policy: RetryPolicy = None,
+                 rate_limiter: AimdRateLimiter = None) -> None:
+        self.cache = cache if cache is not None else get_default_cache()
+        # One policy for all the fetcher's threads, so its circuit breaker pauses all of them
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_default_rate_limiter()
+        self.lock = threading.Lock()
+        self.num_streams: int = 0
+        self.num_stopped_early: int = 0
+        self.total_bytes_read: int = 0
+        self.total_bytes_saved: int = 0
+        self.total_seconds_saved: float = 0.0
+
+    def get_content(self, url: str) -> bytes:
+        """Download the whole page
+
+        Args:
+            url (str): url to be requested
+
+        Returns:
+            bytes: raw html of the page, None if the retry policy gave up
+        """
+        url = rebase_url(url)
+        if self.cache is not None:
+            content = self.get_cached_content(url)
+            if content is not None or self.cache.offline:
+                return content
+
+        print("\nSending GET request to {0}".format(url))
+        return self.retry_policy.run(
+            url, self.rate_limited(lambda timeout: self.send_get(url, timeout)), REQUEST_TIMEOUT)
+
+    def get_html(self, url: str, parse_fn: Callable[[bytes], Any]) -> Any:
+        """Download the whole page and parse it. If the body can't be parsed, the
+        retry policy decides whether to download it again
+
+        Args:
+            url (str): url to be requested
+            parse_fn (Callable[[bytes], Any]): turns the raw page into html, e.g parse_html
+
+        Returns:
+            Any: whatever parse_fn returns, None if the retry policy gave up
+        """
+        url = rebase_url(url)
+        if self.cache is not None:
+            content = self.get_cached_content(url)
+            if content is not None or self.cache.offline:
+                return parse_fn(content) if content is not None else None
+
+        print("\nSending GET request to {0}".format(url))
+        return self.retry_policy.run(
+            url, self.rate_limited(lambda timeout: self.send_get(url, timeout, parse_fn)), REQUEST_TIMEOUT)
+
+    def get_cached_content(self, url: str) -> bytes:
+        content = self.cache.get(url)
+        if content is not None:
+            print("\nUsing cached response for {0}".format(url))
+        elif self.cache.offline:
+            print("\nNo cached response for {0} in offline mode".format(url))
+        return content
+
+    def send_get(self, url: str, timeout: float, parse_fn: Callable[[bytes], Any] = None) -> Tuple[requests.Response, Any]:
+        user_agent: dict[str, str] = get_random_user_agent()
+        response = requests.get(url, timeout=timeout, headers=user_agent)
+
+        print("Got response from {0} in {1} seconds".format(
+            url, response.elapsed.total_seconds()))
+        if response.status_code != 200:
+            return response, None
+        if not response.content.strip():
+            raise IncompletePageError("Empty body from {0}".format(url))
+        value = parse_fn(response.content) if parse_fn is not None else response.content
+        # Only cache bodies we could use
+        if self.cache is not None:
+            self.cache.put(url, response.content)
+        return response, value
+
+    def stream_until(self, url: str, detector: MarkerDetector, max_bytes: int = None) -> StreamResult:
+        """Download the page chunk by chunk and stop as soon as the detector has
+        seen its marker, or once max_bytes have been read
+
+        Args:
+            url (str): url to be requested
+            detector (MarkerDetector): decides when we've read enough
+            max_bytes (int, optional): give up on the marker after this many bytes. Defaults to None.
+
+        Returns:
+            StreamResult: the part of the page that was downloaded, None if the retry policy gave up
+        """
+        url = rebase_url(url)
+        if self.cache is not None:
+            content = self.get_cached_content(url)
+            if content is not None:
+                detector.reset()
+                detector.feed(content)
+                return StreamResult(content, detector.found, True, 0, 0, 0.0, 0.0)
+            if self.cache.offline:
+                return None
+
+        print("\nStreaming GET request to {0}".format(url))
+        return self.retry_policy.run(
+            url, self.rate_limited(lambda timeout: self.send_streamed_get(url, detector, max_bytes, timeout)), REQUEST_TIMEOUT)
+
+    def rate_limited(self, attempt_fn: Callable[[float], Tuple[requests.Response, Any]]) -> Callable[[float], Tuple[requests.Response, Any]]:
+        """Wrap an attempt of the retry policy so it waits for the rate limiter
+        and feeds it the status, latency or timeout of the request
+        """
+        def attempt(timeout: float) -> Tuple[requests.Response, Any]:
+            self.rate_limiter.acquire()
+            start_time = time.perf_counter()
+            try:
+                response, value = attempt_fn(timeout)
+            except requests.exceptions.Timeout:
+                self.rate_limiter.record_timeout()
+                raise
+            self.rate_limiter.record_response(
+                response.status_code, time.perf_counter() - start_time)
+            return response, value
+        return attempt
+
+    def send_streamed_get(self,
+                          url: str,
+                          detector: MarkerDetector,
+                          max_bytes: int,
+                          timeout: float) -> Tuple[requests.Response, StreamResult]:
+        user_agent: dict[str, str] = get_random_user_agent()
+        start_time = time.perf_counter()
+        detector.reset()
+        with requests.get(url, timeout=timeout, headers=user_agent, stream=True) as response:
+            if response.status_code != 200:
+                # Don't bother reading the body, the retry policy decides what to do
+                return response, None
+            complete = True
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                if detector.feed(chunk) or (max_bytes is not None and len(detector.content) >= max_bytes):
+                    complete = False
+                    break
+            bytes_read = response.raw.tell()
+            content_length = response.headers.get('Content-Length')
+        seconds = time.perf_counter() - start_time
+        return response, self.record_stream(detector, complete, bytes_read, content_length, seconds)
+
+    def record_stream(self,
+                      detector: MarkerDetector,
+                      complete: bool,
+                      bytes_read: int,
+                      content_length: str,
+                      seconds: float) -> StreamResult:
+        bytes_saved = 0
+        if not complete and content_length is not None and content_length.isdigit():
+            bytes_saved = max(0, int(content_length) - bytes_read)
+        seconds_saved = seconds * bytes_saved / bytes_read if bytes_read > 0 else 0.0
+
+        with self.lock:
+            self.num_streams += 1
+            self.num_stopped_early += 0 if complete else 1
+            self.total_bytes_read += bytes_read
+            self.total_bytes_saved += bytes_saved
+            self.total_seconds_saved += seconds_saved
+        print("Read {0} bytes in {1:.3f} seconds, saved {2} bytes and ~{3:.3f} seconds".format(
+            bytes_read, seconds, bytes_saved, seconds_saved))
+
+        return StreamResult(content=bytes(detector.content),
+                            marker_found=detector.found,
+                            complete=complete,
+                            bytes_read=bytes_read,
+                            bytes_saved=bytes_saved,
+                            seconds=seconds,
+                            seconds_saved=seconds_saved)
+
+    def report(self) -> str:
+        report = "Streamed {0} pages, {1} stopped early, read {2} bytes, saved {3} bytes and ~{4:.1f} seconds".format(
+            self.num_streams,
+            self.num_stopped_early,
+            self.total_bytes_read,
+            self.total_bytes_saved,
+            self.total_seconds_saved)
+        report += "\n" + self.retry_policy.report()
+        report += "\n" + self.rate_limiter.report()
+        if self.cache is not None:
+            report += "\n" + self.cache.report()
+        return report
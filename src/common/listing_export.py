@@ -0,0 +1,215 @@
+import os
+import csv
+import gzip
+import json
+import datetime
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Tuple
+
+from sqlalchemy import Table
+
+from src.common.constants import STATE_AND_TERRITORY_ALIASES, STATES_URI
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional, only needed for the parquet export
+    pyarrow = None
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+DEFAULT_MAX_BUFFERED_ROWS = 200000  # across partitions, the biggest is written out past this
+DEFAULT_MAX_OPEN_FILES = 64
+DEFAULT_PARQUET_COMPRESSION = 'zstd'
+UNKNOWN_PARTITION = 'unknown'
+
+# Upper cased spellings found in the DB, e.g VICTORIA, to the state's code, e.g VIC
+STATE_CODES: Dict[str, str] = {
+    alias: state.upper()
+    for state, uri in STATES_URI.items()
+    for alias in STATE_AND_TERRITORY_ALIASES[uri]}
+
+
+def get_arrow_schema(table: Table) -> 'pyarrow.Schema':
+    """Arrow types of the columns of a DB table, e.g timestamps stay timestamps
+    and text[] columns become lists of strings
+
+    Args:
+        table (Table): table being exported
+
+    Returns:
+        pyarrow.Schema: one field per column, in table order
+    """
+    if pyarrow is None:
+        raise ImportError("pyarrow is not installed, it's needed to export parquet files")
+    types = {
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        bool: pyarrow.bool_(),
+        datetime.datetime: pyarrow.timestamp('us'),
+        datetime.date: pyarrow.date32(),
+        list: pyarrow.list_(pyarrow.string()),
+    }
+    fields = []
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        fields.append((column.name, types.get(python_type, pyarrow.string())))
+    return pyarrow.schema(fields)
+
+
+def get_partition(row: Mapping[str, Any]) -> Tuple[str, str]:
+    """State code and collection month (YYYY-MM) a row is filed under
+
+    Args:
+        row (Mapping[str, Any]): row of the propertylistings table
+
+    Returns:
+        Tuple[str, str]: e.g ('VIC', '2024-01'), 'unknown' for missing values
+    """
+    state = row['state_and_territory']
+    state = STATE_CODES.get(state.strip().upper(), state.strip().upper()) if state else UNKNOWN_PARTITION
+    collected = row['data_collection_date']
+    if isinstance(collected, (datetime.date, datetime.datetime)):
+        month = collected.strftime('%Y-%m')
+    else:
+        month = str(collected)[:7] if collected else UNKNOWN_PARTITION
+    # Partitions are directory names
+    return state.replace('/', '_') or UNKNOWN_PARTITION, month
+
+
+def check_output_is_new(path: str) -> None:
+    # Leftover part files of an earlier export would be read back as duplicates
+    if (os.path.isdir(path) and os.listdir(path)) or os.path.isfile(path):
+        raise FileExistsError("{0} already exists, export to a new location".format(path))
+
+
+class ParquetExporter:
+    """Writes chunks of rows to parquet files partitioned hive style by state
+    and collection month, e.g state=VIC/collection_month=2024-01/part-0.parquet,
+    with the column types of the DB table.
+
+    Rows are buffered per partition and written as one row group once a
+    partition has row_group_size of them, or when all the buffers together pass
+    max_buffered_rows (the biggest one is written then). At most max_open_files
+    files are kept open, the least recently used one is finished and the
+    partition carries on in a new part file. So memory stays bounded however
+    big the table is.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 table: Table,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                 max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+                 max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+                 compression: str = DEFAULT_PARQUET_COMPRESSION) -> None:
+        check_output_is_new(directory)
+        self.directory = directory
+        self.schema = get_arrow_schema(table)
+        self.columns: List[str] = self.schema.names
+        self.row_group_size = max(1, row_group_size)
+        self.max_buffered_rows = max(self.row_group_size, max_buffered_rows)
+        self.max_open_files = max(1, max_open_files)
+        self.compression = compression
+
+        self.buffers: Dict[Tuple[str, str], Dict[str, List[Any]]] = {}
+        self.num_buffered: int = 0
+        self.writers: 'OrderedDict[Tuple[str, str], pyarrow.parquet.ParquetWriter]' = OrderedDict()
+        self.num_parts: Dict[Tuple[str, str], int] = {}
+
+        self.num_rows: int = 0
+        self.num_row_groups: int = 0
+        self.num_files: int = 0
+
+    def write(self, rows: List[Mapping[str, Any]]) -> None:
+        for row in rows:
+            partition = get_partition(row)
+            buffer = self.buffers.get(partition)
+            if buffer is None:
+                buffer = self.buffers[partition] = {column: [] for column in self.columns}
+            for column in self.columns:
+                buffer[column].append(row[column])
+            self.num_buffered += 1
+            if len(buffer[self.columns[0]]) >= self.row_group_size:
+                self.write_row_group(partition)
+            elif self.num_buffered >= self.max_buffered_rows:
+                self.write_row_group(max(self.buffers, key=lambda key: len(self.buffers[key][self.columns[0]])))
+
+    def write_row_group(self, partition: Tuple[str, str]) -> None:
+        buffer = self.buffers.pop(partition)
+        num_rows = len(buffer[self.columns[0]])
+        self.get_writer(partition).write_table(
+            pyarrow.table(buffer, schema=self.schema), row_group_size=num_rows)
+        self.num_buffered -= num_rows
+        self.num_rows += num_rows
+        self.num_row_groups += 1
+
+    def get_writer(self, partition: Tuple[str, str]) -> 'pyarrow.parquet.ParquetWriter':
+        writer = self.writers.get(partition)
+        if writer is not None:
+            self.writers.move_to_end(partition)
+            return writer
+        if len(self.writers) >= self.max_open_files:
+            _, oldest = self.writers.popitem(last=False)
+            oldest.close()
+        part = self.num_parts.get(partition, 0)
+        self.num_parts[partition] = part + 1
+        state, month = partition
+        directory = os.path.join(self.directory, "state={0}".format(state),
+                                 "collection_month={0}".format(month))
+        os.makedirs(directory, exist_ok=True)
+        writer = pyarrow.parquet.ParquetWriter(
+            os.path.join(directory, "part-{0}.parquet".format(part)), self.schema, compression=self.compression)
+        self.writers[partition] = writer
+        self.num_files += 1
+        return writer
+
+    def close(self) -> None:
+        for partition in list(self.buffers):
+            self.write_row_group(partition)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+    def report(self) -> str:
+        return "Parquet: {0} rows in {1} row groups, {2} files under {3}".format(
+            self.num_rows, self.num_row_groups, self.num_files, self.directory)
+
+
+class CsvGzipExporter:
+    """Writes chunks of rows to a single gzip compressed csv file, one chunk at a
+    time. Lists are written as json arrays and timestamps in ISO format
+    """
+
+    def __init__(self, path: str, table: Table) -> None:
+        check_output_is_new(path)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.columns: List[str] = [column.name for column in table.columns]
+        self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+        self.num_rows: int = 0
+
+    @staticmethod
+    def format_value(value: Any) -> Any:
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple)):
+            return json.dumps(list(value))
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+        return value
+
+    def write(self, rows: List[Mapping[str, Any]]) -> None:
+        self.writer.writerows([self.format_value(row[column]) for column in self.columns]
+                              for row in rows)
+        self.num_rows += len(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def report(self) -> str:
+        return "Csv: {0} rows in {1}".format(self.num_rows, self.path)
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+DEFAULT_METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')
+METRIC_PREFIX = 'tenantapp'
+
+# Stages every entry point times
+FETCH = 'fetch'
+PARSE = 'parse'
+EXTRACT = 'extract'
+EXISTENCE_CHECK = 'existence_check'
+DB_WRITE = 'db_write'
+
+# Upper bounds of the latency buckets in seconds, from a cached parse to a slow page
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, like a Prometheus one, so its
+    size doesn't grow with the number of listings
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # One more bucket for anything above the last bound
+        self.bucket_counts: List[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.min: float = None
+        self.max: float = None
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-th quantile, interpolated inside its bucket"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count > 0 and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count > 0 else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """Counters and per stage latency histograms of one run of an entry point.
+
+    Each stage (fetch, parse, extract, existence_check, db_write) gets a
+    histogram of how long it took, and counters track throughput (listings
+    saved, pages checked...). At the end of a run, write() saves a JSON summary
+    and a Prometheus text file, e.g for the node exporter's textfile collector,
+    so runs can be compared with each other.
+    """
+
+    def __init__(self, job: str = 'tenantapp') -> None:
+        self.job = job
+        self.start_time: float = time.time()
+        # Stages are timed from the fetcher's threads
+        self.lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram()
+            self.histograms[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time the block as one run of the stage, even if it raises"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = time.time() - self.start_time
+        with self.lock:
+            return {
+                'job': self.job,
+                'started_at': self.start_time,
+                'duration_seconds': duration,
+                'counters': {name: {'value': value,
+                                    'per_second': value / duration if duration > 0 else 0.0}
+                             for name, value in self.counters.items()},
+                'stages': {stage: histogram.to_dict()
+                           for stage, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        job = self.job.replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = "{0}_{1}_total".format(METRIC_PREFIX, name)
+                lines.append("# TYPE {0} counter".format(metric))
+                lines.append('{0}{{job="{1}"}} {2}'.format(metric, job, value))
+
+            metric = "{0}_stage_seconds".format(METRIC_PREFIX)
+            if self.histograms:
+                lines.append("# HELP {0} Seconds spent in each stage of the run".format(metric))
+                lines.append("# TYPE {0} histogram".format(metric))
+            for stage, histogram in sorted(self.histograms.items()):
+                labels = 'job="{0}",stage="{1}"'.format(job, stage)
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(metric, labels, bound, cumulative))
+                lines.append('{0}_bucket{{{1},le="+Inf"}} {2}'.format(metric, labels, histogram.count))
+                lines.append('{0}_sum{{{1}}} {2}'.format(metric, labels, histogram.sum))
+                lines.append('{0}_count{{{1}}} {2}'.format(metric, labels, histogram.count))
+        metric = "{0}_run_duration_seconds".format(METRIC_PREFIX)
+        lines.append("# TYPE {0} gauge".format(metric))
+        lines.append('{0}{{job="{1}"}} {2}'.format(metric, job, time.time() - self.start_time))
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str = DEFAULT_METRICS_DIR) -> Tuple[str, str]:
+        """Save the JSON summary and the Prometheus text file of the run
+
+        Args:
+            directory (str, optional): where to write them. Defaults to DEFAULT_METRICS_DIR.
+
+        Returns:
+            Tuple[str, str]: paths of the JSON and Prometheus files
+        """
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, "{0}.json".format(self.job))
+        prometheus_path = os.path.join(directory, "{0}.prom".format(self.job))
+        with open(json_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+        # Written then renamed, the textfile collector must never read half a file
+        with open(prometheus_path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus())
+        os.replace(prometheus_path + '.tmp', prometheus_path)
+        print("Metrics written to {0} and {1}".format(json_path, prometheus_path))
+        return json_path, prometheus_path
+
+    def report(self) -> str:
+        with self.lock:
+            lines = ["{0}: {1} times, {2:.3f}s in total, {3:.4f}s avg, p90 {4:.4f}s".format(
+                stage,
+                histogram.count,
+                histogram.sum,
+                histogram.sum / histogram.count,
+                histogram.quantile(0.9)) for stage, histogram in self.histograms.items()]
+            lines += ["{0}: {1}".format(name, value) for name, value in self.counters.items()]
+        return "Metrics:\n" + "\n".join(lines)
@@ -0,0 +1,47 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Set
+
+
+class PropertyIdIndex:
+    """In-memory lookup of the property ids we already have in the DB.
+
+    tenantapp ids are plain integers, so they are packed into a sorted array of
+    8 byte ints (binary searched) instead of a set of python strings, which keeps
+    even the largest states down to a few hundred KB. Anything that doesn't look
+    like a canonical integer, and ids added during the crawl, go into a small set.
+    """
+
+    def __init__(self, property_ids: Iterable[str] = ()) -> None:
+        self.numeric_ids: array = array('Q')
+        self.other_ids: Set[str] = set()
+        for property_id in property_ids:
+            if self.is_numeric(property_id):
+                self.numeric_ids.append(int(property_id))
+            elif property_id is not None:
+                self.other_ids.add(property_id)
+        self.numeric_ids = array('Q', sorted(set(self.numeric_ids)))
+
+    @staticmethod
+    def is_numeric(property_id: str) -> bool:
+        return property_id is not None and property_id.isdigit() \
+            and str(int(property_id)) == property_id and int(property_id) < 2**64
+
+    def __contains__(self, property_id: str) -> bool:
+        if property_id in self.other_ids:
+            return True
+        return self.is_numeric(property_id) and self.find(int(property_id)) is not None
+
+    def find(self, value: int) -> Optional[int]:
+        """Position of a numeric id in the sorted array, None if it isn't there"""
+        position = bisect_left(self.numeric_ids, value)
+        if position < len(self.numeric_ids) and self.numeric_ids[position] == value:
+            return position
+        return None
+
+    def __len__(self) -> int:
+        return len(self.numeric_ids) + len(self.other_ids)
+
+    def add(self, property_id: str) -> None:
+        if property_id not in self:
+            self.other_ids.add(property_id)
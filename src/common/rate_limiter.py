@@ -0,0 +1,203 @@
+import time
+import threading
+from typing import Dict
+
+DEFAULT_INITIAL_RATE = 2.0  # requests per second
+DEFAULT_MIN_RATE = 0.2
+DEFAULT_MAX_RATE = 20.0
+DEFAULT_BURST = 2.0  # tokens the bucket can save up while idle
+DEFAULT_ADDITIVE_INCREASE = 0.5  # requests per second added per second of healthy responses
+DEFAULT_MULTIPLICATIVE_DECREASE = 0.5
+DEFAULT_LATENCY_TARGET = 5.0  # seconds, slower responses mean the site is struggling
+DEFAULT_DECREASE_COOLDOWN = 2.0  # seconds, one burst of failures only backs off once
+DEFAULT_LOG_INTERVAL = 30.0
+
+THROTTLED = 'throttled'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+SLOW = 'slow'
+
+
+class AimdRateLimiter:
+    """Token bucket which paces every request sent to tenantapp.com.au, with its
+    rate tuned by additive increase / multiplicative decrease (the way TCP
+    finds the bandwidth of a link).
+
+    Every healthy response (2xx under latency_target seconds) raises the rate a
+    little, by about additive_increase requests per second for each second of
+    traffic. A 429/503, another 5xx, a timeout or a slow response cuts it by
+    multiplicative_decrease, at most once every decrease_cooldown seconds so
+    that the requests already in flight when the site pushed back don't all
+    cut it again. The rate stays between min_rate and max_rate.
+
+    Tokens are reserved rather than polled: a caller takes the next token and
+    sleeps until it's due, so waiting threads are served in order.
+    """
+
+    def __init__(self,
+                 initial_rate: float = DEFAULT_INITIAL_RATE,
+                 min_rate: float = DEFAULT_MIN_RATE,
+                 max_rate: float = DEFAULT_MAX_RATE,
+                 burst: float = DEFAULT_BURST,
+                 additive_increase: float = DEFAULT_ADDITIVE_INCREASE,
+                 multiplicative_decrease: float = DEFAULT_MULTIPLICATIVE_DECREASE,
+                 latency_target: float = DEFAULT_LATENCY_TARGET,
+                 decrease_cooldown: float = DEFAULT_DECREASE_COOLDOWN,
+                 log_interval: float = DEFAULT_LOG_INTERVAL) -> None:
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("Rate limits must satisfy 0 < min_rate <= max_rate, got {0} and {1}".format(
+                min_rate, max_rate))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.burst = max(1.0, burst)
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_target = latency_target
+        self.decrease_cooldown = decrease_cooldown
+        self.log_interval = log_interval
+
+        # The fetcher's threads and the sync crawlers all take tokens from here
+        self.lock = threading.Lock()
+        self.tokens: float = self.burst
+        self.last_refill: float = time.monotonic()
+        self.last_decrease: float = float('-inf')
+        self.last_log: float = time.monotonic()
+
+        self.num_requests: int = 0
+        self.num_increases: int = 0
+        self.num_decreases: int = 0
+        self.total_wait: float = 0.0
+        self.decrease_reasons: Dict[str, int] = {}
+        self.lowest_rate: float = self.rate
+        self.highest_rate: float = self.rate
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def reserve(self) -> float:
+        """Take the next token
+
+        Returns:
+            float: seconds to wait before sending the request
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            self.tokens -= 1
+            self.num_requests += 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.total_wait += wait
+            return wait
+
+    def get_wait(self) -> float:
+        """Seconds until a token is free, without taking it. Lets the async
+        fetcher hold back a request instead of parking a thread on it
+        """
+        with self.lock:
+            self.refill(time.monotonic())
+            return -(self.tokens - 1) / self.rate if self.tokens < 1 else 0.0
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_response(self, status_code: int, latency: float) -> None:
+        """Tune the rate from the outcome of a request
+
+        Args:
+            status_code (int): status of the response
+            latency (float): seconds the request took
+        """
+        if status_code in (429, 503):
+            self.decrease(THROTTLED)
+        elif status_code >= 500:
+            self.decrease(SERVER_ERROR)
+        elif 200 <= status_code < 300:
+            if latency > self.latency_target:
+                self.decrease(SLOW)
+            else:
+                self.increase()
+        # 404 and other client errors say nothing about how loaded the site is
+
+    def record_timeout(self) -> None:
+        self.decrease(TIMEOUT)
+
+    def increase(self) -> None:
+        with self.lock:
+            # Grows by ~additive_increase per second whatever the current rate
+            self.rate = min(self.max_rate, self.rate + self.additive_increase / self.rate)
+            self.highest_rate = max(self.highest_rate, self.rate)
+            self.num_increases += 1
+            now = time.monotonic()
+            if now - self.last_log < self.log_interval:
+                return
+            self.last_log = now
+        print("Rate limiter: {0:.2f} requests/s".format(self.rate))
+
+    def decrease(self, reason: str) -> None:
+        with self.lock:
+            self.decrease_reasons[reason] = self.decrease_reasons.get(reason, 0) + 1
+            now = time.monotonic()
+            if now - self.last_decrease < self.decrease_cooldown:
+                return
+            self.last_decrease = now
+            self.last_log = now
+            self.rate = max(self.min_rate, self.rate * self.multiplicative_decrease)
+            self.lowest_rate = min(self.lowest_rate, self.rate)
+            self.num_decreases += 1
+        print("Rate limiter: backing off to {0:.2f} requests/s after {1}".format(
+            self.rate, reason))
+
+    def report(self) -> str:
+        with self.lock:
+            reasons = ", ".join("{0} x{1}".format(reason, count)
+                                for reason, count in sorted(self.decrease_reasons.items()))
+            return "Rate limiter: {0} requests, now {1:.2f} requests/s (lowest {2:.2f}, highest {3:.2f}), {4} increases, {5} decreases, waited {6:.1f}s in total. Push backs: {7}".format(
+                self.num_requests,
+                self.rate,
+                self.lowest_rate,
+                self.highest_rate,
+                self.num_increases,
+                self.num_decreases,
+                self.total_wait,
+                reasons or "none")
+
+
+_default_rate_limiter: AimdRateLimiter = None
+
+
+def get_default_rate_limiter() -> AimdRateLimiter:
+    """Limiter shared by every HttpClient and AsyncFetcher created without
+    one, so all the fetch paths of a process share the same budget. Its rates
+    can be set with configure_rate_limiter, e.g from --rate and --max-rate cli
+    flags
+
+    Returns:
+        AimdRateLimiter: the process wide limiter
+    """
+    global _default_rate_limiter
+    if _default_rate_limiter is None:
+        _default_rate_limiter = AimdRateLimiter()
+    return _default_rate_limiter
+
+
+def configure_rate_limiter(initial_rate: float = DEFAULT_INITIAL_RATE,
+                           max_rate: float = DEFAULT_MAX_RATE) -> AimdRateLimiter:
+    """Replace the process wide limiter, before any crawler is created
+
+    Args:
+        initial_rate (float, optional): requests per second to start at. Defaults to DEFAULT_INITIAL_RATE.
+        max_rate (float, optional): the rate never goes above this. Defaults to DEFAULT_MAX_RATE.
+
+    Returns:
+        AimdRateLimiter: the new default limiter
+    """
+    global _default_rate_limiter
+    _default_rate_limiter = AimdRateLimiter(
+        initial_rate=initial_rate,
+        min_rate=min(DEFAULT_MIN_RATE, max_rate),
+        max_rate=max_rate)
+    return _default_rate_limiter
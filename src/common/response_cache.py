@@ -0,0 +1,266 @@
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, gzip is used without it
+    zstandard = None
+
+LIST_PAGE = 'list'
+DETAIL_PAGE = 'detail'
+AGENCY_PAGE = 'agency'
+
+# How long a cached page is used before it's fetched again, in seconds.
+# Detail pages decide whether a listing went off market, so they go stale quickly
+DEFAULT_TTLS: Dict[str, float] = {
+    LIST_PAGE: 60 * 60,
+    DETAIL_PAGE: 6 * 60 * 60,
+    AGENCY_PAGE: 7 * 24 * 60 * 60,
+}
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+INDEX_FILE_NAME = 'index.sqlite'
+GZIP_SUFFIX = '.gz'
+ZSTD_SUFFIX = '.zst'
+
+
+def get_url_class(url: str) -> str:
+    if '/Rentals/ViewListing/' in url:
+        return DETAIL_PAGE
+    if '/Rentals/Agency/' in url:
+        return AGENCY_PAGE
+    return LIST_PAGE
+
+
+class ResponseCache:
+    """On-disk cache of response bodies, keyed by url.
+
+    Bodies are content addressed: each one is compressed (zstd if installed,
+    gzip otherwise) into a file named after the sha256 of the body, so pages
+    with the same content are only stored once. A sqlite index maps each url to
+    its body and the time it was fetched.
+
+    A cached page is only used while it's younger than the TTL of its url class
+    (list, detail or agency page). Once the bodies take more than max_bytes on
+    disk, the least recently used urls are evicted.
+
+    In offline mode, cached pages are used whatever their age and nothing is
+    ever fetched, so a previous run can be replayed without the live site.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttls: Dict[str, float] = None,
+                 offline: bool = False) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.offline = offline
+        self.suffix = ZSTD_SUFFIX if zstandard is not None else GZIP_SUFFIX
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+
+        # The http client is called from the fetcher's thread pool
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(directory, INDEX_FILE_NAME), check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                url_class TEXT NOT NULL,
+                body_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+            CREATE INDEX IF NOT EXISTS responses_body_hash ON responses (body_hash);
+            CREATE TABLE IF NOT EXISTS bodies (
+                body_hash TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+        self.connection.commit()
+        # Kept up to date on every put and eviction instead of summing the bodies table each time
+        self.total_size: int = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+        self.num_hits: int = 0
+        self.num_misses: int = 0
+        self.num_stale: int = 0
+        self.num_evictions: int = 0
+
+    def get(self, url: str) -> bytes:
+        """Cached body of the url
+
+        Args:
+            url (str): url being requested
+
+        Returns:
+            bytes: body of the page, None if it isn't cached or is older than its TTL
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT r.fetched_at, r.url_class, b.file_name FROM responses r "
+                "JOIN bodies b ON r.body_hash = b.body_hash WHERE r.url = ?", (url,)).fetchone()
+            if row is None:
+                self.num_misses += 1
+                return None
+            fetched_at, url_class, file_name = row
+            if not self.offline and time.time() - fetched_at > self.ttls[url_class]:
+                self.num_stale += 1
+                return None
+            try:
+                content = self.read_body(file_name)
+            except (OSError, EOFError) as e:
+                print("Cached body of {0} is unreadable: {1}".format(url, e))
+                self.num_misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+            self.num_hits += 1
+            return content
+
+    def put(self, url: str, content: bytes) -> None:
+        """Store the body of a page that was just fetched
+
+        Args:
+            url (str): url that was requested
+            content (bytes): body of the response
+        """
+        body_hash = hashlib.sha256(content).hexdigest()
+        now = time.time()
+        with self.lock:
+            if self.connection.execute(
+                    "SELECT 1 FROM bodies WHERE body_hash = ?", (body_hash,)).fetchone() is None:
+                file_name, size = self.write_body(body_hash, content)
+                self.connection.execute(
+                    "INSERT INTO bodies (body_hash, file_name, size) VALUES (?, ?, ?)",
+                    (body_hash, file_name, size))
+                self.total_size += size
+            previous = self.connection.execute(
+                "SELECT body_hash FROM responses WHERE url = ?", (url,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (url, url_class, body_hash, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, get_url_class(url), body_hash, now, now))
+            # Only the body this url pointed to before can have lost its last reference
+            if previous is not None and previous[0] != body_hash:
+                self.delete_body_if_unused(previous[0])
+            if self.total_size > self.max_bytes:
+                self.evict()
+            self.connection.commit()
+
+    def write_body(self, body_hash: str, content: bytes) -> Tuple[str, int]:
+        file_name = os.path.join(
+            'bodies', body_hash[:2], body_hash + self.suffix)
+        path = os.path.join(self.directory, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.suffix == ZSTD_SUFFIX:
+            compressed = zstandard.ZstdCompressor().compress(content)
+        else:
+            compressed = gzip.compress(content)
+        # Write then rename, so a crash never leaves a half written body behind
+        with open(path + '.tmp', 'wb') as file:
+            file.write(compressed)
+        os.replace(path + '.tmp', path)
+        return file_name, len(compressed)
+
+    def read_body(self, file_name: str) -> bytes:
+        with open(os.path.join(self.directory, file_name), 'rb') as file:
+            compressed = file.read()
+        if file_name.endswith(ZSTD_SUFFIX):
+            if zstandard is None:
+                raise OSError("zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        return gzip.decompress(compressed)
+
+    def get_size(self) -> int:
+        return self.total_size
+
+    def evict(self) -> None:
+        """Drop the least recently used urls until the bodies fit in max_bytes"""
+        while self.total_size > self.max_bytes:
+            row = self.connection.execute(
+                "SELECT url, body_hash FROM responses ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            url, body_hash = row
+            self.connection.execute(
+                "DELETE FROM responses WHERE url = ?", (url,))
+            self.num_evictions += 1
+            self.delete_body_if_unused(body_hash)
+
+    def delete_body_if_unused(self, body_hash: str) -> None:
+        if self.connection.execute(
+                "SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone() is not None:
+            return
+        row = self.connection.execute(
+            "SELECT file_name, size FROM bodies WHERE body_hash = ?", (body_hash,)).fetchone()
+        if row is None:
+            return
+        file_name, size = row
+        try:
+            os.remove(os.path.join(self.directory, file_name))
+        except FileNotFoundError:
+            pass
+        self.connection.execute(
+            "DELETE FROM bodies WHERE body_hash = ?", (body_hash,))
+        self.total_size -= size
+
+    def report(self) -> str:
+        return "Response cache: {0} hits, {1} misses, {2} stale, {3} evictions, {4} bytes on disk".format(
+            self.num_hits,
+            self.num_misses,
+            self.num_stale,
+            self.num_evictions,
+            self.get_size())
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_default_cache: ResponseCache = None
+
+
+def get_default_cache() -> ResponseCache:
+    """Cache used by every HttpClient created without one. Set with
+    configure_response_cache, e.g from --cache-dir and --offline cli flags, or
+    the HTTP_CACHE_DIR and HTTP_CACHE_OFFLINE env vars
+
+    Returns:
+        ResponseCache: None if caching is disabled, which is the default
+    """
+    global _default_cache
+    if _default_cache is None and os.environ.get('HTTP_CACHE_DIR'):
+        _default_cache = ResponseCache(
+            os.environ['HTTP_CACHE_DIR'],
+            offline=os.environ.get('HTTP_CACHE_OFFLINE', '').lower() in ('1', 'true'))
+    return _default_cache
+
+
+def configure_response_cache(directory: str, offline: bool = False, max_bytes: int = DEFAULT_MAX_BYTES) -> ResponseCache:
+    """Enable the default response cache
+
+    Args:
+        directory (str): where the cache lives. If None, HTTP_CACHE_DIR is used, and caching is disabled if that isn't set either
+        offline (bool, optional): only replay cached pages. Defaults to False.
+        max_bytes (int, optional): size budget of the cached bodies. Defaults to DEFAULT_MAX_BYTES.
+
+    Returns:
+        ResponseCache: the default cache, None if disabled
+    """
+    global _default_cache
+    directory = directory or os.environ.get('HTTP_CACHE_DIR')
+    if directory is None:
+        if offline:
+            raise ValueError("Offline mode needs a cache directory")
+        _default_cache = None
+    else:
+        _default_cache = ResponseCache(directory, max_bytes, offline=offline)
+    return _default_cache
@@ -0,0 +1,262 @@
+import time
+import random
+import threading
+from typing import Any, Callable, Dict, Tuple
+from urllib.parse import urlparse
+
+import requests
+from bs4.builder import ParserRejectedMarkup
+
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 1.0  # seconds
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_URL_DEADLINE = 120.0  # total seconds spent on one url, attempts and waits included
+DEFAULT_MAX_PARSE_RETRIES = 1  # a page that can't be parsed twice in a row won't get better
+DEFAULT_BREAKER_THRESHOLD = 3  # throttled responses in a row before pausing the host
+DEFAULT_BREAKER_COOLDOWN = 30.0
+MAX_BREAKER_COOLDOWN = 600.0
+
+SUCCESS = 'success'
+RETRY = 'retry'
+THROTTLED = 'throttled'
+GIVE_UP = 'give_up'
+PARSE_ERROR = 'parse_error'
+
+# Listing or agency page doesn't exist (any more), retrying won't help
+GIVE_UP_STATUS_CODES = frozenset((400, 401, 403, 404, 405, 410, 414))
+THROTTLED_STATUS_CODES = frozenset((429, 503))
+
+
+class IncompletePageError(Exception):
+    """A 200 response whose body isn't a whole html page, e.g empty or cut short"""
+
+
+class CircuitBreaker:
+    """Pauses every request to a host once it has answered with too many
+    throttling responses (429/503) in a row, so all the fetcher's workers back
+    off together instead of each hammering the site with its own retries.
+
+    The pause doubles every time the breaker trips again without a success in
+    between, up to MAX_BREAKER_COOLDOWN.
+    """
+
+    def __init__(self,
+                 threshold: int = DEFAULT_BREAKER_THRESHOLD,
+                 cooldown: float = DEFAULT_BREAKER_COOLDOWN) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.num_throttled: Dict[str, int] = {}
+        self.num_trips: Dict[str, int] = {}
+        self.open_until: Dict[str, float] = {}
+        self.total_trips: int = 0
+
+    def wait_until_closed(self, host: str) -> float:
+        """Sleep while the breaker of the host is open
+
+        Args:
+            host (str): host name of the url about to be requested
+
+        Returns:
+            float: seconds waited
+        """
+        with self.lock:
+            wait = self.open_until.get(host, 0.0) - time.monotonic()
+        if wait > 0:
+            print("Circuit breaker open for {0}, waiting {1:.1f} seconds".format(
+                host, wait))
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+    def record_success(self, host: str) -> None:
+        with self.lock:
+            self.num_throttled[host] = 0
+            self.num_trips[host] = 0
+
+    def record_throttled(self, host: str, retry_after: float = None) -> None:
+        with self.lock:
+            self.num_throttled[host] = self.num_throttled.get(host, 0) + 1
+            if self.num_throttled[host] < self.threshold:
+                return
+            self.num_throttled[host] = 0
+            self.num_trips[host] = self.num_trips.get(host, 0) + 1
+            self.total_trips += 1
+            cooldown = min(MAX_BREAKER_COOLDOWN,
+                           self.cooldown * 2 ** (self.num_trips[host] - 1))
+            if retry_after is not None:
+                cooldown = max(cooldown, retry_after)
+            self.open_until[host] = time.monotonic() + cooldown
+            print("Circuit breaker tripped for {0}, pausing for {1:.1f} seconds".format(
+                host, cooldown))
+
+
+class RetryPolicy:
+    """Decides whether and when to retry a request, shared by every request
+    HttpClient sends.
+
+    - 2xx: success
+    - 404, 410 and other client errors: the page is gone, give up straight away
+    - 429 and 503: the site is throttling us, retry and feed the circuit breaker
+    - other 5xx, timeouts and connection errors: retry
+    - invalid urls and other request errors: give up
+    - the body can't be parsed (empty, cut short, rejected by the parser):
+      download it again, but only max_parse_retries times
+
+    Retries wait for an exponential backoff with full jitter (a random delay
+    between 0 and base_delay * 2^attempt, capped at max_delay), or the
+    Retry-After header if the server sent one. No url gets more than
+    max_attempts attempts or url_deadline seconds in total.
+    """
+
+    def __init__(self,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 url_deadline: float = DEFAULT_URL_DEADLINE,
+                 max_parse_retries: int = DEFAULT_MAX_PARSE_RETRIES,
+                 breaker: CircuitBreaker = None) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.url_deadline = url_deadline
+        self.max_parse_retries = max_parse_retries
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.random = random.Random()
+
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            'attempts': 0,
+            'successes': 0,
+            'retries': 0,
+            'gave_up': 0,
+            'deadline_exceeded': 0,
+            'attempts_exhausted': 0,
+            'parse_errors': 0,
+        }
+        self.reasons: Dict[str, int] = {}
+
+    def count(self, name: str, reasons: Dict[str, int] = None) -> None:
+        with self.lock:
+            counters = reasons if reasons is not None else self.counters
+            counters[name] = counters.get(name, 0) + 1
+
+    @staticmethod
+    def classify_status(status_code: int) -> str:
+        if 200 <= status_code < 300:
+            return SUCCESS
+        if status_code in THROTTLED_STATUS_CODES:
+            return THROTTLED
+        if status_code in GIVE_UP_STATUS_CODES or 400 <= status_code < 500:
+            return GIVE_UP
+        return RETRY
+
+    @staticmethod
+    def classify_exception(e: Exception) -> str:
+        if isinstance(e, (IncompletePageError, ParserRejectedMarkup, UnicodeDecodeError)):
+            return PARSE_ERROR
+        if isinstance(e, (requests.exceptions.Timeout,
+                          requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError,
+                          requests.exceptions.ContentDecodingError)):
+            return RETRY
+        if isinstance(e, (requests.exceptions.InvalidURL,
+                          requests.exceptions.MissingSchema,
+                          requests.exceptions.InvalidSchema,
+                          requests.exceptions.URLRequired)):
+            return GIVE_UP
+        return RETRY
+
+    @staticmethod
+    def get_retry_after(response: requests.Response) -> float:
+        value = response.headers.get('Retry-After') if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:  # http date form, not worth parsing
+            return None
+
+    def get_backoff(self, attempt: int, retry_after: float = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self,
+            url: str,
+            attempt_fn: Callable[[float], Tuple[requests.Response, Any]],
+            request_timeout: float) -> Any:
+        """Call attempt_fn until it succeeds or the policy gives up
+
+        Args:
+            url (str): url being requested
+            attempt_fn (Callable[[float], Tuple[requests.Response, Any]]): sends the request with
+                the given timeout, returns the response and the value to give back on success.
+                Can raise IncompletePageError or a parser error if the body isn't usable
+            request_timeout (float): timeout of a single attempt, shortened near the deadline
+
+        Returns:
+            Any: value returned by the successful attempt, None if we gave up
+        """
+        host = urlparse(url).netloc
+        deadline = time.monotonic() + self.url_deadline
+        num_parse_errors = 0
+        for attempt in range(self.max_attempts):
+            self.breaker.wait_until_closed(host)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.count('attempts')
+            response = None
+            try:
+                response, value = attempt_fn(min(request_timeout, remaining))
+                outcome = self.classify_status(response.status_code)
+                reason = "HTTP {0}".format(response.status_code)
+            except Exception as e:
+                outcome = self.classify_exception(e)
+                reason = type(e).__name__
+                print("Attempt #{0} for {1} failed with exception {2}".format(
+                    attempt, url, e))
+
+            if outcome == SUCCESS:
+                self.breaker.record_success(host)
+                self.count('successes')
+                return value
+            self.count(reason, self.reasons)
+            if outcome == PARSE_ERROR:
+                self.count('parse_errors')
+                num_parse_errors += 1
+                if num_parse_errors > self.max_parse_retries:
+                    outcome = GIVE_UP
+            if outcome == GIVE_UP:
+                print("Giving up on {0} after {1}".format(url, reason))
+                self.count('gave_up')
+                return None
+
+            retry_after = self.get_retry_after(response)
+            if outcome == THROTTLED:
+                self.breaker.record_throttled(host, retry_after)
+            delay = self.get_backoff(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                break
+            print("Attempt #{0} for {1} got {2}, retrying in {3:.2f} seconds".format(
+                attempt, url, reason, delay))
+            self.count('retries')
+            time.sleep(delay)
+        else:
+            print("Giving up on {0} after {1} attempts".format(
+                url, self.max_attempts))
+            self.count('attempts_exhausted')
+            return None
+
+        print("Giving up on {0}, over its {1} seconds deadline".format(
+            url, self.url_deadline))
+        self.count('deadline_exceeded')
+        return None
+
+    def report(self) -> str:
+        with self.lock:
+            counters = ", ".join("{0} {1}".format(value, name)
+                                 for name, value in self.counters.items())
+            reasons = ", ".join("{0} x{1}".format(name, value)
+                                for name, value in sorted(self.reasons.items()))
+        return "Retry policy: {0}, {1} circuit breaker trips. Failures: {2}".format(
+            counters, self.breaker.total_trips, reasons or "none")
@@ -0,0 +1,46 @@
+import time
+import zlib
+
+
+class Shard:
+    """One of num_shards disjoint slices of the work, picked by a stable hash
+    of each item's key (property_id, or the agency url), so identical workers
+    started with different --shard values never process the same item and
+    don't need to talk to each other.
+
+    crc32 is used rather than hash() because python salts str hashes per
+    process, which would give every worker a different split.
+    """
+
+    def __init__(self, index: int = 0, num_shards: int = 1) -> None:
+        if num_shards < 1 or not 0 <= index < num_shards:
+            raise ValueError("Shard {0} doesn't exist out of {1} shards".format(
+                index, num_shards))
+        self.index = index
+        self.num_shards = num_shards
+        self.num_processed: int = 0
+        self.start_time: float = time.time()
+
+    def __str__(self) -> str:
+        return "shard {0}/{1}".format(self.index, self.num_shards)
+
+    @property
+    def name(self) -> str:
+        # Suffix for per shard file names, e.g checkpoints
+        return "" if self.num_shards == 1 else "-shard{0}of{1}".format(self.index, self.num_shards)
+
+    def owns(self, key: str) -> bool:
+        if self.num_shards == 1:
+            return True
+        return zlib.crc32(str(key).encode('utf-8')) % self.num_shards == self.index
+
+    def record_processed(self, count: int = 1) -> None:
+        self.num_processed += count
+
+    def report(self) -> str:
+        seconds = time.time() - self.start_time
+        return "{0}: processed {1} items in {2:.1f} seconds, {3:.2f} items/s".format(
+            str(self).capitalize(),
+            self.num_processed,
+            seconds,
+            self.num_processed / seconds if seconds > 0 else 0.0)
@@ -1,10 +1,15 @@
-import pandas as pd
 from typing import List
-from src.property_dataclass import PropertyListing
+from src.property_dataclass import PropertyBatch, PropertyListing
 
 
-def save_to_csv(self, data: List[PropertyListing], file_name: str) -> None:
-    data_type_to_dict = [vars(listing) for listing in data]
-    df = pd.DataFrame(data_type_to_dict)
+def save_to_csv(data: List[PropertyListing], file_name: str) -> None:
+    """Save listings held in memory to {file_name}-results.csv. To export the
+    DB, use src/export_listings.py which streams the table instead
+
+    Args:
+        data (List[PropertyListing]): listings to save
+        file_name (str): prefix of the csv file
+    """
+    df = PropertyBatch.from_listings(data).to_pandas()
     df.to_csv('{0}-results.csv'.format(file_name),
               encoding='utf-8', index=True)
@@ -1,25 +1,184 @@
+import csv
 import random
 import requests
+import threading
 import pandas as pd
+from array import array
 from itertools import cycle
+from typing import Dict, List, Tuple
 
 from .constants import DEFAULT_USER_AGENT
 
 # Rotate user agent https://www.scrapehero.com/how-to-fake-and-rotate-user-agents-using-python-3/
 # Rotate IP address and user agent https://medium.com/geekculture/rotate-ip-address-and-user-agent-to-scrape-data-a010216c8d0c
 
+USER_AGENTS_FILE = "user_agents.csv"
+
+# Relative sampling weight for each value of the Popularity column
+POPULARITY_WEIGHTS: dict[str, float] = {
+    'Very common': 8.0,
+    'Common': 4.0,
+    'Average': 2.0,
+    'Uncommon': 1.0,
+}
+DEFAULT_POPULARITY_WEIGHT = 1.0
+
+
+class UserAgentPool:
+    """User agents loaded once from the csv file and kept in flat arrays.
+
+    Agents are sampled in O(1) with the alias method (Vose's construction of
+    Walker's table), weighted by their Popularity. Hardware Type and OS are stored as small integer codes so the
+    pool can be filtered without keeping a row object per agent.
+    Ref: https://www.keithschwarz.com/darts-dice-coins/
+    """
+
+    def __init__(self,
+                 agents: List[str],
+                 weights: List[float],
+                 hardware_types: List[str] = None,
+                 operating_systems: List[str] = None) -> None:
+        if len(agents) == 0:
+            raise ValueError("User agent pool cannot be empty")
+        self.agents: Tuple[str, ...] = tuple(agents)
+        self.weights: array = array('d', weights)
+        self.hardware_type_names, self.hardware_type_codes = self.encode(
+            hardware_types or [''] * len(agents))
+        self.os_names, self.os_codes = self.encode(
+            operating_systems or [''] * len(agents))
+        self.probabilities, self.aliases = self.build_alias_table(self.weights)
+        self.filtered_pools: Dict[Tuple[str, str], UserAgentPool] = {}
+
+    @classmethod
+    def from_csv(cls, file_name: str = USER_AGENTS_FILE) -> 'UserAgentPool':
+        """Read the csv once, dropping duplicated user agents
+
+        Args:
+            file_name (str): csv downloaded by download_agent_headers
+
+        Returns:
+            UserAgentPool: pool of unique user agents
+        """
+        agents, weights, hardware_types, operating_systems = [], [], [], []
+        seen = set()
+        with open(file_name, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                agent = row['User agent']
+                if not agent or agent in seen:
+                    continue
+                seen.add(agent)
+                agents.append(agent)
+                weights.append(POPULARITY_WEIGHTS.get(
+                    row.get('Popularity'), DEFAULT_POPULARITY_WEIGHT))
+                hardware_types.append(row.get('Hardware Type') or '')
+                operating_systems.append(row.get('OS') or '')
+        return cls(agents, weights, hardware_types, operating_systems)
+
+    @staticmethod
+    def encode(values: List[str]) -> Tuple[Tuple[str, ...], array]:
+        names: Dict[str, int] = {}
+        codes = array('H', (names.setdefault(v, len(names)) for v in values))
+        return tuple(names), codes
+
+    @staticmethod
+    def build_alias_table(weights: array) -> Tuple[array, array]:
+        """Vose's alias method: split the weights into n columns of equal height,
+        each holding at most 2 agents, so sampling is one random column + one coin flip
+
+        Args:
+            weights (array): weight of each agent
+
+        Returns:
+            Tuple[array, array]: probability of keeping the column's own agent, and its alias
+        """
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        probabilities = array('d', [1.0] * n)
+        aliases = array('l', range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        return probabilities, aliases
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def sample(self) -> str:
+        column = random.randrange(len(self.agents))
+        if random.random() < self.probabilities[column]:
+            return self.agents[column]
+        return self.agents[self.aliases[column]]
+
+    def filter(self, hardware_type: str = None, os: str = None) -> 'UserAgentPool':
+        """Sub-pool of agents matching the given Hardware Type and OS. Hardware type
+        matches by prefix, e.g 'Mobile' includes 'Mobile - Phone'. Sub-pools are cached.
+
+        Args:
+            hardware_type (str, optional): value of the Hardware Type column
+            os (str, optional): value of the OS column
+
+        Returns:
+            UserAgentPool: pool with only the matching agents
+
+        Raises:
+            ValueError: no agent matches the given Hardware Type and OS
+        """
+        key = ((hardware_type or '').lower(), (os or '').lower())
+        if key not in self.filtered_pools:
+            indexes = [
+                i for i in range(len(self.agents))
+                if self.hardware_type_names[self.hardware_type_codes[i]].lower().startswith(key[0])
+                and (not key[1] or self.os_names[self.os_codes[i]].lower() == key[1])
+            ]
+            if not indexes:
+                raise ValueError("No user agent with hardware type {0!r} and OS {1!r} in a pool of {2}".format(
+                    hardware_type, os, len(self.agents)))
+            self.filtered_pools[key] = UserAgentPool(
+                [self.agents[i] for i in indexes],
+                [self.weights[i] for i in indexes],
+                [self.hardware_type_names[self.hardware_type_codes[i]]
+                    for i in indexes],
+                [self.os_names[self.os_codes[i]] for i in indexes])
+        return self.filtered_pools[key]
+
+
+_user_agent_pool: UserAgentPool = None
+_user_agent_pool_lock = threading.Lock()
+
+
+def get_user_agent_pool() -> UserAgentPool:
+    """Pool shared by every crawler in the process, loaded on first use"""
+    global _user_agent_pool
+    if _user_agent_pool is None:
+        with _user_agent_pool_lock:
+            if _user_agent_pool is None:
+                _user_agent_pool = UserAgentPool.from_csv()
+    return _user_agent_pool
+
 
 def load_user_headers():
+    """Deprecated: reads the whole csv on every call, use get_user_agent_pool instead"""
     headers = set()
-    df = pd.read_csv("user_agents.csv")
+    df = pd.read_csv(USER_AGENTS_FILE)
     for i, r in df.iterrows():
         headers.add(r['User agent'])
     return headers
 
 
-def get_random_user_agent() -> dict[str, str]:
-    headers = load_user_headers()
-    agent: str = random.choice(list(headers))
+def get_random_user_agent(hardware_type: str = None, os: str = None) -> dict[str, str]:
+    pool = get_user_agent_pool()
+    if hardware_type or os:
+        pool = pool.filter(hardware_type, os)
+    agent: str = pool.sample()
     user_agent = {
         'User-Agent': agent,
         'Accept': 'application/json, text/javascript, */*; q=0.01',
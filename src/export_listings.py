@@ -0,0 +1,127 @@
+"""This program exports the propertylistings table for analysis, streaming it
+from the DB a batch at a time so neither the DB nor this process ever holds the
+whole table. It writes parquet files partitioned by state and collection month
+(typed columns, zstd compressed) and/or a gzip compressed csv
+"""
+import os
+import time
+import argparse
+from typing import Any, List, Mapping
+
+from src.property_database import DB_STREAM_BATCH_SIZE, PropertyDatabase
+from src.common.constants import STATE_AND_TERRITORY_ALIASES, STATES_URI
+from src.common.listing_export import (
+    CsvGzipExporter, DEFAULT_MAX_BUFFERED_ROWS, DEFAULT_ROW_GROUP_SIZE, ParquetExporter
+)
+
+PARQUET = 'parquet'
+CSV = 'csv'
+BOTH = 'both'
+DEFAULT_OUTPUT_DIR = 'exports'
+CSV_FILE_NAME = 'propertylistings.csv.gz'
+
+
+class ListingExport:
+    def __init__(self, db: PropertyDatabase, exporters: List[Any]) -> None:
+        self.db = db
+        # Every exporter is given each batch of rows, so the table is read once whatever the formats
+        self.exporters = exporters
+
+    def write(self, rows: List[Mapping[str, Any]]) -> None:
+        for exporter in self.exporters:
+            exporter.write(rows)
+
+    def run(self, state: str = None, batch_size: int = DB_STREAM_BATCH_SIZE) -> int:
+        """Stream the table (or one state) into every exporter
+
+        Args:
+            state (str, optional): state to export, e.g vic. Defaults to None, every state.
+            batch_size (int, optional): rows read from the DB per query. Defaults to DB_STREAM_BATCH_SIZE.
+
+        Returns:
+            int: number of rows exported
+        """
+        aliases = STATE_AND_TERRITORY_ALIASES[STATES_URI[state]] if state else None
+        num_rows = 0
+        start_time = time.time()
+        try:
+            for rows in self.db.stream_all(aliases, batch_size):
+                self.write(rows)
+                num_rows += len(rows)
+                print(f"Exported {num_rows} rows in {time.time() - start_time:.1f} s")
+        finally:
+            for exporter in self.exporters:
+                exporter.close()
+        for exporter in self.exporters:
+            print(exporter.report())
+        return num_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the property listings DB table to parquet and/or compressed csv")
+
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=[PARQUET, CSV, BOTH],
+        default=PARQUET,
+        help="Files to write. Default is parquet",
+        required=False
+    )
+
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=DEFAULT_OUTPUT_DIR,
+        help="Directory the export is written to, it must not exist or be empty. Default is exports",
+        required=False
+    )
+
+    parser.add_argument(
+        "--state",
+        type=str,
+        choices=list(STATES_URI),
+        default=None,
+        help="Only export this state. Default is every state",
+        required=False
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DB_STREAM_BATCH_SIZE,
+        help="Rows read from the DB per query. Default is 5000",
+        required=False
+    )
+
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=DEFAULT_ROW_GROUP_SIZE,
+        help="Rows per parquet row group. Default is 50000",
+        required=False
+    )
+
+    parser.add_argument(
+        "--max-buffered-rows",
+        type=int,
+        default=DEFAULT_MAX_BUFFERED_ROWS,
+        help="Rows held in memory across all parquet partitions. Default is 200000",
+        required=False
+    )
+
+    # Parsing command args
+    args = parser.parse_args()
+    print(f"Format: {args.format}, output dir: {args.output_dir}, state: {args.state or 'all'}")
+
+    db = PropertyDatabase()
+    exporters = []
+    if args.format in (PARQUET, BOTH):
+        exporters.append(ParquetExporter(os.path.join(args.output_dir, PARQUET),
+                                         db.table,
+                                         row_group_size=args.row_group_size,
+                                         max_buffered_rows=args.max_buffered_rows))
+    if args.format in (CSV, BOTH):
+        exporters.append(CsvGzipExporter(os.path.join(args.output_dir, CSV_FILE_NAME), db.table))
+    ListingExport(db, exporters).run(args.state, args.batch_size)
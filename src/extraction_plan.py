@@ -0,0 +1,163 @@
+import logging
+from typing import Dict, List, Tuple
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+from src.common.constants import (
+    TAG_NAME,
+    ATTRIBUTE_NAME,
+    ATTRIBUTE_VALUE,
+    PROPERTY_DETAIL_HTML_ATTRS
+)
+from src.input_html_extractor import InputHtmlExtractor
+from src.property_dataclass import PropertyListing
+
+# Keys of PROPERTY_DETAIL_HTML_ATTRS for the parent containers of the detail page fields
+DETAIL_PAGE_CONTAINERS: List[str] = [
+    'listing_title',
+    'listing_description',
+    'beds_baths_garages',
+    'property_features',
+    'google_maps_location_url',
+    'gps_coordinates',
+    'suburb_info',
+    'agent_name',
+    'agency_details',
+    'off_market_status',
+]
+
+ContainerSpec = Tuple[str, str, str]
+
+
+class DetailPageExtractionPlan:
+    """Extracts every field of a detail page in one go.
+
+    The Transformer getters each search the whole page for their parent
+    container, so collecting a listing walks the page about 15 times
+    (bedrooms/bathrooms/garages and suburb/state/postcode even share a
+    container). The plan groups the containers of PROPERTY_DETAIL_HTML_ATTRS by
+    tag and attribute, finds all of them in a single traversal, and reads every
+    field from the cached containers. Results are the same as the getters'.
+    """
+
+    def __init__(self, extractor: InputHtmlExtractor) -> None:
+        self.extractor = extractor
+        self.container_specs: Dict[str, ContainerSpec] = {}
+        self.specs_by_tag: Dict[str, List[ContainerSpec]] = {}
+        for key in DETAIL_PAGE_CONTAINERS:
+            spec: ContainerSpec = (
+                PROPERTY_DETAIL_HTML_ATTRS[key][TAG_NAME],
+                PROPERTY_DETAIL_HTML_ATTRS[key][ATTRIBUTE_NAME],
+                PROPERTY_DETAIL_HTML_ATTRS[key][ATTRIBUTE_VALUE])
+            self.container_specs[key] = spec
+            specs = self.specs_by_tag.setdefault(spec[0], [])
+            if spec not in specs:
+                specs.append(spec)
+        self.num_specs: int = sum(len(specs) for specs in self.specs_by_tag.values())
+
+    @staticmethod
+    def matches(tag: Tag, attr_key: str, attr_val: str) -> bool:
+        # Same rule as bs4's find(tag, attrs={attr_key: attr_val})
+        value = tag.get(attr_key)
+        if isinstance(value, list):
+            return attr_val in value or ' '.join(value) == attr_val
+        return value == attr_val
+
+    def find_containers(self, html: BeautifulSoup) -> Dict[ContainerSpec, BeautifulSoup]:
+        """Find the first tag matching each container spec, like find() would
+
+        Args:
+            html (BeautifulSoup): html of the listing's page
+
+        Returns:
+            Dict[ContainerSpec, BeautifulSoup]: container of each spec found on the page
+        """
+        containers: Dict[ContainerSpec, BeautifulSoup] = {}
+        if not isinstance(html, Tag):
+            # Other parser backends do their own (fast) searching
+            for specs in self.specs_by_tag.values():
+                for spec in specs:
+                    container = self.extractor.get_single_tag_with_attrs(
+                        spec[0], spec[1], spec[2], html)
+                    if container is not None:
+                        containers[spec] = container
+            return containers
+
+        for element in html.descendants:
+            specs = self.specs_by_tag.get(element.name) \
+                if isinstance(element, Tag) else None
+            if not specs:
+                continue
+            for spec in specs:
+                if spec not in containers and self.matches(element, spec[1], spec[2]):
+                    containers[spec] = element
+            if len(containers) == self.num_specs:
+                break
+        return containers
+
+    def extract(self, html: BeautifulSoup, data: PropertyListing) -> PropertyListing:
+        """Fill the detail page fields of the listing from its page
+
+        Args:
+            html (BeautifulSoup): html of the listing's page
+            data (PropertyListing): data object holding general info from the list page
+
+        Returns:
+            PropertyListing: data object with the detail page fields filled in
+        """
+        found = self.find_containers(html)
+        containers = {key: found.get(spec)
+                      for key, spec in self.container_specs.items()}
+        extractor = self.extractor
+
+        data.listing_title = extractor.get_tag_content_without_attrs(
+            PROPERTY_DETAIL_HTML_ATTRS['listing_title_subtag'][TAG_NAME],
+            containers['listing_title'])
+        data.listing_description = containers['listing_description'].get_text(
+        ).strip().replace("\n", "\\n")
+
+        if containers['beds_baths_garages'] is None:
+            raise IndexError("Beds, baths and garages not found on the detail page")
+        beds_baths_garages = [tag.get_text() for tag in extractor.get_all_tags_by_class(
+            PROPERTY_DETAIL_HTML_ATTRS['beds_baths_garages_subtags'][TAG_NAME],
+            PROPERTY_DETAIL_HTML_ATTRS['beds_baths_garages_subtags'][ATTRIBUTE_VALUE],
+            containers['beds_baths_garages'])]
+        data.num_bedrooms = beds_baths_garages[0].replace("\n", "").strip()
+        data.num_bathrooms = beds_baths_garages[1].replace("\n", "").strip()
+        data.num_garages = beds_baths_garages[2].replace("\n", "").strip()
+
+        data.property_features = [tag.get_text() for tag in extractor.get_all_tags_by_class(
+            PROPERTY_DETAIL_HTML_ATTRS['property_features_subtag'][TAG_NAME],
+            PROPERTY_DETAIL_HTML_ATTRS['property_features_subtag'][ATTRIBUTE_VALUE],
+            containers['property_features'])]
+        data.google_maps_location_url = extractor.get_href(
+            None, None, html_block=containers['google_maps_location_url'])
+        data.gps_coordinates = extractor.get_all_tags_without_attrs(
+            PROPERTY_DETAIL_HTML_ATTRS['gps_coordinates_subtag'][TAG_NAME],
+            html_block=containers['gps_coordinates'])[0].get_text().strip()
+
+        suburb_info = extractor.get_all_tags_without_attrs(
+            PROPERTY_DETAIL_HTML_ATTRS['suburb_info_subtag'][TAG_NAME],
+            html_block=containers['suburb_info'])[1].get_text().strip().split()
+        data.suburb = " ".join(suburb_info[1:-2])
+        data.state_and_territory = suburb_info[-2]
+        data.postcode = suburb_info[-1]
+
+        data.agent_name = extractor.get_tag_content_without_attrs(
+            PROPERTY_DETAIL_HTML_ATTRS['agent_name_subtag'][TAG_NAME],
+            containers['agent_name'])
+        data.off_market = containers['off_market_status'] is not None
+
+        try:
+            agency_details = containers['agency_details']
+            agency_full_details = ' '.join(
+                agency_details.get_text().strip().split())
+            data.agency_name = extractor.get_tag_content_without_attrs(
+                PROPERTY_DETAIL_HTML_ATTRS['agency_name_subtag'][TAG_NAME],
+                agency_details)
+            data.agency_address = agency_full_details.replace(
+                data.agency_name, "").strip()
+        except AttributeError as e:
+            logging.exception(f"Failed to get agency details: {e}")
+
+        return data
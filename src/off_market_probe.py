@@ -0,0 +1,83 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src.common.constants import (
+    TAG_NAME,
+    ATTRIBUTE_NAME,
+    ATTRIBUTE_VALUE,
+    PROPERTY_DETAIL_HTML_ATTRS
+)
+from src.common.html_parser import is_parser_available, parse_html
+from src.transformer import Transformer
+
+STRAINER_PARSER = 'lxml' if is_parser_available('lxml') else 'html.parser'
+
+
+class OffMarketProbe:
+    """Answers Transformer.get_off_market_status for a raw detail page without
+    building the full tree of the page.
+
+    1. Fast path: scan the bytes for the class name of the off market banner.
+       If it is nowhere in the page, the banner can't be either.
+    2. If the class name shows up (it could also be in a script or stylesheet),
+       parse only the matching tags with a SoupStrainer to confirm.
+    3. If that fails for any reason, fall back to parsing the whole page.
+
+    With verify_every > 0, every n-th fast path answer is also checked against
+    a full parse, and any mismatch is counted and the full parse answer used.
+    """
+
+    def __init__(self, transformer: Transformer, verify_every: int = 0) -> None:
+        self.transformer = transformer
+        self.verify_every = verify_every
+        banner = PROPERTY_DETAIL_HTML_ATTRS['off_market_status']
+        self.marker: bytes = banner[ATTRIBUTE_VALUE].encode('utf-8')
+        self.strainer = SoupStrainer(
+            banner[TAG_NAME], attrs={banner[ATTRIBUTE_NAME]: banner[ATTRIBUTE_VALUE]})
+
+        self.num_fast_path: int = 0
+        self.num_strained: int = 0
+        self.num_fallback: int = 0
+        self.num_verified: int = 0
+        self.num_mismatches: int = 0
+
+    def is_off_market(self, content: bytes) -> bool:
+        """Whether the page has the off market banner
+
+        Args:
+            content (bytes): raw html of the listing's detail page
+
+        Returns:
+            bool: same answer as Transformer.get_off_market_status on the parsed page
+        """
+        if self.marker not in content:
+            self.num_fast_path += 1
+            if self.verify_every > 0 and self.num_fast_path % self.verify_every == 0:
+                return self.verify(content, False)
+            return False
+
+        try:
+            banners = BeautifulSoup(
+                content, STRAINER_PARSER, parse_only=self.strainer)
+            self.num_strained += 1
+            return self.transformer.get_off_market_status(banners)
+        except Exception as e:
+            print("Partial parse failed, parsing whole page: {0}".format(e))
+            self.num_fallback += 1
+            return self.transformer.get_off_market_status(parse_html(content))
+
+    def verify(self, content: bytes, fast_path_answer: bool) -> bool:
+        self.num_verified += 1
+        answer = self.transformer.get_off_market_status(parse_html(content))
+        if answer != fast_path_answer:
+            self.num_mismatches += 1
+            print("Fast path said off market = {0} but full parse says {1}".format(
+                fast_path_answer, answer))
+        return answer
+
+    def report(self) -> str:
+        return "Off market probe: {0} fast path, {1} partial parse, {2} full parse fallback, {3} verified ({4} mismatches)".format(
+            self.num_fast_path,
+            self.num_strained,
+            self.num_fallback,
+            self.num_verified,
+            self.num_mismatches)
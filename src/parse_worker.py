@@ -0,0 +1,52 @@
+"""Functions run in the worker processes of TenantAppCrawler's parse pool.
+
+Only raw page bytes and plain dicts go in and out of a worker, BeautifulSoup
+objects never cross the process boundary.
+"""
+import time
+from typing import Any, Dict, Tuple
+
+from src.common.html_parser import parse_html, set_default_parser
+from src.input_html_extractor import InputHtmlExtractor
+from src.property_dataclass import PropertyListing
+from src.transformer import Transformer
+
+_transformer: Transformer = None
+
+
+def init_parse_worker(parser: str) -> None:
+    """Runs once in each worker process when the pool starts
+
+    Args:
+        parser (str): html parser backend selected in the main process
+    """
+    global _transformer
+    set_default_parser(parser)
+    _transformer = Transformer(InputHtmlExtractor(None))
+
+
+def extract_detail_page(content: bytes, fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Parse a detail page and extract its fields
+
+    Args:
+        content (bytes): raw html of the listing's page
+        fields (Dict[str, Any]): fields of the listing collected from the list page
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, float]]: fields of the listing with the
+            detail page ones filled in, and seconds spent parsing and extracting
+    """
+    global _transformer
+    if _transformer is None:
+        _transformer = Transformer(InputHtmlExtractor(None))
+
+    start_time = time.perf_counter()
+    html = parse_html(content)
+    parsed_time = time.perf_counter()
+
+    data: PropertyListing = PropertyListing.from_dict(fields)
+    data = _transformer.get_detail_page_fields(html, data)
+    extracted_time = time.perf_counter()
+
+    return data.to_dict(), {'parse': parsed_time - start_time,
+                        'extract': extracted_time - parsed_time}
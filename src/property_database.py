@@ -1,12 +1,17 @@
 import os
+import logging
 import pandas as pd
 from sqlalchemy import (
-    create_engine, MetaData, Table, insert, select, and_, update, or_
+    create_engine, MetaData, Table, insert, select, and_, update, or_, func, bindparam
 )
 from sqlalchemy.orm import sessionmaker, Session
 
-from typing import List
-from src.property_dataclass import PropertyListing
+from typing import Any, Callable, Iterator, List, Mapping, Tuple, Union
+from src.common.batch_buffer import (
+    BatchBuffer, DEFAULT_MAX_ROWS, DEFAULT_MAX_BYTES, DEFAULT_MAX_INTERVAL
+)
+from src.property_dataclass import PropertyBatch, PropertyListing
+from src.common.card_fingerprint import CARD_FIELDS
 
 DB_USERNAME = os.environ.get('DB_USERNAME')
 DB_PASSWORD = os.environ.get('DB_PASSWORD')
@@ -15,6 +20,12 @@ DB_PORT = os.environ.get('DB_PORT')
 DB_NAME = os.environ.get('DB_NAME')
 DB_SCHEMA = os.environ.get('DB_SCHEMA')
 DB_CONN_POOL_SIZE = 50
+# psycopg2 only pages INSERTs by default, this pages executemany UPDATEs too
+# (execute_batch) instead of one round trip per row
+DB_EXECUTEMANY_MODE = 'values_plus_batch'
+DB_STREAM_BATCH_SIZE = 5000
+# Kept from the first time a listing was scraped when its entry is updated
+LISTING_KEPT_FIELDS = ('property_id', 'property_url', 'ad_posted_date', 'data_collection_date')
 
 # Ref: using sqlalchemy https://towardsdatascience.com/sqlalchemy-python-tutorial-79a577141a91
 
@@ -28,7 +39,8 @@ class PropertyDatabase:
 
     def create_db_engine(self):
         dbUrl = f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        return create_engine(dbUrl, pool_size=DB_CONN_POOL_SIZE)
+        return create_engine(dbUrl, pool_size=DB_CONN_POOL_SIZE,
+                             executemany_mode=DB_EXECUTEMANY_MODE)
 
     def get_real_estate_table(self) -> Table:
         """Define the table entity based on the table from DB
@@ -40,6 +52,15 @@ class PropertyDatabase:
             'propertylistings', self.metadata, autoload=True, autoload_with=self.dbEngine)
         return realestate_table
 
+    def has_card_fingerprint(self) -> bool:
+        """Whether the table has the card_fingerprint column yet, it's added by
+        the migration at the end of src/sql/create_db.sql"""
+        return 'card_fingerprint' in self.table.columns
+
+    def get_missing_columns(self) -> List[str]:
+        """Listing fields the table has no column for, left out of inserts and updates"""
+        return [] if self.has_card_fingerprint() else ['card_fingerprint']
+
     def select_all(self) -> None:
         """SELECT * FROM TABLE
 
@@ -77,6 +98,156 @@ class PropertyDatabase:
                 )).order_by(self.table.columns.ad_posted_date)
         return self.conn.execute(query).fetchall()
 
+    def stream_where_not_off_market(self,
+                                    state_and_territory: str,
+                                    columns: List[str],
+                                    offset: int = 0,
+                                    limit: int = None,
+                                    batch_size: int = DB_STREAM_BATCH_SIZE,
+                                    after: Tuple[Any, str] = None) -> Iterator[Mapping[str, Any]]:
+        """Streaming version of select_all_where_not_off_market, which only reads
+        the given columns and pages with keyset pagination instead of OFFSET
+
+        Args:
+            state_and_territory (str): state to filter on
+            columns (List[str]): names of the columns the caller needs
+            offset (int, optional): number of rows to skip. Defaults to 0.
+            limit (int, optional): max number of rows. Defaults to None, all rows.
+            batch_size (int, optional): rows fetched per query. Defaults to DB_STREAM_BATCH_SIZE.
+            after (Tuple[Any, str], optional): (ad_posted_date, property_id) to start after,
+                e.g from a checkpoint, instead of offset. Defaults to None.
+
+        Yields:
+            Iterator[Mapping[str, Any]]: each row, ordered by ad_posted_date
+        """
+        condition = and_(self.table.columns.off_market == False,
+                         self.table.columns.ad_removed_date == None,
+                         self.table.columns.state_and_territory == state_and_territory)
+        return self.stream_keyset(condition, columns, offset, limit, batch_size, after)
+
+    def stream_where_no_agency_details(self,
+                                       columns: List[str],
+                                       batch_size: int = DB_STREAM_BATCH_SIZE,
+                                       after: Tuple[Any, str] = None) -> Iterator[Mapping[str, Any]]:
+        """Streaming version of select_where_no_agency_details, which only reads
+        the given columns and pages with keyset pagination
+
+        Args:
+            columns (List[str]): names of the columns the caller needs
+            batch_size (int, optional): rows fetched per query. Defaults to DB_STREAM_BATCH_SIZE.
+            after (Tuple[Any, str], optional): (ad_posted_date, property_id) to start after. Defaults to None.
+
+        Yields:
+            Iterator[Mapping[str, Any]]: each row, ordered by ad_posted_date
+        """
+        condition = or_(self.table.columns.agency_name == None,
+                        self.table.columns.agency_address == None)
+        return self.stream_keyset(condition, columns, 0, None, batch_size, after)
+
+    def stream_keyset(self,
+                      condition,
+                      columns: List[str],
+                      offset: int = 0,
+                      limit: int = None,
+                      batch_size: int = DB_STREAM_BATCH_SIZE,
+                      after: Tuple[Any, str] = None) -> Iterator[Mapping[str, Any]]:
+        """Read the rows matching condition in (ad_posted_date, property_id) order,
+        one batch per query. Each query starts right after the last row of the
+        previous one, so it costs the same however deep we are, unlike OFFSET, and
+        only one batch is ever held in memory. Rows without an ad_posted_date
+        come last, ordered by property_id.
+
+        Rows updated while we stream (e.g marked off market) may drop out of the
+        condition, which doesn't move the position of the next batch.
+
+        Args:
+            condition: where clause of the query
+            columns (List[str]): names of the columns the caller needs
+            offset (int, optional): number of rows to skip. Defaults to 0.
+            limit (int, optional): max number of rows. Defaults to None, all rows.
+            batch_size (int, optional): rows fetched per query. Defaults to DB_STREAM_BATCH_SIZE.
+            after (Tuple[Any, str], optional): (ad_posted_date, property_id) to start after. Defaults to None.
+
+        Yields:
+            Iterator[Mapping[str, Any]]: each row
+        """
+        posted_date = self.table.columns.ad_posted_date
+        property_id = self.table.columns.property_id
+        selected = [self.table.columns[column] for column in columns]
+        selected += [column for column in (posted_date, property_id)
+                     if column.name not in columns]
+
+        last_key: Tuple[Any, str] = after
+        if last_key is None and offset > 0:
+            # One OFFSET query to find where to start, then keyset from there
+            last_key = self.conn.execute(
+                select([posted_date, property_id]).where(condition).order_by(
+                    posted_date.is_(None), posted_date, property_id).offset(offset - 1).limit(1)).fetchone()
+            if last_key is None:
+                return
+        reading_nulls = last_key is not None and last_key[0] is None
+
+        num_rows = 0
+        while limit is None or num_rows < limit:
+            query = select(selected).where(condition)
+            if not reading_nulls:
+                query = query.where(posted_date != None)
+                if last_key is not None:
+                    query = query.where(or_(
+                        posted_date > last_key[0],
+                        and_(posted_date == last_key[0], property_id > last_key[1])))
+            else:
+                query = query.where(posted_date == None)
+                if last_key is not None:
+                    query = query.where(property_id > last_key[1])
+            num_to_read = batch_size if limit is None else min(
+                batch_size, limit - num_rows)
+            rows = self.conn.execute(query.order_by(
+                posted_date, property_id).limit(num_to_read)).fetchall()
+
+            for row in rows:
+                yield row._mapping
+            num_rows += len(rows)
+            if len(rows) == num_to_read:
+                last_key = (rows[-1].ad_posted_date, rows[-1].property_id)
+            elif not reading_nulls:
+                reading_nulls = True
+                last_key = None
+            else:
+                return
+
+    def stream_all(self,
+                   state_and_territory_aliases: List[str] = None,
+                   batch_size: int = DB_STREAM_BATCH_SIZE) -> Iterator[List[Mapping[str, Any]]]:
+        """Every row of the table (or of a state), one batch per query, paged on the
+        id primary key so the rows are read once each in bounded memory, e.g
+        to export the table
+
+        Args:
+            state_and_territory_aliases (List[str], optional): upper cased spellings of
+                the state to filter on. Defaults to None, all rows.
+            batch_size (int, optional): rows fetched per query. Defaults to DB_STREAM_BATCH_SIZE.
+
+        Yields:
+            Iterator[List[Mapping[str, Any]]]: each batch of rows, ordered by id
+        """
+        id_column = self.table.columns.id
+        last_id = None
+        while True:
+            query = select([self.table])
+            if state_and_territory_aliases:
+                query = query.where(func.upper(
+                    self.table.columns.state_and_territory).in_(state_and_territory_aliases))
+            if last_id is not None:
+                query = query.where(id_column > last_id)
+            rows = self.conn.execute(query.order_by(id_column).limit(batch_size)).fetchall()
+            if not rows:
+                return
+            yield [row._mapping for row in rows]
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1].id
+
     def select_with_same_id(self, property_id: str):
         """Check if there's an existing entry with same id and also still on the market
 
@@ -91,16 +262,108 @@ class PropertyDatabase:
                  self.table.columns.off_market == False))
         return self.conn.execute(query).fetchall()
 
-    def save_bulk(self, data: List[PropertyListing]) -> None:
-        """Save a list of data to DB in one go
+    def select_on_market_property_ids(self, state_and_territory_aliases: List[str] = None) -> Iterator[str]:
+        """SELECT property_id FROM TABLE WHERE off_market = false, streamed with a
+        server side cursor so only one batch of ids is in memory at a time
 
         Args:
-            data (List[PropertyListing]): _description_
+            state_and_territory_aliases (List[str], optional): upper cased spellings of
+                the state to filter on. Rows without a state are always included.
+                Defaults to None, which returns ids of all states.
+
+        Yields:
+            Iterator[str]: property_id of each on market entry
         """
-        data_type_to_dict = [vars(listing) for listing in data]
+        query = select([self.table.columns.property_id]).where(
+            self.table.columns.off_market == False)
+        if state_and_territory_aliases:
+            query = query.where(
+                or_(func.upper(self.table.columns.state_and_territory).in_(state_and_territory_aliases),
+                    self.table.columns.state_and_territory == None))
+        result = self.conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(DB_STREAM_BATCH_SIZE):
+            for row in rows:
+                yield row[0]
+
+    def select_on_market_card_fingerprints(
+            self, state_and_territory_aliases: List[str] = None) -> Iterator[Tuple[str, str]]:
+        """Same as select_on_market_property_ids, with the card fingerprint of each entry
+
+        Args:
+            state_and_territory_aliases (List[str], optional): upper cased spellings of
+                the state to filter on. Rows without a state are always included.
+                Defaults to None, which returns entries of all states.
+
+        Yields:
+            Iterator[Tuple[str, str]]: (property_id, card_fingerprint) of each on market
+                entry, the fingerprint is None for entries saved before it was stored
+        """
+        query = select([self.table.columns.property_id, self.table.columns.card_fingerprint]).where(
+            self.table.columns.off_market == False)
+        if state_and_territory_aliases:
+            query = query.where(
+                or_(func.upper(self.table.columns.state_and_territory).in_(state_and_territory_aliases),
+                    self.table.columns.state_and_territory == None))
+        result = self.conn.execution_options(stream_results=True).execute(query)
+        for rows in result.partitions(DB_STREAM_BATCH_SIZE):
+            for row in rows:
+                yield row[0], row[1]
+
+    def save_bulk(self, data: Union[List[PropertyListing], PropertyBatch]) -> None:
+        """Save a list of data to DB in one go. Runs as a single executemany,
+        which the psycopg2 dialect sends as multi-row INSERT .. VALUES pages
+
+        Args:
+            data (Union[List[PropertyListing], PropertyBatch]): listings, or their columns
+        """
+        # executemany needs the same keys in every row, a batch has them all,
+        # e.g agency details can be missing
+        batch = data if isinstance(data, PropertyBatch) else PropertyBatch.from_listings(data)
         print("Saving data to DB....")
         query = insert(self.table)
-        self.conn.execute(query, data_type_to_dict)
+        self.conn.execute(query, batch.to_db_params(exclude=self.get_missing_columns()))
+
+    def save_bulk_or_single(self, data: Union[List[PropertyListing], PropertyBatch]) -> None:
+        """Save a list of data in one go, falling back to one by one if the batch
+        fails so a single bad row doesn't lose the whole batch
+
+        Args:
+            data (Union[List[PropertyListing], PropertyBatch]): listings, or their columns
+        """
+        try:
+            self.save_bulk(data)
+        except Exception as e:
+            logging.exception(
+                "Failed to save {0} rows in bulk, saving one by one: {1}".format(len(data), e))
+            for listing in data:
+                try:
+                    self.save_single(listing)
+                except Exception as e:
+                    logging.exception("Failed to save property {0}: {1}".format(
+                        getattr(listing, 'property_id', None), e))
+
+    def create_write_buffer(self,
+                            max_rows: int = DEFAULT_MAX_ROWS,
+                            max_bytes: int = DEFAULT_MAX_BYTES,
+                            max_interval: float = DEFAULT_MAX_INTERVAL,
+                            on_flushed: Callable[[PropertyBatch], None] = None) -> BatchBuffer:
+        """Write-behind buffer which inserts listings in batches, flushing by row
+        count, approximate size in bytes or time since the oldest buffered listing.
+        Listings are added column by column to a PropertyBatch as they come in.
+        on_flushed is called with each batch once it's saved
+
+        Returns:
+            BatchBuffer: call append(listing) to save, close() when done
+        """
+        return BatchBuffer(self.save_bulk_or_single,
+                           max_rows=max_rows,
+                           max_bytes=max_bytes,
+                           max_interval=max_interval,
+                           size_fn=lambda listing: sum(
+                               len(str(value)) for value in listing.to_dict().values()),
+                           name="propertylistings insert buffer",
+                           on_flushed=on_flushed,
+                           new_items=PropertyBatch)
 
     def save_single(self, data: PropertyListing) -> None:
         """Save 1 item to DB
@@ -108,7 +371,9 @@ class PropertyDatabase:
         Args:
             data (PropertyListing): _description_
         """
-        data_type_to_dict = vars(data)
+        missing_columns = self.get_missing_columns()
+        data_type_to_dict = {name: value for name, value in data.to_dict().items()
+                             if name not in missing_columns}
         query = insert(self.table).values(data_type_to_dict)
         self.conn.execute(query)
 
@@ -119,9 +384,218 @@ class PropertyDatabase:
                                                    self.table.columns.ad_removed_date == None))
         self.conn.execute(query)
 
+    def update_ad_removed_dates_bulk(self, removed: List[Tuple[str, str]]) -> None:
+        """Mark many listings as off market in one go. Runs as a single executemany
+        of the same UPDATE, which the engine's executemany_mode sends to psycopg2's
+        execute_batch, so it goes in pages instead of one round trip per listing
+
+        Args:
+            removed (List[Tuple[str, str]]): (property_id, ad_removed_date) of each listing
+        """
+        query = update(self.table).values(off_market=True,
+                                          ad_removed_date=bindparam('removed_date')).where(
+                                              and_(self.table.columns.property_id == bindparam('removed_property_id'),
+                                                   self.table.columns.ad_removed_date == None))
+        self.conn.execute(query, [{'removed_property_id': property_id, 'removed_date': ad_removed_date}
+                                  for property_id, ad_removed_date in removed])
+
+    def update_ad_removed_dates_bulk_or_single(self, removed: List[Tuple[str, str]]) -> None:
+        """Same as update_ad_removed_dates_bulk, falling back to one by one if the
+        batch fails
+
+        Args:
+            removed (List[Tuple[str, str]]): (property_id, ad_removed_date) of each listing
+        """
+        try:
+            self.update_ad_removed_dates_bulk(removed)
+        except Exception as e:
+            logging.exception(
+                "Failed to update {0} rows in bulk, updating one by one: {1}".format(len(removed), e))
+            for property_id, ad_removed_date in removed:
+                try:
+                    self.update_ad_removed_date(
+                        property_id, True, ad_removed_date)
+                except Exception as e:
+                    logging.exception("Failed to update property {0}: {1}".format(
+                        property_id, e))
+
+    def create_ad_removed_date_buffer(self,
+                                      max_rows: int = DEFAULT_MAX_ROWS,
+                                      max_interval: float = DEFAULT_MAX_INTERVAL,
+                                      on_flushed: Callable[[List[Tuple[str, str]]], None] = None) -> BatchBuffer:
+        """Write-behind buffer which marks listings as off market in batches,
+        flushing by row count or time since the oldest buffered update.
+        on_flushed is called with each batch once it's updated
+
+        Returns:
+            BatchBuffer: call append((property_id, ad_removed_date)) to update, close() when done
+        """
+        return BatchBuffer(self.update_ad_removed_dates_bulk_or_single,
+                           max_rows=max_rows,
+                           max_interval=max_interval,
+                           name="ad_removed_date update buffer",
+                           on_flushed=on_flushed)
+
+    def update_card_fields(self, card: Mapping[str, Any]) -> None:
+        """Update the card fields (e.g price, move in date) and fingerprint of the on
+        market entry of a listing with what its list page card shows now. Only an
+        entry whose stored fingerprint differs is updated, and only that one is
+        marked for the ETL again (etl_done = false)
+
+        Args:
+            card (Mapping[str, Any]): property_id, card fields and card_fingerprint of the listing
+        """
+        self.update_card_fields_bulk([card])
+
+    def update_card_fields_bulk(self, cards: List[Mapping[str, Any]]) -> None:
+        """Same as update_card_fields for many listings, as a single executemany
+        which the engine's executemany_mode sends in pages with execute_batch
+
+        Args:
+            cards (List[Mapping[str, Any]]): property_id, card fields and card_fingerprint of each listing
+        """
+        names = CARD_FIELDS + ('card_fingerprint',)
+        values = {name: bindparam('card_' + name) for name in names}
+        values['etl_done'] = False
+        stored_fingerprint = self.table.columns.card_fingerprint
+        query = update(self.table).values(values).where(
+                and_(self.table.columns.property_id == bindparam('card_property_id'),
+                     self.table.columns.off_market == False,
+                     or_(stored_fingerprint == None,
+                         stored_fingerprint != bindparam('card_card_fingerprint'))))
+        self.conn.execute(query, [{'card_' + name: card.get(name) for name in names + ('property_id',)}
+                                  for card in cards])
+
+    def update_card_fields_bulk_or_single(self, cards: List[Mapping[str, Any]]) -> None:
+        """Same as update_card_fields_bulk, falling back to one by one if the
+        batch fails
+
+        Args:
+            cards (List[Mapping[str, Any]]): property_id, card fields and card_fingerprint of each listing
+        """
+        try:
+            self.update_card_fields_bulk(cards)
+        except Exception as e:
+            logging.exception(
+                "Failed to update {0} cards in bulk, updating one by one: {1}".format(len(cards), e))
+            for card in cards:
+                try:
+                    self.update_card_fields(card)
+                except Exception as e:
+                    logging.exception("Failed to update property {0}: {1}".format(
+                        card.get('property_id'), e))
+
+    def create_card_update_buffer(self,
+                                  max_rows: int = DEFAULT_MAX_ROWS,
+                                  max_interval: float = DEFAULT_MAX_INTERVAL,
+                                  on_flushed: Callable[[List[Mapping[str, Any]]], None] = None) -> BatchBuffer:
+        """Write-behind buffer which updates the card fields of listings in batches,
+        flushing by row count or time since the oldest buffered update.
+        on_flushed is called with each batch once it's updated
+
+        Returns:
+            BatchBuffer: call append(card) to update, close() when done
+        """
+        return BatchBuffer(self.update_card_fields_bulk_or_single,
+                           max_rows=max_rows,
+                           max_interval=max_interval,
+                           name="card fields update buffer",
+                           on_flushed=on_flushed)
+
+    def update_card_fingerprint(self, property_id: str, card_fingerprint: str) -> None:
+        """Store the card fingerprint of an on market entry saved before fingerprints
+        were. Only the fingerprint is set, the card fields and etl_done are left
+        as they are
+
+        Args:
+            property_id (str): id of the listing
+            card_fingerprint (str): fingerprint of its current list page card
+        """
+        self.update_card_fingerprints_bulk([(property_id, card_fingerprint)])
+
+    def update_card_fingerprints_bulk(self, fingerprints: List[Tuple[str, str]]) -> None:
+        """Same as update_card_fingerprint for many listings, as a single executemany
+
+        Args:
+            fingerprints (List[Tuple[str, str]]): (property_id, card_fingerprint) of each listing
+        """
+        query = update(self.table).values(card_fingerprint=bindparam('new_card_fingerprint')).where(
+                and_(self.table.columns.property_id == bindparam('fingerprint_property_id'),
+                     self.table.columns.off_market == False,
+                     self.table.columns.card_fingerprint == None))
+        self.conn.execute(query, [{'fingerprint_property_id': property_id, 'new_card_fingerprint': fingerprint}
+                                  for property_id, fingerprint in fingerprints])
+
+    def update_card_fingerprints_bulk_or_single(self, fingerprints: List[Tuple[str, str]]) -> None:
+        """Same as update_card_fingerprints_bulk, falling back to one by one if the
+        batch fails
+
+        Args:
+            fingerprints (List[Tuple[str, str]]): (property_id, card_fingerprint) of each listing
+        """
+        try:
+            self.update_card_fingerprints_bulk(fingerprints)
+        except Exception as e:
+            logging.exception(
+                "Failed to store {0} card fingerprints in bulk, storing one by one: {1}".format(len(fingerprints), e))
+            for property_id, fingerprint in fingerprints:
+                try:
+                    self.update_card_fingerprint(property_id, fingerprint)
+                except Exception as e:
+                    logging.exception("Failed to update property {0}: {1}".format(property_id, e))
+
+    def create_card_fingerprint_buffer(self,
+                                       max_rows: int = DEFAULT_MAX_ROWS,
+                                       max_interval: float = DEFAULT_MAX_INTERVAL) -> BatchBuffer:
+        """Write-behind buffer which stores the card fingerprint of listings saved
+        before fingerprints were, in batches
+
+        Returns:
+            BatchBuffer: call append((property_id, card_fingerprint)) to update, close() when done
+        """
+        return BatchBuffer(self.update_card_fingerprints_bulk_or_single,
+                           max_rows=max_rows,
+                           max_interval=max_interval,
+                           name="card fingerprint backfill buffer")
+
+    def update_listing_details(self, data: PropertyListing) -> None:
+        """Update the on market entry of a listing whose card changed with its
+        newly scraped fields. The entry keeps its ad_posted_date and
+        data_collection_date, so it still tells when the ad was first seen
+
+        Args:
+            data (PropertyListing): listing with info from list and detail pages
+        """
+        missing_columns = self.get_missing_columns()
+        values = {name: value for name, value in data.to_dict().items()
+                  if name not in LISTING_KEPT_FIELDS and name not in missing_columns}
+        query = update(self.table).values(values).where(
+            and_(self.table.columns.property_id == data.property_id,
+                 self.table.columns.off_market == False))
+        self.conn.execute(query)
+
     def update_agency_details(self, property_id: str, agency_url: str, agency_name: bool, agency_address: str) -> None:
         query = update(self.table).values(agency_name=agency_name,
                                           agency_address=agency_address).where(
                                               and_(self.table.columns.property_id == property_id,
                                                    self.table.columns.agency_property_listings_url == agency_url))
         self.conn.execute(query)
+
+    def update_agency_details_of_agency(self, agency_url: str, agency_name: str, agency_address: str) -> int:
+        """Set the agency details of every listing of an agency still missing them,
+        in one UPDATE
+
+        Args:
+            agency_url (str): agency_property_listings_url of the agency
+            agency_name (str): name of the agency
+            agency_address (str): address of the agency
+
+        Returns:
+            int: number of rows updated
+        """
+        query = update(self.table).values(agency_name=agency_name,
+                                          agency_address=agency_address).where(
+                                              and_(self.table.columns.agency_property_listings_url == agency_url,
+                                                   or_(self.table.columns.agency_name == None,
+                                                       self.table.columns.agency_address == None)))
+        return self.conn.execute(query).rowcount
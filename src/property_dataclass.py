@@ -1,8 +1,18 @@
 import dataclasses
-from typing import List
+import pandas as pd
+from typing import Any, Dict, Iterable, Iterator, List
 
+try:
+    import pyarrow
+except ImportError:  # pyarrow is optional, only needed for PropertyBatch.to_arrow
+    pyarrow = None
 
-@dataclasses.dataclass(init=False)
+MISSING = object()
+
+
+# Slotted, so a listing holds its 29 fields without a per instance __dict__.
+# Fields that were never set are missing (reading them raises AttributeError)
+@dataclasses.dataclass(init=False, slots=True)
 class PropertyListing:
     address: str
     price: str
@@ -32,9 +42,84 @@ class PropertyListing:
     agency_name: str
     agency_address: str
     etl_done: bool
+    card_fingerprint: str
 
     def __post_init__(self):
         if self.ad_details_included is None:
             self.ad_details_included = False
         if self.etl_done is None:
             self.etl_done = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fields that have been set, what vars() gave before the class had slots"""
+        return {name: value for name in PROPERTY_LISTING_FIELDS
+                if (value := getattr(self, name, MISSING)) is not MISSING}
+
+    @classmethod
+    def from_dict(cls, fields: Dict[str, Any]) -> 'PropertyListing':
+        listing = cls()
+        for name, value in fields.items():
+            setattr(listing, name, value)
+        return listing
+
+
+PROPERTY_LISTING_FIELDS: List[str] = [
+    field.name for field in dataclasses.fields(PropertyListing)]
+
+
+def get_arrow_schema() -> 'pyarrow.Schema':
+    """Arrow types of the PropertyListing fields, list fields as lists of strings"""
+    if pyarrow is None:
+        raise ImportError("pyarrow is not installed")
+    types = {str: pyarrow.string(), bool: pyarrow.bool_(), List[str]: pyarrow.list_(pyarrow.string())}
+    return pyarrow.schema([(field.name, types[field.type]) for field in dataclasses.fields(PropertyListing)])
+
+
+class PropertyBatch:
+    """Listings stored column by column (one list per field) instead of one
+    object per listing, e.g for the crawler's write buffer.
+
+    The columns go straight into Arrow or pandas, and into the parameters of a
+    DB executemany, without turning every listing into a dict first. Fields a
+    listing didn't have are None.
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, List[Any]] = {name: [] for name in PROPERTY_LISTING_FIELDS}
+        self.num_rows: int = 0
+
+    @classmethod
+    def from_listings(cls, listings: Iterable[PropertyListing]) -> 'PropertyBatch':
+        batch = cls()
+        for listing in listings:
+            batch.append(listing)
+        return batch
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __iter__(self) -> Iterator[PropertyListing]:
+        """Listings of the batch rebuilt one by one, e.g to save them one at a time"""
+        for index in range(self.num_rows):
+            yield PropertyListing.from_dict(self.get_row(index))
+
+    def append(self, listing: PropertyListing) -> None:
+        for name, column in self.columns.items():
+            column.append(getattr(listing, name, None))
+        self.num_rows += 1
+
+    def get_row(self, index: int) -> Dict[str, Any]:
+        return {name: column[index] for name, column in self.columns.items()}
+
+    def to_db_params(self, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Parameters of an executemany INSERT, every row with the same keys.
+        Fields in exclude are left out, e.g columns the table doesn't have"""
+        names = [name for name in self.columns if name not in exclude]
+        return [dict(zip(names, row)) for row in zip(*(self.columns[name] for name in names))]
+
+    def to_pandas(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, columns=PROPERTY_LISTING_FIELDS)
+
+    def to_arrow(self) -> 'pyarrow.Table':
+        schema = get_arrow_schema()
+        return pyarrow.table(self.columns, schema=schema)
@@ -25,9 +25,13 @@ create table if not exists PropertyListings (
 	ad_details_included boolean not null,
 	ad_removed_date timestamp,
 	ad_posted_date timestamp,
-	data_collection_date timestamp not null
+	data_collection_date timestamp not null,
+	card_fingerprint varchar(16)
 )
 
+-- Add the card fingerprint to an existing table
+alter table raw.propertylistings add column if not exists card_fingerprint varchar(16)
+
 
 -- Select number of distinct states
 SELECT COUNT(DISTINCT state_and_territory) AS states FROM raw.propertylistings
@@ -1,32 +1,109 @@
-import argparse
-import logging
 import sys
 import time
-from typing import List
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, List, Set, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 
-from src.common.constants import BASE_URL, STATES_URI
-from src.common.user_agent_rotator import get_random_user_agent
+from src.common.async_fetcher import AsyncFetcher, DEFAULT_CONCURRENCY
+from src.common.batch_buffer import BatchBuffer
+from src.common.checkpoint import CheckpointJournal, FullSweepSchedule
+from src.common.sharding import Shard
+from src.common.constants import BASE_URL, PROPERTIES_PER_PAGE, STATES_URI, STATE_AND_TERRITORY_ALIASES
+from src.common.card_fingerprint import (
+    CHANGED, NEW, UNCHANGED, UNFINGERPRINTED, CardFingerprintIndex, get_card_fields, get_card_fingerprint
+)
+from src.common.html_parser import PARSER_BACKENDS, get_default_parser, parse_html, set_default_parser
+from src.common.response_cache import configure_response_cache
+from src.common.rate_limiter import DEFAULT_INITIAL_RATE, DEFAULT_MAX_RATE, configure_rate_limiter
+from src.common.http_client import HttpClient
+from src.common.metrics import DB_WRITE, DEFAULT_METRICS_DIR, EXISTENCE_CHECK, EXTRACT, FETCH, PARSE, Metrics
 from src.input_html_extractor import InputHtmlExtractor
 from src.property_database import PropertyDatabase
-from src.property_dataclass import PropertyListing
+from src.property_dataclass import PropertyBatch, PropertyListing
 from src.transformer import Transformer
+from src.parse_worker import extract_detail_page, init_parse_worker
 
-MAX_RETRY = 15
-DELAY_TIME = 1
+DEFAULT_WRITE_BATCH_SIZE = 100
+DEFAULT_PAGE_WINDOW = 4
+DEFAULT_MAX_PAGE_RETRIES = 2
 
 
 class TenantAppCrawler:
-    def __init__(self, db: PropertyDatabase) -> None:
+    def __init__(self,
+                 db: PropertyDatabase,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 write_batch_size: int = 1,
+                 page_window: int = DEFAULT_PAGE_WINDOW,
+                 max_page_retries: int = DEFAULT_MAX_PAGE_RETRIES,
+                 parse_workers: int = 0,
+                 checkpoint: CheckpointJournal = None,
+                 shard: Shard = None,
+                 metrics: Metrics = None,
+                 metrics_dir: str = None,
+                 delta_stop_after: int = 0,
+                 full_sweep: FullSweepSchedule = None) -> None:
         self.database = db
+        # Every shard reads the whole list page, but only scrapes the detail pages
+        # of listings whose property_id hashes to it
+        self.shard = shard if shard is not None else Shard()
+        # Journal of saved listings, so a resumed run skips their detail pages
+        self.checkpoint = checkpoint
+        self.http_client = HttpClient()
+        # Same rate limiter for the fetcher's pacing and the requests themselves
+        self.fetcher = AsyncFetcher(
+            concurrency, rate_limiter=self.http_client.rate_limiter)
+        self.known_property_ids: CardFingerprintIndex = None
+        # Whether the table has the card_fingerprint column, checked on first use
+        self.detect_changes: bool = None
+        # Listings are inserted one by one unless write_batch_size > 1. Buffered
+        # listings are only journaled once their batch is in the DB
+        self.write_buffer: BatchBuffer = db.create_write_buffer(
+            max_rows=write_batch_size,
+            on_flushed=self.record_saved) if write_batch_size > 1 else None
+        # Known listings whose card changed get their card fields updated, in
+        # batches too, and their detail page scraped again to update their entry
+        self.card_update_buffer: BatchBuffer = db.create_card_update_buffer(
+            max_rows=write_batch_size) if write_batch_size > 1 else None
+        # Known listings saved before fingerprints were only get their fingerprint stored
+        self.card_fingerprint_buffer: BatchBuffer = db.create_card_fingerprint_buffer(
+            max_rows=write_batch_size) if write_batch_size > 1 else None
+        self.changed_property_ids: Set[str] = set()
+        # Paginated mode: number of list pages fetched ahead, and how many times a failed one is retried
+        self.page_window = max(1, page_window)
+        self.max_page_retries = max_page_retries
+        # Pipeline mode: detail pages are parsed and extracted in worker processes
+        # instead of the main one, using more than one core
+        self.parse_pool: ProcessPoolExecutor = ProcessPoolExecutor(
+            parse_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_parse_worker,
+            initargs=(get_default_parser(),)) if parse_workers > 0 else None
+        self.parse_workers = parse_workers
+        # Per stage latencies and throughput, written out at the end of run() if metrics_dir is set
+        self.metrics = metrics if metrics is not None else Metrics('tenantapp_crawler')
+        self.metrics_dir = metrics_dir
+        # Delta mode: list pages are walked from the newest listings and the crawl
+        # stops after delta_stop_after known listings in a row, unless full_sweep is due
+        self.delta_stop_after = delta_stop_after
+        self.full_sweep = full_sweep
+        self.delta_active: bool = False
+        self.num_consecutive_known: int = 0
+        self.num_cards_read: int = 0
+        self.num_pages_requested: int = 0
+        self.num_listings: int = None
 
         # This code snippet below is for using requests_ip_rotator library
         # self.gateway = ApiGateway(BASE_URL, regions=EXTRA_REGIONS)
         # self.gateway.start()
         # self.session = requests.Session()
         # self.session.mount(BASE_URL, self.gateway)
+        # and then in HttpClient: response = self.session.get(url, headers=user_agent)
 
     def collect_info_from_detail_page(
             self,
@@ -47,36 +124,25 @@ class TenantAppCrawler:
         print('Start scraping Detail url {0}...\n'.format(
             data.property_url))
 
-        data.listing_title = transformer.get_listing_title(detail_page_html)
-        data.listing_description = transformer.get_listing_description(
-            detail_page_html)
-        data.num_bedrooms = transformer.get_num_bedrooms(detail_page_html)
-        data.num_bathrooms = transformer.get_num_bathrooms(detail_page_html)
-        data.num_garages = transformer.get_num_garages(detail_page_html)
-        data.property_features = transformer.get_property_features(
-            detail_page_html)
-        data.google_maps_location_url = transformer.get_google_maps_location_url(
-            detail_page_html)
-        data.gps_coordinates = transformer.get_gps_coordinates(
-            detail_page_html)
-        data.suburb = transformer.get_suburb(detail_page_html)
-        data.state_and_territory = transformer.get_state_and_territory(
-            detail_page_html)
-        data.postcode = transformer.get_postcode(detail_page_html)
-        data.agent_name = transformer.get_agent_name(detail_page_html)
-        data.off_market = transformer.get_off_market_status(detail_page_html)
+        with self.metrics.time(EXTRACT):
+            data = transformer.get_detail_page_fields(detail_page_html, data)
+        return self.complete_info_from_detail_page(transformer, data)
+
+    def complete_info_from_detail_page(self, transformer: Transformer, data: PropertyListing) -> PropertyListing:
+        """Fields derived once the detail page fields have been extracted
+
+        Args:
+            transformer (Transformer): _description_
+            data (PropertyListing): data object with the detail page fields
+
+        Returns:
+            PropertyListing: data object ready to be saved
+        """
         data.ad_details_included = True
         data.ad_removed_date = transformer.get_ad_removed_date(data)
         data.ad_posted_date = data.data_collection_date
         data.etl_done = False
 
-        try:
-            agency_full_details = transformer.get_agency_details(detail_page_html)
-            data.agency_name = transformer.get_agency_name_from_detail_page(detail_page_html)
-            data.agency_address = transformer.get_agency_address_from_detail_page(agency_full_details, data.agency_name)
-        except AttributeError as e:
-            logging.exception(f"Failed to get agency details: {e}")
-
         return data
 
     def is_property_data_existed(self, property_id: str) -> bool:
@@ -96,15 +162,71 @@ class TenantAppCrawler:
 
         if our DB has at least 1 matching entry -> we skip crawling the current property
 
+        If load_known_property_ids has been called, this is an in-memory lookup
+        instead of a query to the DB
+
         Args:
             property_id (str): id of property on tenantapp.com.au
 
         Returns:
             bool: whether our db already has a data entry for this property
         """
+        if self.known_property_ids is not None:
+            return property_id in self.known_property_ids
         existing_rows = self.database.select_with_same_id(property_id)
         return True if len(existing_rows) > 0 else False
 
+    def get_card_status(self, data: PropertyListing) -> str:
+        """Whether the listing of a card is new, or known with its card unchanged
+        or changed since it was saved (e.g new price or move in date), going by
+        the fingerprint of the card
+
+        Args:
+            data (PropertyListing): listing with info from the list page
+
+        Returns:
+            str: NEW, UNCHANGED, CHANGED, or UNFINGERPRINTED if its entry has no fingerprint yet
+        """
+        if not self.is_property_data_existed(data.property_id):
+            return NEW
+        if not self.is_detecting_changes():
+            return UNCHANGED
+        if self.known_property_ids is not None:
+            return self.known_property_ids.get_status(data.property_id, data.card_fingerprint)
+        existing_rows = self.database.select_with_same_id(data.property_id)
+        stored = getattr(existing_rows[0], 'card_fingerprint', None) if existing_rows else None
+        if stored is None:
+            return UNFINGERPRINTED
+        return UNCHANGED if stored == data.card_fingerprint else CHANGED
+
+    def is_detecting_changes(self) -> bool:
+        """Card changes can only be detected once the table has the card_fingerprint
+        column. Until the migration has run, every known listing is unchanged"""
+        if self.detect_changes is None:
+            self.detect_changes = self.database.has_card_fingerprint()
+            if not self.detect_changes:
+                print("WARNING: the table has no card_fingerprint column, card changes won't be "
+                      "detected until the migration in src/sql/create_db.sql is run\n")
+        return self.detect_changes
+
+    def load_known_property_ids(self, state_uri: str) -> None:
+        """Load ids and card fingerprints of all on market entries of the state in
+        one streaming query, so checking whether a listing already exists or
+        changed doesn't need a DB round trip
+
+        Args:
+            state_uri (str): uri for each state
+        """
+        start_time = time.time()
+        aliases = STATE_AND_TERRITORY_ALIASES.get(state_uri)
+        if self.is_detecting_changes():
+            rows = self.database.select_on_market_card_fingerprints(aliases)
+        else:
+            rows = ((property_id, None) for property_id in self.database.select_on_market_property_ids(aliases))
+        self.known_property_ids = CardFingerprintIndex(rows)
+        print("Loaded {0} on market property ids in {1} seconds\n".format(
+            len(self.known_property_ids), time.time() - start_time))
+
     def collect_info_from_list_page(self, transformer: Transformer, listing: BeautifulSoup) -> PropertyListing:
         """Collect the most basic info related to a listing.
         An important item is the property_url, which is the link to the detail
@@ -130,6 +252,7 @@ class TenantAppCrawler:
         data.property_id = transformer.get_property_id(listing)
         data.move_in_date = transformer.get_move_in_date(listing)
         data.data_collection_date = transformer.get_current_date()
+        data.card_fingerprint = get_card_fingerprint(data)
 
         return data
 
@@ -144,33 +267,362 @@ class TenantAppCrawler:
             property_listings (List[BeautifulSoup]): list of listings
             transformer (Transformer): _description_
         """
+        asyncio.run(self.collect_data_for_all_properties_async(
+            property_listings, transformer))
+
+    async def collect_data_for_all_properties_async(
+            self,
+            property_listings: List[BeautifulSoup],
+            transformer: Transformer) -> None:
+        """Detail pages are fetched concurrently by the fetcher, but extraction
+        and saving still happen one listing at a time in the order of the list page.
+
+        Only a small window of fetches is scheduled ahead of the listing being
+        saved, so we don't hold thousands of detail pages in memory.
+
+        Args:
+            property_listings (List[BeautifulSoup]): list of listings
+            transformer (Transformer): _description_
+        """
+        window: int = self.get_detail_page_window()
+        pending: Deque[Tuple[float, PropertyListing, asyncio.Future]] = deque()
+        scheduled_property_ids = set()
+        await self.schedule_detail_pages(
+            property_listings, transformer, pending, scheduled_property_ids, window)
+        await self.save_pending_detail_pages(transformer, pending, 0)
+        self.flush_buffers()
+
+    async def schedule_detail_pages(
+            self,
+            property_listings: List[BeautifulSoup],
+            transformer: Transformer,
+            pending: Deque[Tuple[float, PropertyListing, asyncio.Future]],
+            scheduled_property_ids: Set[str],
+            window: int) -> None:
+        """Collect general info of each listing and start fetching its detail
+        page, saving the oldest pending listing whenever the window is full
+
+        Args:
+            property_listings (List[BeautifulSoup]): list of listings
+            transformer (Transformer): _description_
+            pending (Deque[Tuple[float, PropertyListing, asyncio.Future]]): listings waiting for their detail page
+            scheduled_property_ids (Set[str]): ids of listings already scheduled
+            window (int): max number of detail pages being fetched ahead
+        """
         for listing in property_listings:
+            if self.is_delta_done():
+                break
             try:
                 start_time = time.time()
                 data: PropertyListing = self.collect_info_from_list_page(
                     transformer, listing)
+                self.num_cards_read += 1
+                if not self.shard.owns(data.property_id):
+                    continue
 
-                if self.is_property_data_existed(data.property_id):
+                self.metrics.increment('listings_seen')
+                with self.metrics.time(EXISTENCE_CHECK):
+                    status = self.get_card_status(data)
+                self.num_consecutive_known = 0 if status == NEW else self.num_consecutive_known + 1
+                already_scheduled = data.property_id in scheduled_property_ids \
+                    or (self.checkpoint is not None and self.checkpoint.is_finished(data.property_url))
+                if status in (UNCHANGED, UNFINGERPRINTED) or already_scheduled:
+                    if status == UNFINGERPRINTED and not already_scheduled:
+                        # Entry saved before fingerprints were stored, its current card becomes the reference
+                        self.backfill_card_fingerprint(data)
                     print("\nData already existed: {0}\n".format(
                         data.property_id))
+                    self.metrics.increment('listings_skipped')
                     continue
+                if status == CHANGED:
+                    # The card's fields are recorded straight away, the detail
+                    # page is scraped again to update the rest of the entry
+                    print("\nCard changed: {0}\n".format(data.property_id))
+                    self.update_card(data)
+                    self.changed_property_ids.add(data.property_id)
+                    self.metrics.increment('listings_changed')
+                # Same listing can show up twice on the list page, and the first one
+                # might not be saved yet while its detail page is still being fetched
+                scheduled_property_ids.add(data.property_id)
 
                 # Send a request to the detailed page of the current listing
-                detail_page_html: BeautifulSoup = self.request_html_from_url(
-                    data.property_url)
+                detail_page_request = asyncio.ensure_future(
+                    self.fetch_and_extract_detail_page(data)
+                    if self.parse_pool is not None
+                    else self.fetcher.fetch(self.request_html_from_url, data.property_url))
+                pending.append((start_time, data, detail_page_request))
+            except Exception as e:
+                logging.exception("Error when collecting data: {0}".format(e))
+
+            await self.save_pending_detail_pages(transformer, pending, window)
+
+    def is_delta_done(self) -> bool:
+        # Listings further down are older, so past this many known ones in a row there's nothing new left
+        return self.delta_active and self.num_consecutive_known >= self.delta_stop_after
 
-                if detail_page_html is not None:
+    def get_detail_page_window(self) -> int:
+        # Enough detail pages in flight to keep both the fetcher and the parse workers busy
+        return max(self.fetcher.concurrency, self.parse_workers) * 2
+
+    async def fetch_and_extract_detail_page(self, data: PropertyListing) -> PropertyListing:
+        """Pipeline mode: fetch the raw detail page, then parse it and extract its
+        fields in the parse pool as soon as it arrives
+
+        Args:
+            data (PropertyListing): data object holding general info from the list page
+
+        Returns:
+            PropertyListing: a copy of data with the detail page fields, None if the page failed to load
+        """
+        content: bytes = await self.fetcher.fetch(
+            self.request_content_from_url, data.property_url)
+        if content is None:
+            return None
+        loop = asyncio.get_running_loop()
+        fields, timings = await loop.run_in_executor(
+            self.parse_pool, extract_detail_page, content, data.to_dict())
+        for stage, seconds in timings.items():
+            self.metrics.observe(stage, seconds)
+        return PropertyListing.from_dict(fields)
+
+    async def save_pending_detail_pages(
+            self,
+            transformer: Transformer,
+            pending: Deque[Tuple[float, PropertyListing, asyncio.Future]],
+            max_pending: int) -> None:
+        while pending and len(pending) >= max(1, max_pending):
+            await self.save_data_from_detail_page(
+                transformer, *pending.popleft())
+
+    def collect_data_for_all_pages(self, page_urls: List[str]) -> List[str]:
+        """Paginated mode: fetch the list pages one by one instead of the final
+        page holding every listing of the state, and scrape their listings
+
+        Args:
+            page_urls (List[str]): url of each list page
+
+        Returns:
+            List[str]: urls of list pages that couldn't be loaded
+        """
+        return asyncio.run(self.collect_data_for_all_pages_async(page_urls))
+
+    async def collect_data_for_all_pages_async(self, page_urls: List[str]) -> List[str]:
+        """List pages are fetched concurrently in a bounded window, in page order.
+        As soon as a page arrives, its listings go through the same flow as
+        collect_data_for_all_properties_async, so detail pages are fetched while
+        later list pages are still downloading.
+
+        A page that fails is put aside and retried on its own (up to
+        max_page_retries times) once the other pages are done, instead of failing
+        the whole state. Listings already seen on an earlier page are skipped.
+
+        Args:
+            page_urls (List[str]): url of each list page
+
+        Returns:
+            List[str]: urls of list pages that still failed after every retry
+        """
+        transformer: Transformer = Transformer(InputHtmlExtractor(None))
+        window: int = self.get_detail_page_window()
+        pending: Deque[Tuple[float, PropertyListing, asyncio.Future]] = deque()
+        scheduled_property_ids = set()
+
+        urls_to_fetch: List[str] = list(page_urls)
+        for attempt in range(self.max_page_retries + 1):
+            if not urls_to_fetch:
+                break
+            if attempt > 0:
+                print("Retrying {0} failed list pages, attempt #{1}\n".format(
+                    len(urls_to_fetch), attempt))
+                # Failed pages come before where delta mode stopped, they're all retried
+                self.delta_active = False
+            failed_pages: List[str] = []
+            page_requests: Deque[Tuple[str, asyncio.Future]] = deque()
+            for url in urls_to_fetch:
+                if self.is_delta_done():
+                    break
+                page_requests.append((url, asyncio.ensure_future(
+                    self.fetcher.fetch(self.request_html_from_url, url))))
+                self.num_pages_requested += 1
+                if len(page_requests) >= self.page_window:
+                    await self.collect_data_from_list_page(
+                        transformer, *page_requests.popleft(),
+                        pending, scheduled_property_ids, window, failed_pages)
+            while page_requests:
+                url, page_request = page_requests.popleft()
+                if self.is_delta_done():
+                    # Pages fetched ahead of where delta mode stopped
+                    page_request.cancel()
+                    continue
+                await self.collect_data_from_list_page(
+                    transformer, url, page_request,
+                    pending, scheduled_property_ids, window, failed_pages)
+            urls_to_fetch = failed_pages
+
+        await self.save_pending_detail_pages(transformer, pending, 0)
+        self.flush_buffers()
+        return urls_to_fetch
+
+    async def collect_data_from_list_page(
+            self,
+            transformer: Transformer,
+            url: str,
+            page_request: asyncio.Future,
+            pending: Deque[Tuple[float, PropertyListing, asyncio.Future]],
+            scheduled_property_ids: Set[str],
+            window: int,
+            failed_pages: List[str]) -> None:
+        """Wait for a list page and schedule the detail pages of its listings
+
+        Args:
+            transformer (Transformer): _description_
+            url (str): url of the list page
+            page_request (asyncio.Future): pending request to the list page
+            pending (Deque[Tuple[float, PropertyListing, asyncio.Future]]): listings waiting for their detail page
+            scheduled_property_ids (Set[str]): ids of listings already scheduled
+            window (int): max number of detail pages being fetched ahead
+            failed_pages (List[str]): urls of list pages to retry later
+        """
+        try:
+            list_page_html: BeautifulSoup = await page_request
+            if list_page_html is None:
+                raise ValueError("List page failed to load")
+            property_listings: List[BeautifulSoup] = Transformer(
+                InputHtmlExtractor(list_page_html)).get_all_properties()
+            # "Load more" pagination: ?page=k holds the listings of pages 1 to k,
+            # only the last page's worth are new. Taking the last ones (rather than
+            # skipping (k - 1) pages' worth) still works if a page only holds its own
+            property_listings = property_listings[-PROPERTIES_PER_PAGE:]
+            print("There are {0} new properties on {1}\n".format(
+                len(property_listings), url))
+        except Exception as e:
+            logging.exception(
+                "Error when loading list page {0}: {1}".format(url, e))
+            failed_pages.append(url)
+            self.metrics.increment('list_pages_failed')
+            return
+        await self.schedule_detail_pages(
+            property_listings, transformer, pending, scheduled_property_ids, window)
+
+    async def save_data_from_detail_page(
+            self,
+            transformer: Transformer,
+            start_time: float,
+            data: PropertyListing,
+            detail_page_request: asyncio.Future) -> None:
+        """Wait for the detail page of a listing, collect its info and save to DB
+
+        Args:
+            transformer (Transformer): _description_
+            start_time (float): when we started scraping this listing
+            data (PropertyListing): data object holding general info from the list page
+            detail_page_request (asyncio.Future): pending request to the detail page, which
+                gives the parsed page, or the extracted listing in pipeline mode
+        """
+        try:
+            detail_page = await detail_page_request
+
+            if detail_page is not None:
+                if self.parse_pool is not None:
+                    print('\nScraped address {0} in a parse worker'.format(data.address))
+                    data = self.complete_info_from_detail_page(
+                        transformer, detail_page)
+                else:
                     data = self.collect_info_from_detail_page(
                         transformer,
-                        detail_page_html,
+                        detail_page,
                         data)
 
-                    self.database.save_single(data)
-                end_time = time.time()
-                print("Scraping one property took in total: {0} seconds\n\n".format(
-                    end_time - start_time))
-            except Exception as e:
-                logging.exception("Error when collecting data: {0}".format(e))
+                if data.property_id in self.changed_property_ids:
+                    self.update(data)
+                    journaled = True
+                else:
+                    self.save(data)
+                    journaled = self.write_buffer is None
+                if self.checkpoint is not None and journaled:
+                    self.checkpoint.record(data.property_url)
+                self.shard.record_processed()
+                if self.known_property_ids is not None and not data.off_market:
+                    self.known_property_ids.set(data.property_id, data.card_fingerprint)
+            else:
+                self.metrics.increment('detail_pages_failed')
+            end_time = time.time()
+            self.metrics.observe('listing', end_time - start_time)
+            print("Scraping one property took in total: {0} seconds\n\n".format(
+                end_time - start_time))
+        except Exception as e:
+            logging.exception("Error when collecting data: {0}".format(e))
+
+    def record_saved(self, listings: PropertyBatch) -> None:
+        # Called once a batch of the write buffer is in the DB
+        self.metrics.observe(DB_WRITE, self.write_buffer.flush_latencies[-1])
+        self.metrics.increment('listings_saved', len(listings))
+        if self.checkpoint is not None:
+            for property_url in listings.columns['property_url']:
+                self.checkpoint.record(property_url)
+
+    def save(self, data: PropertyListing) -> None:
+        """Insert the listing straight away, or queue it in the write buffer
+
+        Args:
+            data (PropertyListing): listing with info from list and detail pages
+        """
+        if self.write_buffer is not None:
+            self.write_buffer.append(data)
+        else:
+            with self.metrics.time(DB_WRITE):
+                self.database.save_single(data)
+            self.metrics.increment('listings_saved')
+
+    def update(self, data: PropertyListing) -> None:
+        """Update the entry of a known listing whose card changed
+
+        Args:
+            data (PropertyListing): listing with info from list and detail pages
+        """
+        with self.metrics.time(DB_WRITE):
+            self.database.update_listing_details(data)
+        self.metrics.increment('listings_updated')
+
+    def update_card(self, data: PropertyListing) -> None:
+        """Record the card fields and fingerprint of a known listing on its entry,
+        straight away or through the card update buffer
+
+        Args:
+            data (PropertyListing): listing with info from the list page
+        """
+        card = get_card_fields(data)
+        if self.card_update_buffer is not None:
+            self.card_update_buffer.append(card)
+        else:
+            with self.metrics.time(DB_WRITE):
+                self.database.update_card_fields(card)
+        if self.known_property_ids is not None:
+            self.known_property_ids.set(data.property_id, data.card_fingerprint)
+
+    def backfill_card_fingerprint(self, data: PropertyListing) -> None:
+        """Store the fingerprint of a known listing whose entry has none yet, its
+        current card becoming the reference. The entry is otherwise left alone
+
+        Args:
+            data (PropertyListing): listing with info from the list page
+        """
+        if self.card_fingerprint_buffer is not None:
+            self.card_fingerprint_buffer.append((data.property_id, data.card_fingerprint))
+        else:
+            with self.metrics.time(DB_WRITE):
+                self.database.update_card_fingerprint(data.property_id, data.card_fingerprint)
+        if self.known_property_ids is not None:
+            self.known_property_ids.set(data.property_id, data.card_fingerprint)
+        self.metrics.increment('card_fingerprints_backfilled')
+
+    def flush_buffers(self) -> None:
+        if self.write_buffer is not None:
+            self.write_buffer.flush()
+        if self.card_update_buffer is not None:
+            self.card_update_buffer.flush()
+        if self.card_fingerprint_buffer is not None:
+            self.card_fingerprint_buffer.flush()
 
     def request_html_from_url(self, url: str) -> BeautifulSoup:
         """Attempt to send a request to TenantApp page, setting the timeout for
@@ -182,30 +634,36 @@ class TenantAppCrawler:
         Returns:
             BeautifulSoup: html content of the page
         """
-        print("\nSending GET request to {0}".format(url))
-        attempt = 0
-        while attempt != MAX_RETRY:
-            try:
-                user_agent: dict[str, str] = get_random_user_agent()
-                response = requests.get(url, timeout=15, headers=user_agent)
-
-                # This code snippet below is for using requests_ip_rotator library
-                # response = self.session.get(url, headers=user_agent)
-                # print("Session: {0}".format(self.session))
-                # print("Response: {0}".format(response))
-                # if response.status_code != 200:
-                #     continue
-
-                print("Got response from {0} in {1} seconds".format(
-                    url, response.elapsed.total_seconds()))
-                return BeautifulSoup(response.content, "html.parser")
-            except Exception as e:
-                print(
-                    "Attempt #{0} failed with exception {1}".format(attempt, e))
-                attempt += 1
-                time.sleep(DELAY_TIME)
+        parse_seconds: List[float] = []
+
+        def parse(content: bytes) -> BeautifulSoup:
+            # Parsed inside the retry policy, so a page that can't be parsed is downloaded again
+            start_time = time.perf_counter()
+            html = parse_html(content)
+            parse_seconds.append(time.perf_counter() - start_time)
+            return html
+
+        start_time = time.perf_counter()
+        html: BeautifulSoup = self.http_client.get_html(url, parse)
+        self.metrics.observe(
+            FETCH, time.perf_counter() - start_time - sum(parse_seconds))
+        if html is not None:
+            self.metrics.observe(PARSE, parse_seconds[-1])
+        return html
 
-        return None
+    def request_content_from_url(self, url: str) -> bytes:
+        """Same as request_html_from_url but returns the raw page without parsing it
+
+        Args:
+            url (str): url to be requested
+
+        Returns:
+            bytes: raw html of the page
+        """
+        start_time = time.perf_counter()
+        content: bytes = self.http_client.get_content(url)
+        self.metrics.observe(FETCH, time.perf_counter() - start_time)
+        return content
 
     def construct_url_with_pagination(self, state_uri: str) -> str:
         """tenantapp.com.au has a "Load more" type of pagination behaviour,
@@ -225,48 +683,174 @@ class TenantAppCrawler:
         Returns:
             str: url of the final page for each state
         """
+        num_pages = self.get_num_pages(state_uri)
+        if num_pages is not None:
+            url: str = "{0}/Rentals/{1}?page={2}#List".format(
+                BASE_URL, state_uri, num_pages)
+            return url
+        return None
+
+    def construct_page_urls(self, state_uri: str) -> List[str]:
+        """Urls of list pages 1 to the final page, for the paginated mode.
+
+        The site has no url for a single page: page k also holds the listings
+        of pages 1 to k-1. Going through all N pages downloads and parses
+        N(N+1)/2 pages worth of cards instead of N for the final page, so its cost
+        grows with the square of the number of listings. That's only worth it for
+        small states, in exchange for starting on detail pages straight away and
+        retrying pages on their own. Delta mode walks the same urls but stops
+        after the first few pages, so it stays cheap
+
+        Args:
+            state_uri (str): uri for each state
+
+        Returns:
+            List[str]: url of each list page of the state
+        """
+        num_pages = self.get_num_pages(state_uri)
+        if num_pages is None:
+            return None
+        return ["{0}/Rentals/{1}?page={2}#List".format(BASE_URL, state_uri, page)
+                for page in range(1, num_pages + 1)]
+
+    def get_num_pages(self, state_uri: str) -> int:
+        """Land on the first page and work out the number of list pages
+
+        Args:
+            state_uri (str): uri for each state
+
+        Returns:
+            int: number of list pages, None if the first page couldn't be loaded
+        """
         url: str = "{0}/Rentals/{1}#List".format(BASE_URL, state_uri)
         html: BeautifulSoup = self.request_html_from_url(url)
         if html is not None:
             extractor: InputHtmlExtractor = InputHtmlExtractor(html)
 
             print("URL: {0}".format(url))
-            print("Num of properties {0}".format(
-                extractor.get_num_properties()))
+            self.num_listings = extractor.get_num_properties()
+            print("Num of properties {0}".format(self.num_listings))
             num_pages = extractor.get_num_pages()
             print("Num of pages {0}\n\n".format(num_pages))
-
-            url: str = "{0}/Rentals/{1}?page={2}#List".format(
-                BASE_URL, state_uri, num_pages)
-            return url
+            return num_pages
         return None
 
-    def run(self, state_uri: str) -> bool:
+    def run(self, state_uri: str, paginated: bool = False) -> bool:
         """Run the crawler for tenantapp.com.au for each state in Australia.
 
         Args:
             state_uri (str): uri for each state
+            paginated (bool, optional): fetch list pages one by one instead of the final page. Defaults to False.
 
         Returns:
             bool: completely crawled all available property listings
         """
         try:
-            url: str = self.construct_url_with_pagination(state_uri)
-            transformer: Transformer = Transformer(
-                InputHtmlExtractor(self.request_html_from_url(url)))
-            property_listings: List[BeautifulSoup] = transformer.get_all_properties(
-            )
-            print("There are {0} properties in {1}\n\n".format(
-                len(property_listings), state_uri))
-
-            self.collect_data_for_all_properties(
-                property_listings, transformer)
-
-            print("======= All done for {0}!!! ======\n".format(state_uri))
-            return True
+            self.load_known_property_ids(state_uri)
+            if self.delta_stop_after > 0:
+                if self.full_sweep is None or not self.full_sweep.is_due():
+                    return self.run_delta(state_uri)
+                print("Full sweep is due, crawling every listing of {0}\n".format(state_uri))
+                self.metrics.increment('full_sweeps')
+                # From the final page alone, paginating through every page would cost N^2
+                paginated = False
+            if paginated:
+                success = self.run_paginated(state_uri)
+            else:
+                url: str = self.construct_url_with_pagination(state_uri)
+                transformer: Transformer = Transformer(
+                    InputHtmlExtractor(self.request_html_from_url(url)))
+                property_listings: List[BeautifulSoup] = transformer.get_all_properties(
+                )
+                print("There are {0} properties in {1}\n\n".format(
+                    len(property_listings), state_uri))
+
+                self.collect_data_for_all_properties(
+                    property_listings, transformer)
+
+                print("======= All done for {0}!!! ======\n".format(state_uri))
+                success = True
+            if success and self.full_sweep is not None:
+                self.full_sweep.record()
+            if success and self.checkpoint is not None:
+                # Every listing is in, a resumed run of the next crawl has nothing to skip
+                self.checkpoint.reset()
+            return success
         except Exception as e:
             logging.exception("System crashed! Error: {0}".format(e))
             return False
+        finally:
+            if self.write_buffer is not None:
+                self.write_buffer.close()
+            if self.card_update_buffer is not None:
+                self.card_update_buffer.close()
+            if self.card_fingerprint_buffer is not None:
+                self.card_fingerprint_buffer.close()
+            if self.http_client.cache is not None:
+                print(self.http_client.cache.report())
+            print(self.http_client.rate_limiter.report())
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+            self.fetcher.close()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+            print(self.metrics.report())
+            if self.metrics_dir is not None:
+                self.metrics.write(self.metrics_dir)
+            print(self.shard.report())
+
+    def run_paginated(self, state_uri: str) -> bool:
+        page_urls: List[str] = self.construct_page_urls(state_uri)
+        if page_urls is None:
+            print("Couldn't load the first page of {0}".format(state_uri))
+            return False
+        failed_pages: List[str] = self.collect_data_for_all_pages(page_urls)
+        if failed_pages:
+            print("======= {0} of {1} list pages failed for {2}: {3} ======\n".format(
+                len(failed_pages), len(page_urls), state_uri, failed_pages))
+            return False
+        print("======= All done for {0}!!! ======\n".format(state_uri))
+        return True
+
+    def run_delta(self, state_uri: str) -> bool:
+        """Delta mode: walk the list pages from the first one, which has the
+        newest listings, and stop once delta_stop_after listings in a row are
+        already known. A run then costs the number of new listings rather than
+        the number of listings of the state
+
+        Args:
+            state_uri (str): uri for each state
+
+        Returns:
+            bool: every new listing was crawled
+        """
+        page_urls: List[str] = self.construct_page_urls(state_uri)
+        if page_urls is None:
+            print("Couldn't load the first page of {0}".format(state_uri))
+            return False
+        self.delta_active = True
+        stopped = False
+        try:
+            failed_pages: List[str] = self.collect_data_for_all_pages(page_urls)
+            stopped = self.num_consecutive_known >= self.delta_stop_after
+        finally:
+            self.record_avoided(len(page_urls))
+        if failed_pages:
+            print("======= {0} list pages failed for {1}: {2} ======\n".format(
+                len(failed_pages), state_uri, failed_pages))
+            return False
+        print("======= All done for {0}, {1}!!! ======\n".format(
+            state_uri, "stopped at known listings" if stopped else "no known listings found"))
+        return True
+
+    def record_avoided(self, num_pages: int) -> None:
+        # What a full crawl would have read on top of what delta mode did
+        pages_avoided = max(0, num_pages - self.num_pages_requested)
+        listings_avoided = max(0, (self.num_listings or 0) - self.num_cards_read)
+        self.metrics.increment('list_pages_avoided', pages_avoided)
+        self.metrics.increment('listings_avoided', listings_avoided)
+        print("Delta mode read {0} of {1} list pages and {2} listings, {3} listings avoided\n".format(
+            self.num_pages_requested, num_pages, self.num_cards_read, listings_avoided))
 
 
 if __name__ == "__main__":
@@ -280,17 +864,158 @@ if __name__ == "__main__":
         default="vic",
         help="Select a state in Australia to collect rental data from. Default is VIC"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Max number of detail pages being fetched at the same time. Default is 1",
+        required=False
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_WRITE_BATCH_SIZE,
+        help="Number of listings inserted to DB in one go, 1 to insert one by one. Default is 100",
+        required=False
+    )
+    parser.add_argument(
+        "--paginated",
+        action="store_true",
+        help="Fetch list pages one by one (a few at a time) instead of the final page with every listing. "
+             "Page k repeats the listings of pages 1 to k-1, so this downloads ~N^2/2 pages worth for N pages",
+        required=False
+    )
+    parser.add_argument(
+        "--page-window",
+        type=int,
+        default=DEFAULT_PAGE_WINDOW,
+        help="Max number of list pages fetched ahead in paginated mode. Default is 4",
+        required=False
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of processes parsing detail pages, e.g the number of cores. Default is 0, parse in the main process",
+        required=False
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip listings already saved by the previous run of this state",
+        required=False
+    )
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=0,
+        help="Index of this worker's shard, from 0 to --num-shards - 1. Default is 0",
+        required=False
+    )
+    parser.add_argument(
+        "--num-shards",
+        type=int,
+        default=1,
+        help="Number of workers splitting the work by a hash of property_id. Default is 1, no sharding",
+        required=False
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the on-disk response cache. Default is no cache, or the HTTP_CACHE_DIR env var",
+        required=False
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay pages from the response cache only, never touching the network",
+        required=False
+    )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        choices=PARSER_BACKENDS,
+        default=get_default_parser(),
+        help="Html parser backend used for every page. Default is html.parser or the HTML_PARSER env var",
+        required=False
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_INITIAL_RATE,
+        help="Requests per second to start at, tuned up and down from there by the rate limiter. Default is 2",
+        required=False
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Requests per second the rate limiter never goes above. Default is 20",
+        required=False
+    )
+    parser.add_argument(
+        "--delta",
+        type=int,
+        default=0,
+        help="Only crawl new listings: walk the list pages from the newest and stop after this many known listings in a row, e.g 50. Default is 0, crawl everything",
+        required=False
+    )
+    parser.add_argument(
+        "--full-sweep-hours",
+        type=float,
+        default=None,
+        help="With --delta, still crawl everything if the last full crawl of the state was this many hours ago. Default is never",
+        required=False
+    )
+    parser.add_argument(
+        "--metrics-dir",
+        type=str,
+        default=DEFAULT_METRICS_DIR,
+        help="Directory the JSON and Prometheus metrics of the run are written to. Default is metrics, or the METRICS_DIR env var",
+        required=False
+    )
 
     # Parsing command args
     args = parser.parse_args()
     selected_state = args.state
     print("Selected state: {0}".format(selected_state))
     print("URI: {0}".format(STATES_URI[selected_state]))
+    print("Concurrency: {0}".format(args.concurrency))
+    print("Batch size: {0}".format(args.batch_size))
+    print("Paginated: {0}".format(args.paginated))
+    print("Parse workers: {0}".format(args.workers))
+    print("Html parser: {0}".format(args.parser))
+    set_default_parser(args.parser)
+    print("Rate limit: {0} requests/s, max {1}".format(args.rate, args.max_rate))
+    configure_rate_limiter(args.rate, args.max_rate)
+    if args.cache_dir is not None or args.offline:
+        print("Response cache: {0}, offline: {1}".format(args.cache_dir, args.offline))
+        configure_response_cache(args.cache_dir, args.offline)
+
+    print("Delta: {0}, full sweep every {1} hours".format(args.delta, args.full_sweep_hours))
+    print("Resume: {0}".format(args.resume))
+    shard = Shard(args.shard, args.num_shards)
+    print("Shard: {0}".format(shard))
+    job = "tenantapp_crawler-{0}{1}".format(STATES_URI[selected_state], shard.name)
+    checkpoint = CheckpointJournal(job, args.resume)
+    full_sweep = FullSweepSchedule(job, args.full_sweep_hours) if args.full_sweep_hours is not None else None
+    print("Metrics dir: {0}".format(args.metrics_dir))
 
     # Instantiate DB and crawler
     database = PropertyDatabase()
-    crawler = TenantAppCrawler(db=database)
+    crawler = TenantAppCrawler(db=database,
+                               concurrency=args.concurrency,
+                               write_batch_size=args.batch_size,
+                               page_window=args.page_window,
+                               parse_workers=args.workers,
+                               checkpoint=checkpoint,
+                               shard=shard,
+                               metrics=Metrics(job),
+                               metrics_dir=args.metrics_dir,
+                               delta_stop_after=args.delta,
+                               full_sweep=full_sweep)
 
     # Start crawling...
-    success = crawler.run(STATES_URI[selected_state])
+    success = crawler.run(STATES_URI[selected_state], args.paginated)
     sys.exit(0) if success else sys.exit(1)
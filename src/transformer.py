@@ -11,6 +11,7 @@ from src.common.constants import (
     PROPERTY_LIST_HTML_ATTRS,
     PROPERTY_DETAIL_HTML_ATTRS
 )
+from src.extraction_plan import DetailPageExtractionPlan
 from src.input_html_extractor import InputHtmlExtractor
 from src.property_dataclass import PropertyListing
 
@@ -18,6 +19,7 @@ from src.property_dataclass import PropertyListing
 class Transformer:
     def __init__(self, extractor: InputHtmlExtractor):
         self.extractor = extractor
+        self.detail_page_plan = DetailPageExtractionPlan(extractor)
 
     def get_all_properties(self) -> List[BeautifulSoup]:
         self.properties = self.extractor.get_all_tags_by_class(
@@ -220,6 +222,12 @@ class Transformer:
             listing)
         return False if not off_market else True
 
+    def get_detail_page_fields(self, listing: BeautifulSoup, data: PropertyListing) -> PropertyListing:
+        """Same fields as the detail page getters above, collected in one
+        traversal of the page instead of one per getter
+        """
+        return self.detail_page_plan.extract(listing, data)
+
     def get_ad_removed_date(self, data: PropertyListing) -> str:
         return None if not data.off_market else data.data_collection_date
 
@@ -3,23 +3,57 @@
 or not. If it's not, update off_market = true and then update ad_removed_date
 """
 import time
-import requests
 import argparse
+from typing import Any, Iterator, List, Mapping, Tuple
 from datetime import datetime
 from bs4 import BeautifulSoup
 
 from src.transformer import Transformer
+from src.off_market_probe import OffMarketProbe
 from src.property_database import PropertyDatabase
 from src.input_html_extractor import InputHtmlExtractor
-from src.common.user_agent_rotator import get_random_user_agent
+from src.common.html_parser import PARSER_BACKENDS, get_default_parser, parse_html, set_default_parser
+from src.common.response_cache import configure_response_cache
+from src.common.rate_limiter import DEFAULT_INITIAL_RATE, DEFAULT_MAX_RATE, configure_rate_limiter
+from src.common.batch_buffer import BatchBuffer
+from src.common.checkpoint import CheckpointJournal
+from src.common.sharding import Shard
+from src.common.metrics import DB_WRITE, DEFAULT_METRICS_DIR, FETCH, PARSE, Metrics
+from src.common.http_client import HttpClient, MarkerDetector
 
-MAX_RETRY = 15
-DELAY_TIME = 1
+DEFAULT_UPDATE_BATCH_SIZE = 100
+
+# Keep reading a little after the banner's class name so the partial parse sees the whole tag
+OFF_MARKET_BANNER_BYTES = 1024
 
 
 class UpdateAdRemovedDate:
-    def __init__(self, db: PropertyDatabase) -> None:
+    def __init__(self,
+                 db: PropertyDatabase,
+                 stream_max_bytes: int = None,
+                 update_batch_size: int = 1,
+                 checkpoint: CheckpointJournal = None,
+                 shard: Shard = None,
+                 metrics: Metrics = None,
+                 metrics_dir: str = None) -> None:
         self.db = db
+        # Per stage latencies and throughput, written out at the end of the run if metrics_dir is set
+        self.metrics = metrics if metrics is not None else Metrics('update_ad_removed_date')
+        self.metrics_dir = metrics_dir
+        # Only listings whose property_id hashes to this shard are checked
+        self.shard = shard if shard is not None else Shard()
+        # Journal of checked listings, to carry on from there in the next run
+        self.checkpoint = checkpoint
+        self.http_client = HttpClient()
+        # Stop downloading a detail page after this many bytes without the off market banner
+        self.stream_max_bytes = stream_max_bytes
+        # Off market listings are updated one by one unless update_batch_size > 1
+        self.update_buffer: BatchBuffer = db.create_ad_removed_date_buffer(
+            max_rows=update_batch_size,
+            on_flushed=self.record_flushed_checks) if update_batch_size > 1 else None
+        # Checked listings waiting for the update buffer to flush before they're
+        # journaled, so a killed run never skips an update that wasn't written
+        self.unrecorded_checks: List[Tuple[str, Tuple[Any, str]]] = []
 
     def request_html_from_url(self, url: str) -> BeautifulSoup:
         """Attempt to send a request to TenantApp page, setting the timeout for
@@ -31,33 +65,103 @@ class UpdateAdRemovedDate:
         Returns:
             BeautifulSoup: html content of the page
         """
-        print("\nSending GET request to {0}".format(url))
-        attempt = 0
-        while attempt != MAX_RETRY:
-            try:
-                user_agent: dict[str, str] = get_random_user_agent()
-                response = requests.get(url, timeout=15, headers=user_agent)
-
-                print("Got response from {0} in {1} seconds".format(
-                    url, response.elapsed.total_seconds()))
-                return BeautifulSoup(response.content, "html.parser")
-            except Exception as e:
-                print(
-                    "Attempt #{0} failed with exception {1}".format(attempt, e))
-                attempt += 1
-                time.sleep(DELAY_TIME)
-
-        return None
+        return self.http_client.get_html(url, parse_html)
+
+    def request_content_from_url(self, url: str) -> bytes:
+        """Same as request_html_from_url but returns the raw page without parsing it
+
+        Args:
+            url (str): url to be requested
+
+        Returns:
+            bytes: raw html of the page
+        """
+        return self.http_client.get_content(url)
+
+    def request_off_market_status(self, url: str, probe: OffMarketProbe) -> bool:
+        """Stream the detail page and stop as soon as the off market banner shows
+        up, or once stream_max_bytes have been read without it. If the banner's
+        class name turns out not to be the banner, the whole page is checked
+
+        Args:
+            url (str): url of the listing's detail page
+            probe (OffMarketProbe): checks the downloaded part of the page
+
+        Returns:
+            bool: whether the listing is off market, None if the page couldn't be loaded
+        """
+        detector = MarkerDetector([probe.marker], OFF_MARKET_BANNER_BYTES)
+        with self.metrics.time(FETCH):
+            result = self.http_client.stream_until(
+                url, detector, self.stream_max_bytes)
+        if result is None:
+            return None
+        with self.metrics.time(PARSE):
+            off_market = probe.is_off_market(result.content)
+        if not off_market and result.marker_found and not result.complete:
+            # The marker can also be in a stylesheet or script before the banner,
+            # in which case we stopped too early to see the banner itself
+            print("Off market marker found but no banner, checking the whole page")
+            self.metrics.increment('full_page_refetches')
+            with self.metrics.time(FETCH):
+                content: bytes = self.request_content_from_url(url)
+            if content is None:
+                return None
+            with self.metrics.time(PARSE):
+                off_market = probe.is_off_market(content)
+        return off_market
+
+    def mark_off_market(self, property_id: str, ad_removed_date: str) -> None:
+        """Update the listing straight away, or queue it in the update buffer
+
+        Args:
+            property_id (str): id of the listing
+            ad_removed_date (str): when we found out it's off market
+        """
+        self.metrics.increment('listings_off_market')
+        if self.update_buffer is not None:
+            self.update_buffer.append((property_id, ad_removed_date))
+        else:
+            with self.metrics.time(DB_WRITE):
+                self.db.update_ad_removed_date(property_id, True, ad_removed_date)
+
+    def record_check(self, url: str, key: Tuple[Any, str]) -> None:
+        """Journal a checked listing, straight away or after the next flush of
+        the update buffer, since the journal only keeps the last key and
+        anything before it is skipped when resuming
+
+        Args:
+            url (str): url of the listing's detail page
+            key (Tuple[Any, str]): (ad_posted_date, property_id) of its row
+        """
+        if self.checkpoint is None:
+            return
+        if self.update_buffer is None:
+            self.checkpoint.record(url, key)
+        else:
+            self.unrecorded_checks.append((url, key))
+
+    def record_flushed_checks(self, removed: List[Tuple[str, str]] = None) -> None:
+        if removed is not None:
+            self.metrics.observe(DB_WRITE, self.update_buffer.flush_latencies[-1])
+        checks = self.unrecorded_checks
+        self.unrecorded_checks = []
+        if self.checkpoint is None:
+            return
+        for url, key in checks:
+            self.checkpoint.record(url, key)
 
     def get_properties_on_market(self,
                                  state_and_territory: str,
                                  offset: int = 0,
-                                 limit: int = 3000):
-        on_market = self.db.select_all_where_not_off_market(
-            state_and_territory, offset, limit)
-        properties = [{**row} for row in on_market]
-        property_urls = [p['property_url'] for p in properties]
-        return property_urls
+                                 limit: int = 3000) -> Iterator[Mapping[str, Any]]:
+        """Rows of listings to check, with their property_url, ad_posted_date and
+        property_id. When resuming, starts after the last listing checked by the
+        previous run instead of at offset
+        """
+        after = self.checkpoint.last_key if self.checkpoint is not None else None
+        return self.db.stream_where_not_off_market(
+            state_and_territory, ['property_url'], offset, limit, after=after)
 
     def update_ad_removed_date(self,
                                state_and_territory: str = 'VIC',
@@ -65,33 +169,64 @@ class UpdateAdRemovedDate:
                                limit: int = 3000):
         print(f"\nUpdating for {state_and_territory}\n\n")
         transformer: Transformer = Transformer(InputHtmlExtractor(None))
-        urls: list[str] = self.get_properties_on_market(
+        probe: OffMarketProbe = OffMarketProbe(transformer)
+        properties: Iterator[Mapping[str, Any]] = self.get_properties_on_market(
             state_and_territory, offset, limit)
-        print("\nThere are {0} urls to be checked".format(len(urls)))
+        print("\nChecking up to {0} urls from offset {1}".format(limit, offset))
         count: int = 0
+        num_rows: int = 0
+        finished: bool = False
 
         # 59 d minutes from now - due to 1hr time limit on CircleCI Free Plan
         timeout = time.time() + 60*59
-        for url in urls:
-            if time.time() > timeout:
-                print(f"Reaching time limit, stopping now...")
-                break
-            count += 1
-            print(f"\n{count}. Checking url... {url}")
-            detail_page_html: BeautifulSoup = self.request_html_from_url(url)
-            if detail_page_html is not None:
-                print("Detail page not none")
-                off_market_banner_exists = transformer.get_off_market_status(
-                    detail_page_html)
-                print("off market banner exists: {0}".format(
-                    off_market_banner_exists))
-                off_market = False if not off_market_banner_exists else True
-                if off_market:
-                    print("Updating row in DB....\n\n")
-                    self.db.update_ad_removed_date(
-                        url.split('/')[-1],
-                        off_market,
-                        datetime.today().strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            for p in properties:
+                num_rows += 1
+                url = p['property_url']
+                if not self.shard.owns(p['property_id']):
+                    continue
+                if time.time() > timeout:
+                    print(f"Reaching time limit, stopping now...")
+                    break
+                count += 1
+                self.shard.record_processed()
+                self.metrics.increment('listings_checked')
+                print(f"\n{count}. Checking url... {url}")
+                off_market_banner_exists = self.request_off_market_status(
+                    url, probe)
+                if off_market_banner_exists is None:
+                    self.metrics.increment('detail_pages_failed')
+                else:
+                    print("Detail page not none")
+                    print("off market banner exists: {0}".format(
+                        off_market_banner_exists))
+                    off_market = False if not off_market_banner_exists else True
+                    if off_market:
+                        print("Updating row in DB....\n\n")
+                        self.mark_off_market(
+                            url.split('/')[-1],
+                            datetime.today().strftime('%Y-%m-%d %H:%M:%S'))
+                    self.record_check(
+                        url, (p['ad_posted_date'], p['property_id']))
+            else:
+                # Fewer rows than the limit means there are none left after them
+                finished = limit is None or num_rows < limit
+        finally:
+            if self.update_buffer is not None:
+                self.update_buffer.close()
+                # Checks after the last off market listing didn't need a flush
+                self.record_flushed_checks()
+            if self.checkpoint is not None:
+                if finished:
+                    # The next resumed run starts over instead of finding nothing after last_key
+                    self.checkpoint.reset()
+                self.checkpoint.close()
+        print(probe.report())
+        print(self.http_client.report())
+        print(self.shard.report())
+        print(self.metrics.report())
+        if self.metrics_dir is not None:
+            self.metrics.write(self.metrics_dir)
 
 
 if __name__ == "__main__":
@@ -149,6 +284,93 @@ if __name__ == "__main__":
         required=False
     )
 
+    parser.add_argument(
+        "--stream-max-bytes",
+        type=int,
+        default=None,
+        help="Stop downloading a detail page after this many bytes if the off market banner hasn't shown up. Default is to read the whole page",
+        required=False
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_UPDATE_BATCH_SIZE,
+        help="Number of off market listings updated in DB in one go, 1 to update one by one. Default is 100",
+        required=False
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Carry on after the last listing checked by the previous run of this state, instead of from offset",
+        required=False
+    )
+
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=0,
+        help="Index of this worker's shard, from 0 to --num-shards - 1. Default is 0",
+        required=False
+    )
+
+    parser.add_argument(
+        "--num-shards",
+        type=int,
+        default=1,
+        help="Number of workers splitting the work by a hash of property_id. Default is 1, no sharding",
+        required=False
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the on-disk response cache. Default is no cache, or the HTTP_CACHE_DIR env var",
+        required=False
+    )
+
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay pages from the response cache only, never touching the network",
+        required=False
+    )
+
+    parser.add_argument(
+        "--parser",
+        type=str,
+        choices=PARSER_BACKENDS,
+        default=get_default_parser(),
+        help="Html parser backend used for every page. Default is html.parser or the HTML_PARSER env var",
+        required=False
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_INITIAL_RATE,
+        help="Requests per second to start at, tuned up and down from there by the rate limiter. Default is 2",
+        required=False
+    )
+
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Requests per second the rate limiter never goes above. Default is 20",
+        required=False
+    )
+
+    parser.add_argument(
+        "--metrics-dir",
+        type=str,
+        default=DEFAULT_METRICS_DIR,
+        help="Directory the JSON and Prometheus metrics of the run are written to. Default is metrics, or the METRICS_DIR env var",
+        required=False
+    )
+
     # Parsing command args
     args = parser.parse_args()
     selected_state = args.state
@@ -160,6 +382,27 @@ if __name__ == "__main__":
     limit = args.limit
     print(f"Selected limit: {limit}")
 
+    print(f"Html parser: {args.parser}")
+    set_default_parser(args.parser)
+    print(f"Rate limit: {args.rate} requests/s, max {args.max_rate}")
+    configure_rate_limiter(args.rate, args.max_rate)
+    if args.cache_dir is not None or args.offline:
+        print(f"Response cache: {args.cache_dir}, offline: {args.offline}")
+        configure_response_cache(args.cache_dir, args.offline)
+
+    stream_max_bytes = args.stream_max_bytes
+    print(f"Stream max bytes: {stream_max_bytes}")
+
+    print(f"Batch size: {args.batch_size}")
+
+    print(f"Resume: {args.resume}")
+    shard = Shard(args.shard, args.num_shards)
+    print(f"Shard: {shard}")
+    job = f"update_ad_removed_date-{selected_state}{shard.name}"
+    checkpoint = CheckpointJournal(job, args.resume)
+    print(f"Metrics dir: {args.metrics_dir}")
+
     db = PropertyDatabase()
-    u = UpdateAdRemovedDate(db)
+    u = UpdateAdRemovedDate(
+        db, stream_max_bytes, args.batch_size, checkpoint, shard, Metrics(job), args.metrics_dir)
     u.update_ad_removed_date(selected_state, offset, limit)
@@ -0,0 +1,121 @@
+from datetime import datetime
+from sqlalchemy import insert, select
+
+from src.agency_crawler import AgencyCrawler
+from src.common.html_parser import parse_html
+from src.common.checkpoint import CheckpointJournal
+from tests.test_property_database import database  # noqa: F401
+
+
+def insert_listings(db, agencies: dict) -> None:
+    # agencies: property_id -> agency url, posted one day apart in id order
+    db.conn.execute(insert(db.table), [
+        {'property_id': property_id, 'agency_property_listings_url': url,
+         'ad_posted_date': datetime(2024, 1, 1 + i)} for i, (property_id, url) in enumerate(agencies.items())])
+
+
+def get_agency_names(db) -> list:
+    rows = db.conn.execute(select([db.table]).order_by(db.table.columns.id)).fetchall()
+    return [row.agency_name for row in rows]
+
+
+def create_crawler(db, **kwargs) -> AgencyCrawler:
+    crawler = AgencyCrawler(db, **kwargs)
+    crawler.fetcher.per_host_delay = 0
+    return crawler
+
+
+def test_get_agency_details_shouldFetchEachAgencyOnceAndUpdateAllItsListings(mocker, database):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB', '3': 'agencyA', '4': 'agencyA', '5': 'agencyB'})
+    mock_request = mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details',
+                                side_effect=lambda url: ('Name ' + url, 'Address'))
+    crawler = create_crawler(database, concurrency=2)
+    crawler.get_agency_details()
+
+    assert sorted(call.args[0] for call in mock_request.call_args_list) == ['agencyA', 'agencyB']
+    assert get_agency_names(database) == ['Name agencyA', 'Name agencyB', 'Name agencyA',
+                                          'Name agencyA', 'Name agencyB']
+    assert crawler.metrics.counters == {'agency_pages_fetched': 2, 'listings_checked': 5, 'listings_updated': 5}
+    assert crawler.report().startswith("Agency dedupe: 5 listings checked with 2 agency page fetches, 60.0%")
+
+
+def test_get_agency_details_whenAgencySeenInEarlierGroup_shouldNotFetchItAgain(mocker, database):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB', '3': 'agencyA', '4': 'agencyB'})
+    mock_request = mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details',
+                                side_effect=lambda url: ('Name ' + url, 'Address'))
+    crawler = create_crawler(database, group_size=1)
+    crawler.get_agency_details()
+
+    assert mock_request.call_count == 2
+    assert crawler.metrics.counters['agency_memo_hits'] == 2
+    assert get_agency_names(database) == ['Name agencyA', 'Name agencyB', 'Name agencyA', 'Name agencyB']
+
+
+def test_get_agency_details_whenAgencyPageFails_shouldLeaveItsListingsForNextRun(mocker, database):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB'})
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details',
+                 side_effect=lambda url: None if url == 'agencyA' else ('Name', 'Address'))
+    crawler = create_crawler(database)
+    crawler.get_agency_details()
+
+    assert get_agency_names(database) == [None, 'Name']
+    assert crawler.metrics.counters['agency_pages_failed'] == 1
+
+
+def test_get_agency_details_shouldJournalLastListingOfEachGroup(mocker, database, tmp_path):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB', '3': 'agencyA'})
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details',
+                 return_value=('Name', 'Address'))
+    checkpoint = CheckpointJournal('agency_crawler', directory=str(tmp_path))
+    mock_record = mocker.spy(checkpoint, 'record')
+    crawler = create_crawler(database, checkpoint=checkpoint, group_size=2)
+    crawler.get_agency_details()
+
+    assert [call.args for call in mock_record.call_args_list] == [
+        ('agencyB', (datetime(2024, 1, 2), '2')), ('agencyA', (datetime(2024, 1, 3), '3'))]
+
+
+def test_get_agency_details_whenAllListingsChecked_shouldEmptyJournalForNextPass(mocker, database, tmp_path):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB'})
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details', return_value=None)
+    crawler = create_crawler(database, checkpoint=CheckpointJournal('agency_crawler', directory=str(tmp_path)))
+    crawler.get_agency_details()
+
+    resumed = CheckpointJournal('agency_crawler', resume=True, directory=str(tmp_path))
+    assert resumed.last_key is None
+    resumed.close()
+
+
+def test_get_agency_details_whenAgencyFetchRaises_shouldStillJournalLastRowRead(mocker, database, tmp_path):
+    insert_listings(database, {'1': 'agencyA', '2': 'agencyB', '3': 'agencyA'})
+
+    def request_agency_details(url):
+        if url == 'agencyB':
+            raise ConnectionError("Connection reset")
+        return 'Name', 'Address'
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_details', side_effect=request_agency_details)
+    checkpoint = CheckpointJournal('agency_crawler', directory=str(tmp_path))
+    mock_record = mocker.spy(checkpoint, 'record')
+    crawler = create_crawler(database, checkpoint=checkpoint)
+    crawler.get_agency_details()
+
+    mock_record.assert_called_once_with('agencyA', (datetime(2024, 1, 3), '3'))
+    assert get_agency_names(database) == ['Name', None, 'Name']
+    assert crawler.metrics.counters['agency_pages_failed'] == 1
+
+
+def test_request_agency_details_whenPageHasNoBanner_shouldReturnNotAvailable(mocker, database):
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_banner_html',
+                 return_value=(parse_html(b'<html><body></body></html>'), True))
+    crawler = create_crawler(database)
+
+    assert crawler.request_agency_details('agencyA') == ('N/A', 'N/A')
+    crawler.fetcher.close()
+
+
+def test_request_agency_details_whenPageFailsToLoad_shouldReturnNone(mocker, database):
+    mocker.patch('src.agency_crawler.AgencyCrawler.request_agency_banner_html', return_value=(None, False))
+    crawler = create_crawler(database)
+
+    assert crawler.request_agency_details('agencyA') is None
+    crawler.fetcher.close()
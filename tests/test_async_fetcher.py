@@ -0,0 +1,71 @@
+import time
+import asyncio
+import threading
+
+from src.common.async_fetcher import AsyncFetcher
+
+
+def test_fetch_shouldReturnResultOfFetchFunction():
+    fetcher: AsyncFetcher = AsyncFetcher(concurrency=2, per_host_delay=0)
+    result = asyncio.run(fetcher.fetch(
+        lambda url, suffix: url + suffix, 'https://tenantapp.com.au/a', '?page=1'))
+    assert result == 'https://tenantapp.com.au/a?page=1'
+
+
+def test_fetch_whenManyUrlsOnSameHost_shouldNotExceedPerHostConcurrency():
+    fetcher: AsyncFetcher = AsyncFetcher(
+        concurrency=8, per_host_concurrency=2, per_host_delay=0)
+    lock = threading.Lock()
+    in_flight = [0]
+    max_in_flight = [0]
+
+    def fake_request(url):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return url
+
+    async def fetch_all():
+        urls = ['https://tenantapp.com.au/{0}'.format(i) for i in range(10)]
+        return await asyncio.gather(*[fetcher.fetch(fake_request, url) for url in urls])
+
+    results = asyncio.run(fetch_all())
+    assert len(results) == 10
+    assert max_in_flight[0] <= 2
+
+
+def test_fetch_whenPerHostDelaySet_shouldSpaceOutRequests():
+    fetcher: AsyncFetcher = AsyncFetcher(concurrency=4, per_host_delay=0.05)
+    start_times = []
+
+    def fake_request(url):
+        start_times.append(time.monotonic())
+        return url
+
+    async def fetch_all():
+        urls = ['https://tenantapp.com.au/{0}'.format(i) for i in range(3)]
+        return await asyncio.gather(*[fetcher.fetch(fake_request, url) for url in urls])
+
+    asyncio.run(fetch_all())
+    start_times.sort()
+    assert start_times[-1] - start_times[0] >= 0.09
+
+
+def test_fetch_whenUsedInSecondEventLoop_shouldNotRaise():
+    fetcher: AsyncFetcher = AsyncFetcher(concurrency=1, per_host_delay=0)
+
+    def fake_request(url):
+        time.sleep(0.01)
+        return url
+
+    async def fetch_all():
+        urls = ['https://tenantapp.com.au/{0}'.format(i) for i in range(3)]
+        return await asyncio.gather(*[fetcher.fetch(fake_request, url) for url in urls])
+
+    # Semaphores waited on in the first loop can't be reused in the second one
+    assert len(asyncio.run(fetch_all())) == 3
+    assert len(asyncio.run(fetch_all())) == 3
+    fetcher.close()
@@ -0,0 +1,91 @@
+import time
+
+from src.common.batch_buffer import BatchBuffer
+from src.property_dataclass import PropertyBatch, PropertyListing
+
+
+def test_append_whenMaxRowsReached_shouldFlushAllItems():
+    batches = []
+    buffer: BatchBuffer = BatchBuffer(batches.append, max_rows=2)
+    buffer.append('a')
+    assert batches == []
+    buffer.append('b')
+    buffer.append('c')
+    assert batches == [['a', 'b']]
+    assert len(buffer) == 1
+    buffer.close()
+
+
+def test_append_whenMaxBytesReached_shouldFlush():
+    batches = []
+    buffer: BatchBuffer = BatchBuffer(
+        batches.append, max_rows=100, max_bytes=5, size_fn=len)
+    buffer.append('abc')
+    buffer.append('def')
+    assert batches == [['abc', 'def']]
+    buffer.close()
+
+
+def test_append_whenOldestItemWaitedTooLong_shouldFlush():
+    batches = []
+    buffer: BatchBuffer = BatchBuffer(
+        batches.append, max_rows=100, max_interval=0.01)
+    buffer.append('a')
+    time.sleep(0.02)
+    buffer.append('b')
+    assert batches == [['a', 'b']]
+    buffer.close()
+
+
+def test_exit_whenExceptionRaised_shouldFlushRemainingItems():
+    batches = []
+    try:
+        with BatchBuffer(batches.append, max_rows=100) as buffer:
+            buffer.append('a')
+            raise RuntimeError('crawler crashed')
+    except RuntimeError:
+        pass
+    assert batches == [['a']]
+
+
+def test_flush_shouldRecordLatencyOfEachFlush():
+    buffer: BatchBuffer = BatchBuffer(lambda items: None, max_rows=1)
+    buffer.append('a')
+    buffer.append('b')
+    buffer.close()
+    assert buffer.num_flushes == 2
+    assert buffer.num_flushed_items == 2
+    assert len(buffer.flush_latencies) == 2
+
+
+def test_flush_whenFlushSucceeds_shouldCallOnFlushedWithBatch():
+    flushed = []
+    buffer: BatchBuffer = BatchBuffer(lambda items: None, max_rows=2, on_flushed=flushed.append)
+    buffer.append('a')
+    assert flushed == []
+    buffer.append('b')
+    assert flushed == [['a', 'b']]
+    buffer.close()
+
+
+def test_flush_whenFlushFails_shouldNotCallOnFlushed():
+    def failing_flush(items):
+        raise RuntimeError('DB is down')
+
+    flushed = []
+    buffer: BatchBuffer = BatchBuffer(failing_flush, max_rows=1, on_flushed=flushed.append)
+    buffer.append('a')
+    buffer.close()
+    assert flushed == []
+
+
+def test_flush_whenNewItemsSet_shouldCollectItemsInNewContainerEachBatch():
+    flushed = []
+    buffer: BatchBuffer = BatchBuffer(flushed.append, max_rows=2, new_items=PropertyBatch)
+    for property_id in ('1', '2', '3'):
+        listing = PropertyListing()
+        listing.property_id = property_id
+        buffer.append(listing)
+    buffer.close()
+
+    assert [batch.columns['property_id'] for batch in flushed] == [['1', '2'], ['3']]
@@ -0,0 +1,25 @@
+from benchmarks.bench_suite import (
+    DETAIL_PAGE_FILE, LIST_PAGE_FILE, compare_to_baseline, read_bytes, run_end_to_end
+)
+
+
+def create_results(cases):
+    return {'parser': 'html.parser', 'cases': cases}
+
+
+def test_compare_to_baseline_whenCaseIsSlowerThanThreshold_shouldReportRegression():
+    baseline = create_results({'parse.list_page': 0.100, 'parse.detail_page': 0.100})
+    results = create_results({'parse.list_page': 0.130, 'parse.detail_page': 0.110})
+
+    assert compare_to_baseline(results, baseline, threshold=0.2) == ['parse.list_page']
+
+
+def test_compare_to_baseline_whenSlowdownIsTimerNoise_shouldNotReportRegression():
+    baseline = create_results({'extract.list.get_property_id': 0.00001})
+    results = create_results({'extract.list.get_property_id': 0.00003, 'new.case': 0.5})
+
+    assert compare_to_baseline(results, baseline, threshold=0.2) == []
+
+
+def test_run_end_to_end_shouldSaveEveryListingOfTheListPageToInMemoryDb():
+    assert run_end_to_end(read_bytes(LIST_PAGE_FILE), read_bytes(DETAIL_PAGE_FILE)) == 10
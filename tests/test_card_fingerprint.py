@@ -0,0 +1,59 @@
+from src.common.card_fingerprint import (
+    CHANGED, NEW, UNCHANGED, UNFINGERPRINTED, CardFingerprintIndex, get_card_fields, get_card_fingerprint
+)
+from src.property_dataclass import PropertyListing
+
+
+def create_card(property_id: str = '3811184', **fields) -> PropertyListing:
+    card = {'property_id': property_id, 'address': '10 Trafalgar Street, RHYLL', 'price': '$390pw',
+            'move_in_date': '3/11/22', 'property_images': ['1.jpg', '2.jpg']}
+    card.update(fields)
+    return PropertyListing.from_dict(card)
+
+
+def test_get_card_fingerprint_whenImagesReorderedOrPadded_shouldNotChange():
+    fingerprint = get_card_fingerprint(create_card())
+
+    assert len(fingerprint) == 16
+    assert get_card_fingerprint(create_card(property_images=['2.jpg', '1.jpg', '1.jpg'])) == fingerprint
+    assert get_card_fingerprint(create_card(price=' $390pw ')) == fingerprint
+
+
+def test_get_card_fingerprint_whenPriceOrMoveInDateChanged_shouldChange():
+    fingerprint = get_card_fingerprint(create_card())
+
+    assert get_card_fingerprint(create_card(price='$400pw')) != fingerprint
+    assert get_card_fingerprint(create_card(move_in_date='10/11/22')) != fingerprint
+    assert get_card_fingerprint(create_card(property_images=['1.jpg'])) != fingerprint
+
+
+def test_get_card_fields_shouldHaveIdCardFieldsAndFingerprint():
+    card = create_card()
+    card.card_fingerprint = 'abc'
+
+    assert get_card_fields(card) == {
+        'property_id': '3811184', 'address': '10 Trafalgar Street, RHYLL', 'price': '$390pw',
+        'move_in_date': '3/11/22', 'property_images': ['1.jpg', '2.jpg'], 'card_fingerprint': 'abc'}
+
+
+def test_get_status_shouldCompareCardWithStoredFingerprint():
+    fingerprint = get_card_fingerprint(create_card())
+    index = CardFingerprintIndex([('3811184', fingerprint), ('42', None), ('abc', fingerprint)])
+
+    assert len(index) == 3
+    assert index.get_status('3811184', fingerprint) == UNCHANGED
+    assert index.get_status('3811184', get_card_fingerprint(create_card(price='$400pw'))) == CHANGED
+    assert index.get_status('42', fingerprint) == UNFINGERPRINTED
+    assert index.get_status('abc', fingerprint) == UNCHANGED
+    assert index.get_status('7', fingerprint) == NEW
+
+
+def test_set_shouldUpdateStoredFingerprintWithoutAddingTwice():
+    index = CardFingerprintIndex([('3811184', None)])
+    index.set('3811184', '00000000000000ff')
+    index.set('1', '0123456789abcdef')
+    index.add('1')
+
+    assert index.get_fingerprint('3811184') == '00000000000000ff'
+    assert index.get_fingerprint('1') == '0123456789abcdef'
+    assert len(index) == 2
@@ -0,0 +1,71 @@
+import time
+from datetime import datetime
+
+from src.common.checkpoint import CheckpointJournal, FullSweepSchedule
+
+
+def test_record_whenResumed_shouldLoadLastKeyAndFinishedUrls(tmp_path):
+    journal = CheckpointJournal('job', directory=str(tmp_path))
+    journal.record('url1', (datetime(2024, 1, 1, 10, 30), '1'))
+    journal.record('url2')
+    journal.record('url3', (None, '3'))
+    journal.close()
+
+    resumed = CheckpointJournal('job', resume=True, directory=str(tmp_path))
+    assert resumed.last_key == (None, '3')
+    assert resumed.is_finished('url2') == True
+    assert resumed.is_finished('url4') == False
+    resumed.close()
+
+
+def test_init_whenNotResumed_shouldStartFromScratch(tmp_path):
+    journal = CheckpointJournal('job', directory=str(tmp_path))
+    journal.record('url1', (datetime(2024, 1, 1), '1'))
+    journal.close()
+
+    fresh = CheckpointJournal('job', directory=str(tmp_path))
+    fresh.close()
+    resumed = CheckpointJournal('job', resume=True, directory=str(tmp_path))
+    assert resumed.last_key is None
+    assert resumed.finished_urls == set()
+    resumed.close()
+
+
+def test_load_whenLastLineCutShort_shouldIgnoreIt(tmp_path):
+    journal = CheckpointJournal('job', directory=str(tmp_path))
+    journal.record('url1', (datetime(2024, 1, 1), '1'))
+    journal.file.write('{"url": "url2", "ke')
+    journal.close()
+
+    resumed = CheckpointJournal('job', resume=True, directory=str(tmp_path))
+    assert resumed.last_key == (datetime(2024, 1, 1), '1')
+    assert resumed.finished_urls == {'url1'}
+    resumed.record('url3')
+    resumed.close()
+
+    resumed_again = CheckpointJournal('job', resume=True, directory=str(tmp_path))
+    assert resumed_again.finished_urls == {'url1', 'url3'}
+    resumed_again.close()
+
+
+def test_reset_whenPassFinished_shouldStartNextResumedRunFromScratch(tmp_path):
+    journal = CheckpointJournal('job', directory=str(tmp_path))
+    journal.record('url1', (datetime(2024, 1, 1), '1'))
+    journal.reset()
+    journal.record('url2')
+    journal.close()
+
+    resumed = CheckpointJournal('job', resume=True, directory=str(tmp_path))
+    assert resumed.last_key is None
+    assert resumed.finished_urls == {'url2'}
+    resumed.close()
+
+
+def test_is_due_whenNeverSweptOrIntervalPassed_shouldReturnTrue(tmp_path, mocker):
+    schedule = FullSweepSchedule('job', interval_hours=24, directory=str(tmp_path))
+    assert schedule.is_due() == True
+
+    schedule.record()
+    assert schedule.is_due() == False
+    mocker.patch('src.common.checkpoint.time.time', return_value=time.time() + 25 * 3600)
+    assert schedule.is_due() == True
@@ -0,0 +1,83 @@
+import pytest
+from typing import List
+
+from src.transformer import Transformer
+from src.input_html_extractor import InputHtmlExtractor
+from src.common.html_parser import (
+    DEFAULT_PARSER,
+    get_available_parsers,
+    normalize_newlines,
+    parse_html,
+    set_default_parser,
+)
+
+DETAIL_PAGE_GETTERS: List[str] = [
+    'get_listing_title',
+    'get_listing_description',
+    'get_beds_baths_garages',
+    'get_property_features',
+    'get_google_maps_location_url',
+    'get_gps_coordinates',
+    'get_suburb_info_list',
+    'get_agent_name',
+    'get_off_market_status',
+]
+
+
+def read_html_with_parser(file_name: str, backend: str):
+    with open(file_name, 'rb') as file:
+        # Only html.parser keeps \r\n, which isn't a difference we care about here
+        return parse_html(normalize_newlines(file.read()), backend)
+
+
+def extract_all_fields(backend: str) -> dict:
+    list_page = read_html_with_parser(
+        'tests/html/property_list_page.html', backend)
+    detail_page = read_html_with_parser(
+        'tests/html/single_property_page.html', backend)
+    agency_page = read_html_with_parser(
+        'tests/html/agency_listings.html', backend)
+    agency_details = read_html_with_parser(
+        'tests/html/agency_details_on_property_detail_page.html', backend)
+    transformer: Transformer = Transformer(InputHtmlExtractor(list_page))
+
+    fields = {
+        'num_properties': transformer.extractor.get_num_properties(),
+        'cards': [(
+            transformer.get_address(card),
+            transformer.get_price(card),
+            transformer.get_property_id(card),
+            transformer.get_property_url(card),
+            transformer.get_move_in_date(card),
+            transformer.get_property_images(card),
+            transformer.get_agency_logo(card),
+            transformer.get_agency_property_listings_url(card),
+        ) for card in transformer.get_all_properties()],
+        'agency_banner': transformer.get_agency_banner(agency_page),
+        'agency_name': transformer.get_agency_name(agency_page),
+        'agency_details': transformer.get_agency_details(agency_details),
+        'agency_name_from_detail_page': transformer.get_agency_name_from_detail_page(agency_details),
+    }
+    for getter in DETAIL_PAGE_GETTERS:
+        fields[getter] = getattr(transformer, getter)(detail_page)
+    return fields
+
+
+@pytest.mark.parametrize('backend', get_available_parsers())
+def test_parse_html_whenAnyBackend_shouldExtractSameFieldsAsDefaultParser(backend):
+    assert extract_all_fields(backend) == extract_all_fields(DEFAULT_PARSER)
+
+
+def test_parse_html_whenHtmlParser_shouldKeepWindowsNewlines():
+    html = parse_html(b'<p>line 1\r\nline 2</p>', 'html.parser')
+    assert html.find('p').get_text() == 'line 1\r\nline 2'
+
+
+def test_normalize_newlines_shouldTurnAnyNewlineIntoLineFeed():
+    assert normalize_newlines(b'a\r\nb\rc\n') == b'a\nb\nc\n'
+    assert normalize_newlines('a\r\nb\rc\n') == 'a\nb\nc\n'
+
+
+def test_set_default_parser_whenUnknownBackend_shouldRaiseError():
+    with pytest.raises(ValueError):
+        set_default_parser('not-a-parser')
@@ -0,0 +1,135 @@
+import pytest
+
+from src.common.http_client import HttpClient, MarkerDetector, StreamResult, rebase_url
+from src.common.rate_limiter import AimdRateLimiter
+from src.common.retry_policy import RetryPolicy
+from .test_off_market_probe import OFF_MARKET_PAGE, SINGLE_PROPERTY_PAGE
+
+# Requests are mocked, no need to pace them
+NO_RATE_LIMIT = AimdRateLimiter(initial_rate=10 ** 6, max_rate=10 ** 6)
+
+
+class FakeRaw:
+    def __init__(self) -> None:
+        self.position = 0
+
+    def tell(self) -> int:
+        return self.position
+
+
+class FakeStreamedResponse:
+    def __init__(self, content: bytes, status_code: int = 200) -> None:
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'Content-Length': str(len(content))}
+        self.raw = FakeRaw()
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.content), chunk_size):
+            chunk = self.content[start:start + chunk_size]
+            self.raw.position += len(chunk)
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def test_feed_whenMarkerSplitBetweenChunks_shouldFindIt():
+    detector = MarkerDetector([b'top-bar-limit'])
+    assert detector.feed(b'<div class="top-ba') == False
+    assert detector.feed(b'r-limit">') == True
+    assert detector.found == True
+
+
+def test_feed_whenBytesAfterMarkerSet_shouldKeepReadingUntilEnough():
+    detector = MarkerDetector([b'marker'], bytes_after_marker=10)
+    assert detector.feed(b'xx marker 12') == False
+    assert detector.found == True
+    assert detector.feed(b'3456789') == True
+
+
+def test_stream_until_whenMarkerFound_shouldStopEarlyAndRecordSavings(mocker):
+    mocker.patch("src.common.http_client.STREAM_CHUNK_SIZE", 1024)
+    mocker.patch("src.common.http_client.requests.get",
+                 return_value=FakeStreamedResponse(OFF_MARKET_PAGE))
+    client = HttpClient(retry_policy=RetryPolicy(base_delay=0), rate_limiter=NO_RATE_LIMIT)
+    result: StreamResult = client.stream_until(
+        'https://tenantapp.com.au/Rentals/ViewListing/1', MarkerDetector([b'top-bar-limit']))
+
+    assert result.marker_found == True
+    assert result.complete == False
+    assert result.bytes_read < len(OFF_MARKET_PAGE)
+    assert result.bytes_saved == len(OFF_MARKET_PAGE) - result.bytes_read
+    assert b'top-bar-limit' in result.content
+    assert client.num_stopped_early == 1
+
+
+def test_stream_until_whenNoMarker_shouldReadWholePage(mocker):
+    mocker.patch("src.common.http_client.STREAM_CHUNK_SIZE", 1024)
+    mocker.patch("src.common.http_client.requests.get",
+                 return_value=FakeStreamedResponse(SINGLE_PROPERTY_PAGE))
+    client = HttpClient(retry_policy=RetryPolicy(base_delay=0), rate_limiter=NO_RATE_LIMIT)
+    result: StreamResult = client.stream_until(
+        'https://tenantapp.com.au/Rentals/ViewListing/1', MarkerDetector([b'top-bar-limit']))
+
+    assert result.marker_found == False
+    assert result.complete == True
+    assert result.content == SINGLE_PROPERTY_PAGE
+    assert result.bytes_saved == 0
+
+
+def test_stream_until_whenMaxBytesReached_shouldStopWithoutMarker(mocker):
+    mocker.patch("src.common.http_client.STREAM_CHUNK_SIZE", 1024)
+    mocker.patch("src.common.http_client.requests.get",
+                 return_value=FakeStreamedResponse(SINGLE_PROPERTY_PAGE))
+    client = HttpClient(retry_policy=RetryPolicy(base_delay=0), rate_limiter=NO_RATE_LIMIT)
+    result: StreamResult = client.stream_until(
+        'https://tenantapp.com.au/Rentals/ViewListing/1', MarkerDetector([b'top-bar-limit']), max_bytes=4096)
+
+    assert result.marker_found == False
+    assert result.complete == False
+    assert len(result.content) == 4096
+
+
+def test_get_html_whenBodyEmpty_shouldDownloadAgain(mocker):
+    responses = [FakeStreamedResponse(b''), FakeStreamedResponse(SINGLE_PROPERTY_PAGE)]
+    for response in responses:
+        response.elapsed = type('Elapsed', (), {'total_seconds': lambda self: 0.1})()
+    mock_get = mocker.patch("src.common.http_client.requests.get",
+                            side_effect=responses)
+    client = HttpClient(retry_policy=RetryPolicy(base_delay=0), rate_limiter=NO_RATE_LIMIT)
+
+    html = client.get_html('https://tenantapp.com.au/Rentals/ViewListing/1', lambda content: content)
+
+    assert html == SINGLE_PROPERTY_PAGE
+    assert mock_get.call_count == 2
+    assert client.retry_policy.counters['parse_errors'] == 1
+
+
+def test_stream_until_whenThrottled_shouldSlowDownRateLimiter(mocker):
+    mocker.patch("src.common.http_client.requests.get",
+                 side_effect=[FakeStreamedResponse(b'', 429), FakeStreamedResponse(OFF_MARKET_PAGE)])
+    limiter = AimdRateLimiter(initial_rate=10 ** 6, max_rate=10 ** 6)
+    client = HttpClient(retry_policy=RetryPolicy(base_delay=0), rate_limiter=limiter)
+
+    result = client.stream_until('https://tenantapp.com.au/Rentals/ViewListing/1',
+                                 MarkerDetector([b'top-bar-limit']))
+
+    assert result.marker_found == True
+    assert limiter.num_requests == 2
+    assert limiter.decrease_reasons == {'throttled': 1}
+    assert limiter.rate < 10 ** 6
+
+
+def test_rebase_url_whenBaseUrlOverridden_shouldSendTenantAppUrlsThere(mocker):
+    mocker.patch("src.common.http_client.BASE_URL", 'http://localhost:8080')
+
+    assert rebase_url('https://tenantapp.com.au/Rentals/ViewListing/1') == 'http://localhost:8080/Rentals/ViewListing/1'
+    assert rebase_url('https://example.com/Rentals/ViewListing/1') == 'https://example.com/Rentals/ViewListing/1'
+
+
+def test_rebase_url_whenBaseUrlNotOverridden_shouldKeepUrl():
+    assert rebase_url('https://tenantapp.com.au/Rentals/ViewListing/1') == 'https://tenantapp.com.au/Rentals/ViewListing/1'
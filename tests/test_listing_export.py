@@ -0,0 +1,129 @@
+import os
+import csv
+import gzip
+import pytest
+import pyarrow
+import pyarrow.parquet
+from datetime import datetime
+from sqlalchemy import ARRAY, Column, Integer, MetaData, Table, Text, insert
+
+from src.common.listing_export import (
+    CsvGzipExporter, ParquetExporter, get_arrow_schema, get_partition
+)
+from src.export_listings import ListingExport
+from tests.test_property_database import database  # noqa: F401
+
+
+def create_rows(num_rows: int, state: str = 'VIC', month: int = 1) -> list:
+    return [{'property_id': "{0}-{1}-{2}".format(state, month, i),
+             'state_and_territory': state,
+             'off_market': i % 2 == 0,
+             'data_collection_date': datetime(2024, month, 1 + i % 28)} for i in range(num_rows)]
+
+
+def as_table_rows(db, rows: list) -> list:
+    # Rows streamed from the DB have every column
+    return [{column.name: row.get(column.name) for column in db.table.columns} for row in rows]
+
+
+def read_parquet(directory: str) -> pyarrow.Table:
+    return pyarrow.parquet.read_table(directory)
+
+
+def test_get_partition_shouldMapStateAliasesToCodeAndDateToMonth():
+    assert get_partition({'state_and_territory': ' Victoria',
+                          'data_collection_date': datetime(2024, 3, 9)}) == ('VIC', '2024-03')
+    assert get_partition({'state_and_territory': 'nsw',
+                          'data_collection_date': '2023-12-01 10:00:00'}) == ('NSW', '2023-12')
+    assert get_partition({'state_and_territory': None,
+                          'data_collection_date': None}) == ('unknown', 'unknown')
+
+
+def test_get_arrow_schema_shouldKeepColumnTypes(database):
+    schema = get_arrow_schema(database.table)
+
+    assert schema.field('id').type == pyarrow.int64()
+    assert schema.field('off_market').type == pyarrow.bool_()
+    assert schema.field('data_collection_date').type == pyarrow.timestamp('us')
+    assert schema.field('address').type == pyarrow.string()
+
+
+def test_get_arrow_schema_whenArrayColumn_shouldBeListOfStrings():
+    table = Table('listings', MetaData(), Column('id', Integer), Column('property_images', ARRAY(Text)))
+
+    assert get_arrow_schema(table).field('property_images').type == pyarrow.list_(pyarrow.string())
+
+
+def test_parquet_exporter_shouldWriteOnePartitionPerStateAndMonth(database, tmp_path):
+    database.conn.execute(insert(database.table), create_rows(3, 'VIC', 1) + create_rows(2, 'Nsw', 2))
+    exporter = ParquetExporter(str(tmp_path / 'parquet'), database.table)
+    ListingExport(database, [exporter]).run(batch_size=2)
+
+    assert sorted(os.listdir(tmp_path / 'parquet')) == ['state=NSW', 'state=VIC']
+    assert os.listdir(tmp_path / 'parquet' / 'state=VIC') == ['collection_month=2024-01']
+    table = read_parquet(str(tmp_path / 'parquet' / 'state=NSW' / 'collection_month=2024-02'))
+    assert table.num_rows == 2
+    assert table.schema.field('off_market').type == pyarrow.bool_()
+    assert table.column('data_collection_date').to_pylist()[0] == datetime(2024, 2, 1)
+
+
+def test_parquet_exporter_whenPartitionBiggerThanRowGroupSize_shouldWriteBoundedRowGroups(database, tmp_path):
+    database.conn.execute(insert(database.table), create_rows(7))
+    exporter = ParquetExporter(str(tmp_path), database.table, row_group_size=3)
+    exporter.write([row for batch in database.stream_all(batch_size=2) for row in batch])
+    assert exporter.num_buffered == 1
+    exporter.close()
+
+    metadata = pyarrow.parquet.ParquetFile(
+        str(tmp_path / 'state=VIC' / 'collection_month=2024-01' / 'part-0.parquet')).metadata
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [3, 3, 1]
+
+
+def test_parquet_exporter_whenTooManyRowsBuffered_shouldWriteBiggestPartition(database, tmp_path):
+    exporter = ParquetExporter(str(tmp_path), database.table, row_group_size=10, max_buffered_rows=10)
+    exporter.write(as_table_rows(database, create_rows(6, 'VIC') + create_rows(4, 'NSW')))
+
+    assert exporter.num_buffered == 4
+    assert ('VIC', '2024-01') not in exporter.buffers
+    exporter.close()
+    assert read_parquet(str(tmp_path)).num_rows == 10
+
+
+def test_parquet_exporter_whenTooManyFilesOpen_shouldCarryOnInNewPartFile(database, tmp_path):
+    exporter = ParquetExporter(str(tmp_path), database.table, row_group_size=1, max_open_files=1)
+    exporter.write(as_table_rows(database, create_rows(1, 'VIC') + create_rows(1, 'NSW') + create_rows(1, 'VIC')))
+    exporter.close()
+
+    assert sorted(os.listdir(tmp_path / 'state=VIC' / 'collection_month=2024-01')) == [
+        'part-0.parquet', 'part-1.parquet']
+    assert exporter.num_files == 3
+
+
+def test_parquet_exporter_whenDirectoryNotEmpty_shouldRaise(database, tmp_path):
+    (tmp_path / 'part-0.parquet').write_bytes(b'')
+
+    with pytest.raises(FileExistsError):
+        ParquetExporter(str(tmp_path), database.table)
+
+
+def test_csv_gzip_exporter_shouldWriteHeaderAndFormattedRows(database, tmp_path):
+    path = str(tmp_path / 'listings.csv.gz')
+    exporter = CsvGzipExporter(path, database.table)
+    exporter.write(as_table_rows(database, [{**create_rows(1)[0], 'property_images': ['a.jpg', 'b.jpg']}]))
+    exporter.close()
+
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 1
+    assert rows[0]['property_id'] == 'VIC-1-0'
+    assert rows[0]['property_images'] == '["a.jpg", "b.jpg"]'
+    assert rows[0]['data_collection_date'] == '2024-01-01 00:00:00'
+    assert rows[0]['address'] == ''
+
+
+def test_run_whenStateProvided_shouldOnlyExportThatState(database, tmp_path):
+    database.conn.execute(insert(database.table), create_rows(2, 'Victoria') + create_rows(3, 'NSW'))
+    exporter = CsvGzipExporter(str(tmp_path / 'listings.csv.gz'), database.table)
+
+    assert ListingExport(database, [exporter]).run('vic', batch_size=1) == 2
+    assert exporter.num_rows == 2
@@ -0,0 +1,57 @@
+import json
+import pytest
+
+from src.common.metrics import DB_WRITE, FETCH, Histogram, Metrics
+
+
+def test_observe_shouldCountEachValueInItsBucket():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+
+    assert histogram.bucket_counts == [1, 2, 1]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(6.25)
+    assert (histogram.min, histogram.max) == (0.05, 5.0)
+
+
+def test_quantile_shouldInterpolateInsideBucketAndStayWithinMinMax():
+    histogram = Histogram(buckets=(1.0, 2.0))
+    for value in (1.2, 1.4, 1.6, 1.8):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == pytest.approx(1.5)
+    assert 1.2 <= histogram.quantile(0.01) <= histogram.quantile(0.99) <= 1.8
+    assert Histogram().quantile(0.5) is None
+
+
+def test_time_whenBlockRaises_shouldStillRecordStage():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.time(FETCH):
+            raise ValueError("page failed")
+    assert metrics.histograms[FETCH].count == 1
+
+
+def test_write_shouldSaveJsonSummaryAndPrometheusTextFile(tmp_path):
+    metrics = Metrics('tenantapp_crawler-vic')
+    metrics.observe(FETCH, 0.3)
+    metrics.observe(FETCH, 0.7)
+    metrics.observe(DB_WRITE, 0.02)
+    metrics.increment('listings_saved', 2)
+    json_path, prometheus_path = metrics.write(str(tmp_path))
+
+    with open(json_path) as file:
+        summary = json.load(file)
+    assert summary['job'] == 'tenantapp_crawler-vic'
+    assert summary['counters']['listings_saved']['value'] == 2
+    assert summary['stages'][FETCH]['count'] == 2
+    assert summary['stages'][FETCH]['mean'] == pytest.approx(0.5)
+
+    with open(prometheus_path) as file:
+        lines = file.read().splitlines()
+    assert '# TYPE tenantapp_stage_seconds histogram' in lines
+    assert 'tenantapp_stage_seconds_bucket{job="tenantapp_crawler-vic",stage="fetch",le="0.5"} 1' in lines
+    assert 'tenantapp_stage_seconds_bucket{job="tenantapp_crawler-vic",stage="fetch",le="+Inf"} 2' in lines
+    assert 'tenantapp_stage_seconds_count{job="tenantapp_crawler-vic",stage="db_write"} 1' in lines
+    assert 'tenantapp_listings_saved_total{job="tenantapp_crawler-vic"} 2' in lines
@@ -0,0 +1,73 @@
+import threading
+import pytest
+import requests
+
+from benchmarks.mock_tenantapp_server import MockTenantAppServer, MockTenantAppSite
+from src.common.html_parser import parse_html
+from src.common.http_client import HttpClient
+from src.common.retry_policy import RetryPolicy
+from src.input_html_extractor import InputHtmlExtractor
+from src.transformer import Transformer
+from .test_http_client import NO_RATE_LIMIT
+
+SITE = MockTenantAppSite(num_listings=25, num_agencies=3, off_market_rate=0.5)
+
+
+@pytest.fixture
+def server():
+    server = MockTenantAppServer(('127.0.0.1', 0), SITE)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_list_page_shouldHoldListingsOfEveryPageUpToIt(server):
+    response = requests.get(server.base_url + '/Rentals/vic-rental-properties?page=2', timeout=5)
+    extractor = InputHtmlExtractor(parse_html(response.content))
+    transformer = Transformer(extractor)
+    cards = transformer.get_all_properties()
+
+    assert response.status_code == 200
+    assert extractor.get_num_pages() == 3
+    assert len(cards) == 20
+    assert len({transformer.get_property_id(card) for card in cards}) == 20
+    assert transformer.get_agency_property_listings_url(cards[0]).endswith('/Rentals/Agency/agency{0}'.format(
+        int(transformer.get_property_id(cards[0])) % 3))
+
+
+def test_list_page_whenPageIsPastTheLastOne_shouldHoldEveryListing(server):
+    response = requests.get(server.base_url + '/Rentals/vic-rental-properties?page=9', timeout=5)
+
+    assert len(Transformer(InputHtmlExtractor(parse_html(response.content))).get_all_properties()) == 25
+
+
+def test_detail_page_shouldHaveOffMarketBannerOnlyForOffMarketListings(server):
+    transformer = Transformer(InputHtmlExtractor(None))
+    for listing_id in range(1000000, 1000006):
+        response = requests.get(server.base_url + '/Rentals/ViewListing/{0}'.format(listing_id), timeout=5)
+        assert transformer.get_off_market_status(parse_html(response.content)) == SITE.is_off_market(listing_id)
+
+
+def test_get_whenThrottleRateIsOne_shouldAnswer429WithRetryAfter(server):
+    server.throttle_rate = 1.0
+    response = requests.get(server.base_url + '/Rentals/Agency/agency0', timeout=5)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert server.counters['throttled'] == 1
+
+
+def test_get_whenUnknownPath_shouldAnswer404(server):
+    assert requests.get(server.base_url + '/Rentals/unknown', timeout=5).status_code == 404
+
+
+def test_http_client_whenBaseUrlOverridden_shouldFetchTenantAppUrlsFromMockServer(mocker, server):
+    mocker.patch("src.common.http_client.BASE_URL", server.base_url)
+    client = HttpClient(cache=None, retry_policy=RetryPolicy(base_delay=0), rate_limiter=NO_RATE_LIMIT)
+
+    html = client.get_html('https://tenantapp.com.au/Rentals/Agency/agency0', parse_html)
+
+    assert html is not None
+    assert server.counters['requests'] == 1
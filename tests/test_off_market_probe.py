@@ -0,0 +1,43 @@
+from src.transformer import Transformer
+from src.off_market_probe import OffMarketProbe
+from src.input_html_extractor import InputHtmlExtractor
+
+with open('tests/html/single_property_page.html', 'rb') as file:
+    SINGLE_PROPERTY_PAGE: bytes = file.read()
+
+OFF_MARKET_PAGE: bytes = SINGLE_PROPERTY_PAGE.replace(
+    b'<body', b'<div class="top-bar-limit">This property is off market</div><body', 1)
+MARKER_ONLY_IN_STYLESHEET_PAGE: bytes = SINGLE_PROPERTY_PAGE.replace(
+    b'<head>', b'<head><style>.top-bar-limit { color: red; }</style>', 1)
+
+
+def create_probe(verify_every: int = 0) -> OffMarketProbe:
+    return OffMarketProbe(Transformer(InputHtmlExtractor(None)), verify_every)
+
+
+def test_is_off_market_whenNoBannerMarkerInPage_shouldUseFastPath():
+    probe: OffMarketProbe = create_probe()
+    assert probe.is_off_market(SINGLE_PROPERTY_PAGE) == False
+    assert probe.num_fast_path == 1
+    assert probe.num_strained == 0
+
+
+def test_is_off_market_whenBannerInPage_shouldConfirmWithPartialParse():
+    probe: OffMarketProbe = create_probe()
+    assert probe.is_off_market(OFF_MARKET_PAGE) == True
+    assert probe.num_fast_path == 0
+    assert probe.num_strained == 1
+
+
+def test_is_off_market_whenMarkerOnlyInStylesheet_shouldReturnFalse():
+    probe: OffMarketProbe = create_probe()
+    assert probe.is_off_market(MARKER_ONLY_IN_STYLESHEET_PAGE) == False
+    assert probe.num_strained == 1
+
+
+def test_is_off_market_whenVerifyEverySet_shouldCheckFastPathWithFullParse():
+    probe: OffMarketProbe = create_probe(verify_every=2)
+    probe.is_off_market(SINGLE_PROPERTY_PAGE)
+    probe.is_off_market(SINGLE_PROPERTY_PAGE)
+    assert probe.num_verified == 1
+    assert probe.num_mismatches == 0
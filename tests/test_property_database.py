@@ -0,0 +1,349 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Integer, String, Boolean, DateTime, Text, insert, select
+)
+
+from src.property_database import PropertyDatabase
+from src.property_dataclass import PropertyBatch, PropertyListing
+
+
+def create_property_listings_table(metadata: MetaData, with_card_fingerprint: bool = True) -> Table:
+    # Same columns as src/sql/create_db.sql, with arrays stored as text for sqlite
+    table = Table(
+        'propertylistings', metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('address', Text),
+        Column('price', String(255)),
+        Column('agency_property_listings_url', Text),
+        Column('agency_logo', Text),
+        Column('property_images', Text),
+        Column('property_url', String(100)),
+        Column('property_id', String(50)),
+        Column('move_in_date', String(20)),
+        Column('listing_title', Text),
+        Column('listing_description', Text),
+        Column('num_bedrooms', String(2)),
+        Column('num_bathrooms', String(2)),
+        Column('num_garages', String(2)),
+        Column('property_features', Text),
+        Column('google_maps_location_url', Text),
+        Column('gps_coordinates', String(255)),
+        Column('suburb', String(255)),
+        Column('state_and_territory', String(20)),
+        Column('postcode', String(10)),
+        Column('agent_name', String(255)),
+        Column('off_market', Boolean, nullable=False, default=False),
+        Column('ad_details_included', Boolean, nullable=False, default=False),
+        Column('ad_removed_date', DateTime),
+        Column('ad_posted_date', DateTime),
+        Column('data_collection_date', DateTime),
+        Column('agency_name', String(255)),
+        Column('agency_address', String(255)),
+        Column('etl_done', Boolean),
+    )
+    if with_card_fingerprint:
+        table.append_column(Column('card_fingerprint', String(16)))
+    return table
+
+
+def create_database(mocker, with_card_fingerprint: bool = True) -> PropertyDatabase:
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    db = PropertyDatabase()
+    db.dbEngine = create_engine("sqlite://")
+    db.conn = db.dbEngine.connect()
+    db.metadata = MetaData()
+    db.table = create_property_listings_table(db.metadata, with_card_fingerprint)
+    db.metadata.create_all(db.dbEngine)
+    return db
+
+
+@pytest.fixture
+def database(mocker):
+    db = create_database(mocker)
+    yield db
+    db.conn.close()
+
+
+@pytest.fixture
+def database_before_migration(mocker):
+    # Table as it was before the card_fingerprint column was added
+    db = create_database(mocker, with_card_fingerprint=False)
+    yield db
+    db.conn.close()
+
+
+def insert_rows(db: PropertyDatabase, rows: list) -> None:
+    db.conn.execute(insert(db.table), rows)
+
+
+def test_select_on_market_property_ids_whenNoStateProvided_shouldReturnAllOnMarketIds(database):
+    insert_rows(database, [
+        {'property_id': '1', 'off_market': False, 'state_and_territory': 'VIC'},
+        {'property_id': '2', 'off_market': True, 'state_and_territory': 'VIC'},
+        {'property_id': '3', 'off_market': False, 'state_and_territory': 'NSW'},
+    ])
+    assert sorted(database.select_on_market_property_ids()) == ['1', '3']
+
+
+def test_select_on_market_property_ids_whenStateProvided_shouldMatchAliasesAndMissingState(database):
+    insert_rows(database, [
+        {'property_id': '1', 'off_market': False, 'state_and_territory': 'Vic'},
+        {'property_id': '2', 'off_market': False, 'state_and_territory': 'Victoria'},
+        {'property_id': '3', 'off_market': False, 'state_and_territory': 'NSW'},
+        {'property_id': '4', 'off_market': False, 'state_and_territory': None},
+    ])
+    ids = database.select_on_market_property_ids(['VIC', 'VICTORIA'])
+    assert sorted(ids) == ['1', '2', '4']
+
+
+def create_listing(property_id: str, **fields) -> PropertyListing:
+    listing: PropertyListing = PropertyListing()
+    listing.property_id = property_id
+    listing.off_market = False
+    listing.ad_details_included = True
+    for key, value in fields.items():
+        setattr(listing, key, value)
+    return listing
+
+
+def select_property_ids(db: PropertyDatabase) -> list:
+    return sorted(row.property_id for row in db.conn.execute(select([db.table])))
+
+
+def test_save_bulk_whenRowsHaveDifferentFields_shouldSaveAllRows(database):
+    database.save_bulk([
+        create_listing('1', agency_name='Agency'),
+        create_listing('2'),
+    ])
+    assert select_property_ids(database) == ['1', '2']
+
+
+def test_save_bulk_or_single_whenOneRowIsBad_shouldStillSaveOtherRows(database):
+    bad_listing: PropertyListing = create_listing('2')
+    bad_listing.off_market = None
+    database.save_bulk_or_single([create_listing('1'), bad_listing])
+    assert select_property_ids(database) == ['1']
+
+
+def test_create_write_buffer_shouldInsertListingsOnFlush(database):
+    buffer = database.create_write_buffer(max_rows=2)
+    buffer.append(create_listing('1'))
+    assert select_property_ids(database) == []
+    buffer.append(create_listing('2'))
+    buffer.append(create_listing('3'))
+    assert select_property_ids(database) == ['1', '2']
+    buffer.close()
+    assert select_property_ids(database) == ['1', '2', '3']
+
+
+def test_create_write_buffer_shouldCollectListingsInPropertyBatch(database):
+    flushed = []
+    buffer = database.create_write_buffer(max_rows=2, on_flushed=flushed.append)
+    buffer.append(create_listing('1'))
+    buffer.append(create_listing('2', agency_name='Agency'))
+
+    assert isinstance(flushed[0], PropertyBatch)
+    assert flushed[0].columns['property_id'] == ['1', '2']
+    assert flushed[0].columns['agency_name'] == [None, 'Agency']
+    buffer.close()
+
+
+def test_save_bulk_or_single_whenBatchFails_shouldSaveRowsOfBatchOneByOne(database):
+    bad_listing: PropertyListing = create_listing('2')
+    bad_listing.off_market = None
+    database.save_bulk_or_single(PropertyBatch.from_listings([create_listing('1'), bad_listing]))
+    assert select_property_ids(database) == ['1']
+
+
+def test_update_ad_removed_dates_bulk_shouldOnlyUpdateListingsStillOnMarket(database):
+    removed_date = datetime(2024, 1, 2, 3, 4, 5)
+    insert_rows(database, [
+        {'property_id': '1', 'off_market': False, 'ad_removed_date': None},
+        {'property_id': '2', 'off_market': True, 'ad_removed_date': datetime(2023, 1, 1)},
+        {'property_id': '3', 'off_market': False, 'ad_removed_date': None},
+    ])
+    database.update_ad_removed_dates_bulk([('1', removed_date), ('2', removed_date)])
+    rows = {row.property_id: row for row in database.conn.execute(select([database.table]))}
+
+    assert rows['1'].off_market == True
+    assert rows['1'].ad_removed_date == removed_date
+    assert rows['2'].ad_removed_date == datetime(2023, 1, 1)
+    assert rows['3'].off_market == False
+    assert rows['3'].ad_removed_date is None
+
+
+def test_create_ad_removed_date_buffer_shouldUpdateListingsOnFlush(database):
+    insert_rows(database, [{'property_id': '1', 'off_market': False}])
+    buffer = database.create_ad_removed_date_buffer(max_rows=10)
+    buffer.append(('1', datetime(2024, 1, 2)))
+    assert list(database.select_on_market_property_ids()) == ['1']
+    buffer.close()
+    assert list(database.select_on_market_property_ids()) == []
+
+
+def insert_on_market_rows(db: PropertyDatabase, posted_dates: dict) -> None:
+    insert_rows(db, [{'property_id': property_id,
+                      'property_url': 'https://tenantapp.com.au/Rentals/ViewListing/' + property_id,
+                      'off_market': False,
+                      'ad_removed_date': None,
+                      'state_and_territory': 'VIC',
+                      'ad_posted_date': posted_date} for property_id, posted_date in posted_dates.items()])
+
+
+def test_stream_where_not_off_market_shouldReturnEveryRowAcrossBatchesInOrder(database):
+    insert_on_market_rows(database, {
+        '4': datetime(2024, 1, 2),
+        '1': datetime(2024, 1, 1),
+        '3': datetime(2024, 1, 1),
+        '2': None,
+        '5': datetime(2024, 1, 1),
+    })
+    rows = list(database.stream_where_not_off_market(
+        'VIC', ['property_url'], batch_size=2))
+
+    assert [row['property_id'] for row in rows] == ['1', '3', '5', '4', '2']
+    assert rows[0]['property_url'] == 'https://tenantapp.com.au/Rentals/ViewListing/1'
+
+
+def test_stream_where_not_off_market_whenOffsetAndLimit_shouldReturnSameRowsAsOffsetQuery(database):
+    posted_dates = {str(i): datetime(2024, 1, 1 + i % 3) for i in range(10)}
+    insert_on_market_rows(database, posted_dates)
+    insert_on_market_rows(database, {'a': None, 'b': None})
+    expected = sorted(posted_dates, key=lambda property_id: (
+        posted_dates[property_id], property_id)) + ['a', 'b']
+    for offset, limit in [(0, 4), (3, 5), (9, 3), (11, 3), (20, 3)]:
+        streamed = [row['property_id'] for row in database.stream_where_not_off_market(
+            'VIC', ['property_id'], offset, limit, batch_size=2)]
+        assert streamed == expected[offset:offset + limit]
+
+
+def test_stream_where_no_agency_details_whenRowsUpdatedWhileStreaming_shouldNotSkipRows(database):
+    insert_on_market_rows(database, {str(i): datetime(2024, 1, 1) for i in range(5)})
+    streamed = []
+    for row in database.stream_where_no_agency_details(['property_id', 'agency_property_listings_url'], batch_size=2):
+        streamed.append(row['property_id'])
+        database.update_agency_details(row['property_id'], None, 'Agency', 'Address')
+
+    assert streamed == ['0', '1', '2', '3', '4']
+
+
+def test_stream_all_shouldReturnEveryRowOnceInBatchesOrderedById(database):
+    insert_rows(database, [{'property_id': str(i), 'state_and_territory': 'VIC'} for i in range(5)])
+    batches = list(database.stream_all(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [row['property_id'] for batch in batches for row in batch] == ['0', '1', '2', '3', '4']
+
+
+def test_stream_all_whenStateAliasesProvided_shouldOnlyReturnThatState(database):
+    insert_rows(database, [
+        {'property_id': '1', 'state_and_territory': 'Vic'},
+        {'property_id': '2', 'state_and_territory': 'NSW'},
+        {'property_id': '3', 'state_and_territory': 'Victoria'},
+    ])
+    rows = [row for batch in database.stream_all(['VIC', 'VICTORIA'], batch_size=1) for row in batch]
+
+    assert [row['property_id'] for row in rows] == ['1', '3']
+
+
+def test_select_on_market_card_fingerprints_shouldReturnIdAndFingerprintOfOnMarketEntries(database):
+    insert_rows(database, [
+        {'property_id': '1', 'off_market': False, 'card_fingerprint': 'abc'},
+        {'property_id': '2', 'off_market': True, 'card_fingerprint': 'def'},
+        {'property_id': '3', 'off_market': False, 'card_fingerprint': None},
+    ])
+    assert sorted(database.select_on_market_card_fingerprints()) == [('1', 'abc'), ('3', None)]
+
+
+def test_update_card_fields_bulk_shouldOnlyUpdateOnMarketEntryAndMarkItForEtl(database):
+    insert_rows(database, [
+        {'property_id': '1', 'off_market': True, 'price': '$300pw', 'etl_done': True},
+        {'property_id': '1', 'off_market': False, 'price': '$390pw', 'etl_done': True},
+    ])
+    database.update_card_fields_bulk([{'property_id': '1', 'address': 'address', 'price': '$400pw',
+                                       'move_in_date': '1/1/24', 'property_images': None,
+                                       'card_fingerprint': 'abc'}])
+
+    rows = database.conn.execute(select([database.table]).order_by(database.table.columns.id)).fetchall()
+    assert [(row.price, row.card_fingerprint, row.etl_done) for row in rows] == [
+        ('$300pw', None, True), ('$400pw', 'abc', False)]
+
+
+def test_update_listing_details_shouldKeepWhenTheAdWasFirstSeen(database):
+    posted_date = datetime(2024, 1, 1)
+    insert_rows(database, [{'property_id': '1', 'off_market': False, 'listing_title': 'old',
+                            'ad_posted_date': posted_date, 'data_collection_date': posted_date}])
+    listing = PropertyListing.from_dict({'property_id': '1', 'listing_title': 'new', 'off_market': False,
+                                         'ad_posted_date': datetime(2024, 2, 1),
+                                         'data_collection_date': datetime(2024, 2, 1)})
+    database.update_listing_details(listing)
+
+    row = database.conn.execute(select([database.table])).fetchone()
+    assert row.listing_title == 'new'
+    assert row.ad_posted_date == posted_date
+    assert row.data_collection_date == posted_date
+
+
+def test_update_agency_details_of_agency_shouldUpdateEveryListingOfAgencyMissingDetails(database):
+    insert_rows(database, [
+        {'property_id': '1', 'agency_property_listings_url': 'agency1', 'agency_name': None},
+        {'property_id': '2', 'agency_property_listings_url': 'agency1', 'agency_name': None},
+        {'property_id': '3', 'agency_property_listings_url': 'agency2', 'agency_name': None},
+    ])
+    assert database.update_agency_details_of_agency('agency1', 'Agency', 'Address') == 2
+    assert database.update_agency_details_of_agency('agency1', 'Agency', 'Address') == 0
+
+    rows = database.conn.execute(select([database.table]).order_by(database.table.columns.id)).fetchall()
+    assert [row.agency_name for row in rows] == ['Agency', 'Agency', None]
+
+
+def test_create_db_engine_shouldPageExecutemanyUpdates(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    mock_create_engine = mocker.patch("src.property_database.create_engine")
+    PropertyDatabase().create_db_engine()
+
+    # values_only, the default, sends UPDATE executemany one row at a time
+    assert mock_create_engine.call_args.kwargs['executemany_mode'] == 'values_plus_batch'
+
+
+def test_update_card_fields_bulk_whenFingerprintAlreadyStored_shouldLeaveEntryAndEtlFlagAlone(database):
+    insert_rows(database, [{'property_id': '1', 'off_market': False, 'price': '$390pw',
+                            'card_fingerprint': 'abc', 'etl_done': True}])
+    database.update_card_fields_bulk([{'property_id': '1', 'address': None, 'price': '$400pw',
+                                       'move_in_date': None, 'property_images': None,
+                                       'card_fingerprint': 'abc'}])
+
+    row = database.conn.execute(select([database.table])).fetchone()
+    assert (row.price, row.etl_done) == ('$390pw', True)
+
+
+def test_update_card_fingerprints_bulk_shouldOnlyStoreFingerprintOfEntriesWithout(database):
+    insert_rows(database, [{'property_id': '1', 'off_market': False, 'price': '$390pw',
+                            'card_fingerprint': None, 'etl_done': True},
+                           {'property_id': '2', 'off_market': False, 'price': '$500pw',
+                            'card_fingerprint': 'old', 'etl_done': True}])
+    database.update_card_fingerprints_bulk([('1', 'abc'), ('2', 'def')])
+
+    rows = database.conn.execute(select([database.table]).order_by(database.table.columns.property_id)).fetchall()
+    assert [(row.price, row.card_fingerprint, row.etl_done) for row in rows] == \
+        [('$390pw', 'abc', True), ('$500pw', 'old', True)]
+
+
+def test_save_bulk_whenNoFingerprintColumn_shouldSaveRowsWithoutIt(database_before_migration):
+    listing = create_listing('1', card_fingerprint='abc')
+    database_before_migration.save_bulk([listing])
+
+    assert database_before_migration.has_card_fingerprint() is False
+    assert database_before_migration.conn.execute(
+        select([database_before_migration.table.columns.property_id])).fetchall() == [('1',)]
+
+
+def test_save_single_whenNoFingerprintColumn_shouldSaveRowWithoutIt(database_before_migration):
+    listing = create_listing('1', card_fingerprint='abc')
+    database_before_migration.save_single(listing)
+
+    assert database_before_migration.conn.execute(
+        select([database_before_migration.table.columns.property_id])).fetchall() == [('1',)]
@@ -0,0 +1,65 @@
+import pickle
+import pytest
+
+from src.property_dataclass import PROPERTY_LISTING_FIELDS, PropertyBatch, PropertyListing
+
+
+def create_listing(property_id: str, **fields) -> PropertyListing:
+    listing: PropertyListing = PropertyListing()
+    listing.property_id = property_id
+    listing.property_images = ['image.jpg']
+    listing.off_market = False
+    for key, value in fields.items():
+        setattr(listing, key, value)
+    return listing
+
+
+def test_property_listing_shouldHaveSlotsInsteadOfDict():
+    listing = create_listing('1')
+    assert not hasattr(listing, '__dict__')
+    with pytest.raises(AttributeError):
+        listing.not_a_field = 'value'
+
+
+def test_to_dict_shouldOnlyHaveFieldsThatWereSet():
+    assert create_listing('1').to_dict() == {
+        'property_images': ['image.jpg'], 'property_id': '1', 'off_market': False}
+
+
+def test_from_dict_shouldRebuildSameListingAfterPickling():
+    listing = create_listing('1', address='10 Trafalgar Street, RHYLL')
+    assert PropertyListing.from_dict(pickle.loads(pickle.dumps(listing)).to_dict()).to_dict() == listing.to_dict()
+
+
+def test_append_shouldFillEveryColumnWithNoneForMissingFields():
+    batch = PropertyBatch.from_listings([create_listing('1'), create_listing('2', agency_name='Agency')])
+
+    assert len(batch) == 2
+    assert list(batch.columns) == PROPERTY_LISTING_FIELDS
+    assert batch.columns['property_id'] == ['1', '2']
+    assert batch.columns['agency_name'] == [None, 'Agency']
+
+
+def test_to_db_params_shouldGiveEveryRowTheSameKeys():
+    params = PropertyBatch.from_listings([create_listing('1'), create_listing('2', agency_name='Agency')]).to_db_params()
+
+    assert [row['property_id'] for row in params] == ['1', '2']
+    assert all(list(row) == PROPERTY_LISTING_FIELDS for row in params)
+
+
+def test_iter_shouldRebuildListingsOfTheBatch():
+    listings = list(PropertyBatch.from_listings([create_listing('1'), create_listing('2')]))
+    assert [listing.property_id for listing in listings] == ['1', '2']
+    assert listings[0].address is None
+
+
+def test_to_pandas_and_to_arrow_shouldKeepColumnsAndTypes():
+    batch = PropertyBatch.from_listings([create_listing('1'), create_listing('2')])
+    df = batch.to_pandas()
+    table = batch.to_arrow()
+
+    assert list(df.columns) == PROPERTY_LISTING_FIELDS
+    assert df['property_id'].tolist() == ['1', '2']
+    assert table.num_rows == 2
+    assert str(table.schema.field('property_images').type) == 'list<item: string>'
+    assert str(table.schema.field('off_market').type) == 'bool'
@@ -0,0 +1,30 @@
+from src.common.property_id_index import PropertyIdIndex
+
+
+def test_contains_whenIdLoaded_shouldReturnTrue():
+    index: PropertyIdIndex = PropertyIdIndex(['3811184', '42', '3811184'])
+    assert '3811184' in index
+    assert '42' in index
+    assert len(index) == 2
+
+
+def test_contains_whenIdNotLoaded_shouldReturnFalse():
+    index: PropertyIdIndex = PropertyIdIndex(['3811184'])
+    assert '3811185' not in index
+    assert '' not in index
+    assert None not in index
+
+
+def test_contains_whenIdIsNotCanonicalInteger_shouldMatchExactString():
+    index: PropertyIdIndex = PropertyIdIndex(['007', 'abc'])
+    assert '007' in index
+    assert '7' not in index
+    assert 'abc' in index
+
+
+def test_add_shouldMakeIdKnown():
+    index: PropertyIdIndex = PropertyIdIndex()
+    index.add('3811184')
+    index.add('3811184')
+    assert '3811184' in index
+    assert len(index) == 1
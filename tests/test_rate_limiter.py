@@ -0,0 +1,70 @@
+import pytest
+
+from src.common.rate_limiter import AimdRateLimiter
+
+
+@pytest.fixture
+def clock(mocker):
+    now = [1000.0]
+    mocker.patch("src.common.rate_limiter.time.monotonic",
+                 side_effect=lambda: now[0])
+    return now
+
+
+def test_reserve_whenBucketEmpty_shouldWaitForNextTokenAtCurrentRate(clock):
+    limiter = AimdRateLimiter(initial_rate=2, burst=1)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == pytest.approx(0.5)
+    # Tokens are reserved in order, the next caller waits behind the previous one
+    assert limiter.reserve() == pytest.approx(1.0)
+
+    clock[0] += 10
+    assert limiter.reserve() == 0.0
+
+
+def test_get_wait_shouldNotTakeToken(clock):
+    limiter = AimdRateLimiter(initial_rate=2, burst=1)
+    limiter.reserve()
+    assert limiter.get_wait() == pytest.approx(0.5)
+    assert limiter.get_wait() == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert limiter.get_wait() == 0.0
+
+
+def test_record_response_whenHealthy_shouldIncreaseRateAdditively(clock):
+    limiter = AimdRateLimiter(initial_rate=2, max_rate=3, additive_increase=1)
+    limiter.record_response(200, 0.1)
+    assert limiter.rate == pytest.approx(2.5)
+    for _ in range(10):
+        limiter.record_response(200, 0.1)
+    assert limiter.rate == 3
+
+
+def test_record_response_whenThrottledServerErrorOrSlow_shouldHalveRate(clock):
+    limiter = AimdRateLimiter(initial_rate=8, min_rate=1, decrease_cooldown=1, latency_target=5)
+    limiter.record_response(429, 0.1)
+    assert limiter.rate == 4
+    clock[0] += 1
+    limiter.record_response(500, 0.1)
+    assert limiter.rate == 2
+    clock[0] += 1
+    limiter.record_response(200, 6.0)
+    assert limiter.rate == 1
+    clock[0] += 1
+    limiter.record_timeout()
+    assert limiter.rate == 1  # never below min_rate
+    assert limiter.decrease_reasons == {'throttled': 1, 'server_error': 1, 'slow': 1, 'timeout': 1}
+
+
+def test_decrease_whenBurstOfFailures_shouldOnlyBackOffOncePerCooldown(clock):
+    limiter = AimdRateLimiter(initial_rate=8, decrease_cooldown=2)
+    for _ in range(5):
+        limiter.record_response(503, 0.1)
+    assert limiter.rate == 4
+    assert limiter.num_decreases == 1
+
+
+def test_record_response_whenNotFound_shouldLeaveRateAlone(clock):
+    limiter = AimdRateLimiter(initial_rate=2)
+    limiter.record_response(404, 0.1)
+    assert limiter.rate == 2
@@ -0,0 +1,135 @@
+import time
+import pytest
+
+from src.common.http_client import HttpClient
+from src.common.rate_limiter import AimdRateLimiter
+from src.common.retry_policy import RetryPolicy
+from src.common.response_cache import (
+    AGENCY_PAGE,
+    DETAIL_PAGE,
+    LIST_PAGE,
+    ResponseCache,
+    get_url_class
+)
+
+DETAIL_URL = 'https://tenantapp.com.au/Rentals/ViewListing/3811184'
+LIST_URL = 'https://tenantapp.com.au/Rentals/vic-rental-properties?page=2#List'
+
+# Requests are mocked, no need to pace them
+NO_RATE_LIMIT = AimdRateLimiter(initial_rate=10 ** 6, max_rate=10 ** 6)
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, status_code: int = 200) -> None:
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+        self.elapsed = type('Elapsed', (), {'total_seconds': lambda self: 0.1})()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    yield cache
+    cache.close()
+
+
+def test_get_url_class_shouldTellListDetailAndAgencyPagesApart():
+    assert get_url_class(DETAIL_URL) == DETAIL_PAGE
+    assert get_url_class(
+        'https://tenantapp.com.au/Rentals/Agency/rwphillipIs') == AGENCY_PAGE
+    assert get_url_class(LIST_URL) == LIST_PAGE
+
+
+def test_get_whenPageCached_shouldReturnDecompressedBody(cache):
+    cache.put(DETAIL_URL, b'<html>detail</html>')
+    assert cache.get(DETAIL_URL) == b'<html>detail</html>'
+    assert cache.get(LIST_URL) is None
+    assert cache.num_hits == 1
+    assert cache.num_misses == 1
+
+
+def test_get_whenOlderThanTtl_shouldReturnNoneUnlessOffline(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls={DETAIL_PAGE: 0})
+    cache.put(DETAIL_URL, b'<html>detail</html>')
+    time.sleep(0.01)
+    assert cache.get(DETAIL_URL) is None
+    assert cache.num_stale == 1
+
+    cache.offline = True
+    assert cache.get(DETAIL_URL) == b'<html>detail</html>'
+    cache.close()
+
+
+def test_put_whenSameBodyForTwoUrls_shouldStoreItOnce(cache):
+    cache.put(DETAIL_URL, b'<html>same</html>')
+    cache.put(LIST_URL, b'<html>same</html>')
+    num_bodies = cache.connection.execute(
+        "SELECT COUNT(*) FROM bodies").fetchone()[0]
+    assert num_bodies == 1
+
+
+def test_put_whenOverSizeBudget_shouldEvictLeastRecentlyUsedUrl(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put('https://tenantapp.com.au/Rentals/ViewListing/1', b'1' * 1000)
+    cache.put('https://tenantapp.com.au/Rentals/ViewListing/2', b'2' * 1000)
+    cache.get('https://tenantapp.com.au/Rentals/ViewListing/1')
+    cache.max_bytes = cache.get_size()
+    cache.put('https://tenantapp.com.au/Rentals/ViewListing/3', b'3' * 1000)
+
+    assert cache.num_evictions == 1
+    assert cache.get('https://tenantapp.com.au/Rentals/ViewListing/2') is None
+    assert cache.get('https://tenantapp.com.au/Rentals/ViewListing/1') == b'1' * 1000
+    cache.close()
+
+
+def test_put_whenUrlRefetchedWithNewBody_shouldDeleteOldBodyOnlyOnceUnused(cache, tmp_path):
+    cache.put(DETAIL_URL, b'<html>old</html>')
+    cache.put(LIST_URL, b'<html>old</html>')
+    cache.put(DETAIL_URL, b'<html>new</html>')
+    # Still used by the list page
+    assert cache.connection.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 2
+
+    cache.put(LIST_URL, b'<html>new</html>')
+    assert cache.connection.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 1
+    assert len(list((tmp_path / 'bodies').rglob('*' + cache.suffix))) == 1
+
+
+def test_get_size_shouldMatchBodiesOnDiskAcrossPutsEvictionsAndReopen(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 9)
+    for i in range(5):
+        cache.put('https://tenantapp.com.au/Rentals/ViewListing/{0}'.format(i), str(i).encode() * 1000)
+    cache.put('https://tenantapp.com.au/Rentals/ViewListing/0', b'changed' * 100)
+    cache.max_bytes = cache.get_size() // 2
+    cache.put('https://tenantapp.com.au/Rentals/ViewListing/5', b'5' * 1000)
+
+    size_in_index = cache.connection.execute("SELECT SUM(size) FROM bodies").fetchone()[0]
+    assert cache.num_evictions > 0
+    assert cache.get_size() == size_in_index <= cache.max_bytes
+    cache.close()
+    assert ResponseCache(str(tmp_path)).get_size() == size_in_index
+
+
+def test_get_content_whenCached_shouldNotSendRequest(mocker, cache):
+    mock_get = mocker.patch("src.common.http_client.requests.get",
+                            return_value=FakeResponse(b'<html>detail</html>'))
+    client = HttpClient(cache, RetryPolicy(base_delay=0), NO_RATE_LIMIT)
+
+    assert client.get_content(DETAIL_URL) == b'<html>detail</html>'
+    assert client.get_content(DETAIL_URL) == b'<html>detail</html>'
+    assert mock_get.call_count == 1
+
+
+def test_get_content_whenErrorStatus_shouldNotCacheResponse(mocker, cache):
+    mocker.patch("src.common.http_client.requests.get",
+                 return_value=FakeResponse(b'<html>error</html>', 500))
+    HttpClient(cache, RetryPolicy(base_delay=0), NO_RATE_LIMIT).get_content(DETAIL_URL)
+    assert cache.get(DETAIL_URL) is None
+
+
+def test_get_content_whenOfflineAndNotCached_shouldNotSendRequest(mocker, cache):
+    mock_get = mocker.patch("src.common.http_client.requests.get")
+    cache.offline = True
+
+    assert HttpClient(cache, RetryPolicy(base_delay=0), NO_RATE_LIMIT).get_content(DETAIL_URL) is None
+    assert mock_get.call_count == 0
@@ -0,0 +1,171 @@
+import pytest
+import requests
+from bs4.builder import ParserRejectedMarkup
+
+from src.common.retry_policy import (
+    GIVE_UP,
+    PARSE_ERROR,
+    RETRY,
+    SUCCESS,
+    THROTTLED,
+    CircuitBreaker,
+    IncompletePageError,
+    RetryPolicy
+)
+
+URL = 'https://tenantapp.com.au/Rentals/ViewListing/3811184'
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict = None) -> None:
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+
+
+@pytest.fixture
+def mock_sleep(mocker):
+    return mocker.patch("src.common.retry_policy.time.sleep")
+
+
+def attempts_returning(*outcomes):
+    """attempt_fn giving back each outcome in turn, raising it if it's an exception"""
+    remaining = list(outcomes)
+
+    def attempt(timeout):
+        outcome = remaining.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, 'body {0}'.format(outcome.status_code)
+    return attempt
+
+
+def test_classify_status_shouldSplitSuccessThrottledGiveUpAndRetry():
+    assert RetryPolicy.classify_status(200) == SUCCESS
+    assert RetryPolicy.classify_status(429) == THROTTLED
+    assert RetryPolicy.classify_status(503) == THROTTLED
+    assert RetryPolicy.classify_status(404) == GIVE_UP
+    assert RetryPolicy.classify_status(410) == GIVE_UP
+    assert RetryPolicy.classify_status(500) == RETRY
+    assert RetryPolicy.classify_status(502) == RETRY
+
+
+def test_classify_exception_shouldSplitNetworkUrlAndParseErrors():
+    assert RetryPolicy.classify_exception(requests.exceptions.Timeout()) == RETRY
+    assert RetryPolicy.classify_exception(requests.exceptions.ConnectionError()) == RETRY
+    assert RetryPolicy.classify_exception(requests.exceptions.ChunkedEncodingError()) == RETRY
+    assert RetryPolicy.classify_exception(requests.exceptions.MissingSchema()) == GIVE_UP
+    assert RetryPolicy.classify_exception(requests.exceptions.InvalidURL()) == GIVE_UP
+    assert RetryPolicy.classify_exception(IncompletePageError()) == PARSE_ERROR
+    assert RetryPolicy.classify_exception(ParserRejectedMarkup("bad")) == PARSE_ERROR
+    assert RetryPolicy.classify_exception(
+        UnicodeDecodeError('utf-8', b'\xff', 0, 1, 'invalid start byte')) == PARSE_ERROR
+
+
+def test_run_whenServerErrorThenSuccess_shouldRetryAndReturnValue(mock_sleep):
+    policy = RetryPolicy(base_delay=0)
+    value = policy.run(URL, attempts_returning(
+        FakeResponse(500), requests.exceptions.Timeout(), FakeResponse(200)), 15)
+
+    assert value == 'body 200'
+    assert policy.counters['attempts'] == 3
+    assert policy.counters['retries'] == 2
+    assert policy.reasons == {'HTTP 500': 1, 'Timeout': 1}
+
+
+def test_run_when404_shouldGiveUpWithoutRetrying(mock_sleep):
+    policy = RetryPolicy()
+    value = policy.run(URL, attempts_returning(FakeResponse(404)), 15)
+
+    assert value is None
+    assert policy.counters['attempts'] == 1
+    assert policy.counters['gave_up'] == 1
+    assert mock_sleep.call_count == 0
+
+
+def test_run_whenParseErrorTwice_shouldGiveUpAfterOneRetry(mock_sleep):
+    policy = RetryPolicy(base_delay=0, max_parse_retries=1)
+    value = policy.run(URL, attempts_returning(
+        IncompletePageError(), IncompletePageError(), FakeResponse(200)), 15)
+
+    assert value is None
+    assert policy.counters['attempts'] == 2
+    assert policy.counters['parse_errors'] == 2
+    assert policy.counters['gave_up'] == 1
+
+
+def test_run_whenAlwaysFailing_shouldStopAtMaxAttempts(mock_sleep):
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    value = policy.run(URL, attempts_returning(*[FakeResponse(500)] * 3), 15)
+
+    assert value is None
+    assert policy.counters['attempts'] == 3
+    assert policy.counters['attempts_exhausted'] == 1
+
+
+def test_run_whenBackoffWouldPassDeadline_shouldStop(mock_sleep):
+    policy = RetryPolicy(base_delay=10, max_delay=10, url_deadline=5)
+    policy.random.uniform = lambda low, high: high
+    value = policy.run(URL, attempts_returning(FakeResponse(500), FakeResponse(200)), 15)
+
+    assert value is None
+    assert policy.counters['attempts'] == 1
+    assert policy.counters['deadline_exceeded'] == 1
+    assert mock_sleep.call_count == 0
+
+
+def test_run_whenRetryAfterSent_shouldWaitThatLong(mock_sleep):
+    policy = RetryPolicy(breaker=CircuitBreaker(threshold=10))
+    value = policy.run(URL, attempts_returning(
+        FakeResponse(429, {'Retry-After': '7'}), FakeResponse(200)), 15)
+
+    assert value == 'body 200'
+    mock_sleep.assert_called_once_with(7.0)
+
+
+def test_get_retry_after_whenHttpDate_shouldIgnoreIt():
+    assert RetryPolicy.get_retry_after(FakeResponse(
+        429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) is None
+    assert RetryPolicy.get_retry_after(None) is None
+
+
+def test_get_backoff_shouldStayWithinCappedExponentialWindow():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    for attempt in range(10):
+        assert 0 <= policy.get_backoff(attempt) <= min(5, 2 ** attempt)
+    assert policy.get_backoff(0, retry_after=100) == 5
+
+
+def test_record_throttled_whenThresholdReached_shouldTripAndDoubleCooldown(mocker, mock_sleep):
+    mocker.patch("src.common.retry_policy.time.monotonic", return_value=1000.0)
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+
+    breaker.record_throttled('tenantapp.com.au')
+    assert breaker.total_trips == 0
+    breaker.record_throttled('tenantapp.com.au')
+    assert breaker.total_trips == 1
+    assert breaker.open_until['tenantapp.com.au'] == 1010.0
+    assert breaker.wait_until_closed('tenantapp.com.au') == 10.0
+    assert breaker.wait_until_closed('other.com.au') == 0.0
+
+    breaker.record_throttled('tenantapp.com.au')
+    breaker.record_throttled('tenantapp.com.au')
+    assert breaker.total_trips == 2
+    assert breaker.open_until['tenantapp.com.au'] == 1020.0
+
+
+def test_record_success_shouldResetThrottledCountAndCooldown(mocker):
+    mocker.patch("src.common.retry_policy.time.monotonic", return_value=1000.0)
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+
+    breaker.record_throttled('tenantapp.com.au')
+    breaker.record_success('tenantapp.com.au')
+    breaker.record_throttled('tenantapp.com.au')
+    assert breaker.total_trips == 0
+
+    breaker.record_throttled('tenantapp.com.au')
+    breaker.record_success('tenantapp.com.au')
+    breaker.record_throttled('tenantapp.com.au')
+    breaker.record_throttled('tenantapp.com.au')
+    assert breaker.total_trips == 2
+    # Back to the base cooldown since the host answered in between
+    assert breaker.open_until['tenantapp.com.au'] == 1010.0
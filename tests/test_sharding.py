@@ -0,0 +1,28 @@
+import pytest
+
+from src.common.sharding import Shard
+
+
+def test_owns_whenManyShards_shouldGiveEachKeyToExactlyOneShard():
+    shards = [Shard(index, 4) for index in range(4)]
+    property_ids = [str(3800000 + i) for i in range(1000)]
+    for property_id in property_ids:
+        assert sum(shard.owns(property_id) for shard in shards) == 1
+    # Roughly even split
+    for shard in shards:
+        assert 150 < sum(shard.owns(property_id) for property_id in property_ids) < 350
+
+
+def test_owns_shouldBeSameAcrossProcesses():
+    # crc32('3811184') % 4, unlike hash() which changes with PYTHONHASHSEED
+    assert [Shard(index, 4).owns('3811184') for index in range(4)] == [False, False, True, False]
+
+
+def test_owns_whenSingleShard_shouldOwnEverything():
+    assert Shard().owns('3811184') == True
+    assert Shard().name == ""
+
+
+def test_init_whenIndexOutOfRange_shouldRaiseValueError():
+    with pytest.raises(ValueError):
+        Shard(2, 2)
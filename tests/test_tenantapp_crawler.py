@@ -1,4 +1,6 @@
+import time
 import pytest
+from types import SimpleNamespace
 import pandas as pd
 import src
 from typing import List
@@ -10,6 +12,8 @@ from src.property_database import PropertyDatabase
 from src.tenantapp_crawler import TenantAppCrawler
 from src.property_dataclass import PropertyListing
 from src.input_html_extractor import InputHtmlExtractor
+from src.common.sharding import Shard
+from src.common.checkpoint import CheckpointJournal, FullSweepSchedule
 
 # Ref: using mock in pytest https://medium.com/analytics-vidhya/how-to-use-pytest-mock-to-simulate-responses-1ea41e964161
 # https://blogs.sap.com/2022/02/16/how-to-write-independent-unit-test-with-pytest-and-mock-techniques/
@@ -32,6 +36,8 @@ def create_transformer_with_property_list_html():
 def setup_helper(mocker):
     mocker.patch("src.property_database.PropertyDatabase.__init__",
                  return_value=None)
+    mocker.patch("src.property_database.PropertyDatabase.has_card_fingerprint",
+                 return_value=True)
     db = PropertyDatabase()
     transformer: Transformer = create_transformer_with_property_list_html()
     crawler: TenantAppCrawler = TenantAppCrawler(db=db)
@@ -149,6 +155,25 @@ def test_collect_data_for_all_properties_whenListingNotExisted_andDetailPageFail
     assert mock_save_single.call_count == 0
 
 
+def test_collect_data_for_all_properties_shouldRecordStageMetrics(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    cards = transformer.get_all_properties()[:2]
+    existing_row = SimpleNamespace(
+        card_fingerprint=crawler.collect_info_from_list_page(transformer, cards[1]).card_fingerprint)
+    mocker.patch("src.property_database.PropertyDatabase.select_with_same_id",
+                 side_effect=[[], [existing_row], [existing_row]])
+    mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url', return_value=SINGLE_PROPERTY_PAGE_HTML)
+    mocker.patch('src.property_database.PropertyDatabase.save_single')
+    crawler.collect_data_for_all_properties(cards, transformer)
+
+    assert crawler.metrics.histograms['existence_check'].count == 2
+    assert crawler.metrics.histograms['extract'].count == 1
+    assert crawler.metrics.histograms['db_write'].count == 1
+    assert crawler.metrics.counters == {'listings_seen': 2, 'listings_skipped': 1, 'listings_saved': 1}
+
+
 def test_is_property_data_existed_whenAtLeastOneEntryWithSamePropertyIdAndOffMarketFlag_shouldReturnTrue(mocker, setup_helper):
     crawler: TenantAppCrawler = setup_helper[1]
     mocker.patch("src.property_database.PropertyDatabase.select_with_same_id",
@@ -163,3 +188,435 @@ def test_is_property_data_existed_whenNoEntryWithSamePropertyIdAndOffMarketFlag_
                  return_value=[])
     existed: bool = crawler.is_property_data_existed('fake_id')
     assert existed == False
+
+
+def test_collect_data_for_all_properties_whenFetchedConcurrently_shouldSaveInListingOrder(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), concurrency=4)
+    crawler.fetcher.per_host_delay = 0
+    property_listings: List[str] = ['1', '2', '3', '4', '5']
+
+    def fake_list_page(transformer, listing):
+        data: PropertyListing = PropertyListing()
+        data.property_id = listing
+        data.property_url = listing
+        return data
+
+    def fake_request(url):
+        # Earlier listings take longer so their detail pages arrive last
+        time.sleep(0.05 * (5 - int(url)))
+        return url
+
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_list_page",
+                 side_effect=fake_list_page)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                 side_effect=fake_request)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_detail_page",
+                 side_effect=lambda transformer, html, data: data)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    crawler.collect_data_for_all_properties(property_listings, None)
+
+    saved_ids = [call.args[0].property_id for call in mock_save_single.call_args_list]
+    assert saved_ids == property_listings
+
+
+def test_is_property_data_existed_whenKnownIdsLoaded_shouldNotQueryDb(mocker, setup_helper):
+    crawler: TenantAppCrawler = setup_helper[1]
+    mocker.patch("src.property_database.PropertyDatabase.select_on_market_card_fingerprints",
+                 return_value=iter([('3811184', None)]))
+    mock_select_with_same_id = mocker.patch(
+        "src.property_database.PropertyDatabase.select_with_same_id")
+    crawler.load_known_property_ids('vic-rental-properties')
+
+    assert crawler.is_property_data_existed('3811184') == True
+    assert crawler.is_property_data_existed('fake_id') == False
+    assert mock_select_with_same_id.call_count == 0
+
+
+def test_collect_data_for_all_properties_whenKnownIdsLoaded_shouldAddSavedListing(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    mocker.patch("src.property_database.PropertyDatabase.select_on_market_card_fingerprints",
+                 return_value=iter([]))
+    crawler.load_known_property_ids('vic-rental-properties')
+    mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url', return_value=SINGLE_PROPERTY_PAGE_HTML)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    crawler.collect_data_for_all_properties(
+        [SINGLE_PROPERTY_CARD_HTML, SINGLE_PROPERTY_CARD_HTML], transformer)
+
+    assert mock_save_single.call_count == 1
+    assert crawler.is_property_data_existed('3811184') == True
+
+
+def load_card_fingerprints(mocker, crawler: TenantAppCrawler, rows: list) -> None:
+    mocker.patch("src.property_database.PropertyDatabase.select_on_market_card_fingerprints",
+                 return_value=iter(rows))
+    crawler.load_known_property_ids('vic-rental-properties')
+
+
+def test_collect_data_for_all_properties_whenCardUnchanged_shouldNotFetchDetailPage(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    load_card_fingerprints(mocker, crawler, [('3811184', setup_helper[2].card_fingerprint)])
+    mock_request_html_from_url = mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url')
+    mock_update_card_fields = mocker.patch('src.property_database.PropertyDatabase.update_card_fields')
+    crawler.collect_data_for_all_properties([SINGLE_PROPERTY_CARD_HTML], transformer)
+
+    assert mock_request_html_from_url.call_count == 0
+    assert mock_update_card_fields.call_count == 0
+    assert crawler.metrics.counters == {'listings_seen': 1, 'listings_skipped': 1}
+
+
+def test_collect_data_for_all_properties_whenCardChanged_shouldRecordCardAndUpdateEntry(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    load_card_fingerprints(mocker, crawler, [('3811184', '0123456789abcdef')])
+    mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url', return_value=SINGLE_PROPERTY_PAGE_HTML)
+    mock_update_card_fields = mocker.patch('src.property_database.PropertyDatabase.update_card_fields')
+    mock_update_listing_details = mocker.patch('src.property_database.PropertyDatabase.update_listing_details')
+    mock_save_single = mocker.patch('src.property_database.PropertyDatabase.save_single')
+    crawler.collect_data_for_all_properties([SINGLE_PROPERTY_CARD_HTML], transformer)
+
+    card = mock_update_card_fields.call_args.args[0]
+    assert card['price'] == '$390pw'
+    assert card['card_fingerprint'] == setup_helper[2].card_fingerprint
+    assert mock_update_listing_details.call_args.args[0].listing_title is not None
+    assert mock_save_single.call_count == 0
+    assert crawler.known_property_ids.get_status(
+        '3811184', setup_helper[2].card_fingerprint) == 'unchanged'
+    assert crawler.metrics.counters == {'listings_seen': 1, 'listings_changed': 1, 'listings_updated': 1}
+
+
+def test_collect_data_for_all_properties_whenEntryHasNoFingerprint_shouldStoreItWithoutFetching(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    load_card_fingerprints(mocker, crawler, [('3811184', None)])
+    mock_request_html_from_url = mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url')
+    mock_update_card_fields = mocker.patch('src.property_database.PropertyDatabase.update_card_fields')
+    mock_update_card_fingerprint = mocker.patch('src.property_database.PropertyDatabase.update_card_fingerprint')
+    crawler.collect_data_for_all_properties([SINGLE_PROPERTY_CARD_HTML], transformer)
+
+    assert mock_request_html_from_url.call_count == 0
+    assert mock_update_card_fields.call_count == 0
+    mock_update_card_fingerprint.assert_called_once_with('3811184', setup_helper[2].card_fingerprint)
+    assert crawler.metrics.counters['card_fingerprints_backfilled'] == 1
+
+
+def test_collect_data_for_all_properties_whenNoFingerprintColumn_shouldSkipKnownListingsUntouched(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    crawler: TenantAppCrawler = setup_helper[1]
+    mocker.patch("src.property_database.PropertyDatabase.has_card_fingerprint",
+                 return_value=False)
+    mock_select_fingerprints = mocker.patch(
+        "src.property_database.PropertyDatabase.select_on_market_card_fingerprints")
+    mocker.patch("src.property_database.PropertyDatabase.select_on_market_property_ids",
+                 return_value=iter(['3811184']))
+    crawler.load_known_property_ids('vic-rental-properties')
+    mock_request_html_from_url = mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url')
+    mock_update_card_fingerprint = mocker.patch('src.property_database.PropertyDatabase.update_card_fingerprint')
+    crawler.collect_data_for_all_properties([SINGLE_PROPERTY_CARD_HTML], transformer)
+
+    assert mock_select_fingerprints.call_count == 0
+    assert mock_request_html_from_url.call_count == 0
+    assert mock_update_card_fingerprint.call_count == 0
+    assert crawler.metrics.counters == {'listings_seen': 1, 'listings_skipped': 1}
+
+
+def test_collect_data_for_all_properties_whenWriteBatchSizeSet_shouldSaveInBulkOnceDone(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    transformer: Transformer = create_transformer_with_property_list_html()
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), write_batch_size=10)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url', return_value=SINGLE_PROPERTY_PAGE_HTML)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    mock_save_bulk = mocker.patch(
+        'src.property_database.PropertyDatabase.save_bulk')
+    crawler.collect_data_for_all_properties(
+        transformer.get_all_properties(), transformer)
+
+    assert mock_save_single.call_count == 0
+    assert mock_save_bulk.call_count == 1
+    assert len(mock_save_bulk.call_args.args[0]) == 10
+    crawler.write_buffer.close()
+
+
+def test_collect_data_for_all_properties_whenWriteBatchSizeSet_shouldOnlyJournalListingsOnceSaved(mocker, tmp_path):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    transformer: Transformer = create_transformer_with_property_list_html()
+    checkpoint = CheckpointJournal('tenantapp_crawler-vic', directory=str(tmp_path))
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), write_batch_size=100, checkpoint=checkpoint)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch(
+        'src.tenantapp_crawler.TenantAppCrawler.request_html_from_url', return_value=SINGLE_PROPERTY_PAGE_HTML)
+    journaled_at_flush = []
+    mocker.patch('src.property_database.PropertyDatabase.save_bulk',
+                 side_effect=lambda data: journaled_at_flush.append(len(checkpoint.finished_urls)))
+    crawler.collect_data_for_all_properties(
+        transformer.get_all_properties()[:3], transformer)
+
+    # Nothing is journaled before its batch is in the DB, so a killed run doesn't skip it when resuming
+    assert journaled_at_flush == [0]
+    assert len(checkpoint.finished_urls) == 3
+    crawler.write_buffer.close()
+    checkpoint.close()
+
+
+def test_collect_data_for_all_pages_whenPageFailsOnce_shouldRetryItAndSaveEveryListing(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), concurrency=2, page_window=2)
+    crawler.fetcher.per_host_delay = 0
+    page_urls: List[str] = ['page1', 'page2', 'page3']
+    failed_once = set()
+
+    def fake_request(url):
+        if url == 'page2' and url not in failed_once:
+            failed_once.add(url)
+            return None
+        if url.startswith('page'):
+            return url
+        return SINGLE_PROPERTY_PAGE_HTML
+
+    def fake_list_page(transformer, listing):
+        data: PropertyListing = PropertyListing()
+        data.property_id = listing
+        data.property_url = 'detail/' + listing
+        return data
+
+    # Page 3 shows listing 2b again, which should only be saved once
+    listings = {'page1': ['1a', '1b'], 'page2': ['2a', '2b'], 'page3': ['2b', '3a']}
+    mocker.patch("src.transformer.Transformer.get_all_properties", autospec=True,
+                 side_effect=lambda transformer: listings[transformer.extractor.get_raw_html()])
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                 side_effect=fake_request)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_list_page",
+                 side_effect=fake_list_page)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_detail_page",
+                 side_effect=lambda transformer, html, data: data)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    failed_pages = crawler.collect_data_for_all_pages(page_urls)
+
+    saved_ids = [call.args[0].property_id for call in mock_save_single.call_args_list]
+    assert failed_pages == []
+    assert sorted(saved_ids) == ['1a', '1b', '2a', '2b', '3a']
+
+
+def test_collect_data_for_all_pages_whenPageHoldsEarlierPages_shouldOnlyCollectNewListings(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), concurrency=2, page_window=2)
+    crawler.fetcher.per_host_delay = 0
+    # "Load more" pagination, page k holds 10 listings of each page 1 to k, the last one is short
+    listings = {'page{0}'.format(k): ['{0}-{1}'.format(page, i)
+                                      for page in range(1, k + 1) for i in range(10 if page < 3 else 4)]
+                for k in range(1, 4)}
+
+    def fake_list_page(transformer, listing):
+        data: PropertyListing = PropertyListing()
+        data.property_id = listing
+        data.property_url = 'detail/' + listing
+        return data
+
+    mocker.patch("src.transformer.Transformer.get_all_properties", autospec=True,
+                 side_effect=lambda transformer: listings[transformer.extractor.get_raw_html()])
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                 side_effect=lambda url: url if url.startswith('page') else SINGLE_PROPERTY_PAGE_HTML)
+    mock_list_page = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_list_page",
+                                  side_effect=fake_list_page)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_detail_page",
+                 side_effect=lambda transformer, html, data: data)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    failed_pages = crawler.collect_data_for_all_pages(list(listings))
+
+    saved_ids = [call.args[0].property_id for call in mock_save_single.call_args_list]
+    assert failed_pages == []
+    assert sorted(saved_ids) == sorted(listings['page3'])
+    # 10 + 10 + the last 10 of page 3, instead of 10 + 20 + 24
+    assert mock_list_page.call_count == 30
+
+
+def test_collect_data_for_all_pages_whenPageAlwaysFails_shouldReturnIt(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), max_page_retries=1)
+    crawler.fetcher.per_host_delay = 0
+    mock_request = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                                return_value=None)
+    failed_pages = crawler.collect_data_for_all_pages(['page1'])
+
+    assert failed_pages == ['page1']
+    assert mock_request.call_count == 2
+
+
+def test_run_whenPaginatedAndPageFails_shouldReturnFalse(mocker, setup_helper):
+    crawler: TenantAppCrawler = setup_helper[1]
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.load_known_property_ids")
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.construct_page_urls",
+                 return_value=['page1', 'page2'])
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_data_for_all_pages",
+                 return_value=['page2'])
+
+    assert crawler.run('vic-rental-properties', paginated=True) == False
+
+
+def test_run_delta_whenKnownListingsInARow_shouldStopAndRecordAvoidedWork(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), page_window=1, delta_stop_after=3)
+    crawler.fetcher.per_host_delay = 0
+    crawler.num_listings = 10
+    # Newest listings first, the known ones start on page 2
+    listings = {'page1': ['n1', 'n2'], 'page2': ['k1', 'k2'], 'page3': ['k3', 'k4'],
+                'page4': ['k5', 'k6'], 'page5': ['k7', 'k8']}
+
+    def fake_list_page(transformer, listing):
+        data: PropertyListing = PropertyListing()
+        data.property_id = listing
+        data.property_url = 'detail/' + listing
+        return data
+
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.construct_page_urls", return_value=list(listings))
+    mocker.patch("src.transformer.Transformer.get_all_properties", autospec=True,
+                 side_effect=lambda transformer: listings[transformer.extractor.get_raw_html()])
+    mock_request = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                                side_effect=lambda url: url)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_list_page",
+                 side_effect=fake_list_page)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.get_card_status",
+                 side_effect=lambda data: 'new' if data.property_id.startswith('n') else 'unchanged')
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_detail_page",
+                 side_effect=lambda transformer, html, data: data)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+
+    assert crawler.run_delta('vic-rental-properties') == True
+    assert [call.args[0].property_id for call in mock_save_single.call_args_list] == ['n1', 'n2']
+    assert [call.args[0] for call in mock_request.call_args_list
+            if call.args[0].startswith('page')] == ['page1', 'page2', 'page3']
+    assert crawler.metrics.counters['list_pages_avoided'] == 2
+    assert crawler.metrics.counters['listings_avoided'] == 5
+
+
+def test_run_whenDeltaAndFullSweepDue_shouldCrawlEverythingOnceThenGoBackToDelta(mocker, setup_helper, tmp_path):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    full_sweep = FullSweepSchedule('tenantapp_crawler-vic', interval_hours=24, directory=str(tmp_path))
+    crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), delta_stop_after=50, full_sweep=full_sweep)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.load_known_property_ids")
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.construct_url_with_pagination",
+                 return_value='https://tenantapp.com.au/Rentals/vic-rental-properties?page=3#List')
+    mock_request_html_from_url = mocker.patch(
+        "src.tenantapp_crawler.TenantAppCrawler.request_html_from_url", return_value=PROPERTY_LIST_HTML)
+    mock_collect_data = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_data_for_all_properties")
+    mock_run_paginated = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.run_paginated", return_value=True)
+    mock_run_delta = mocker.patch("src.tenantapp_crawler.TenantAppCrawler.run_delta", return_value=True)
+
+    # The sweep reads the final page only, paginating would cost N^2 list pages
+    assert crawler.run('vic-rental-properties', paginated=True) == True
+    assert mock_request_html_from_url.call_count == 1
+    assert mock_collect_data.call_count == 1
+    assert mock_run_paginated.call_count == 0
+    assert mock_run_delta.call_count == 0
+    assert full_sweep.is_due() == False
+
+    assert crawler.run('vic-rental-properties') == True
+    assert mock_run_delta.call_count == 1
+    assert crawler.metrics.counters['full_sweeps'] == 1
+
+
+def test_collect_data_for_all_properties_whenParseWorkersSet_shouldSaveSameDataAsInProcess(mocker, setup_helper):
+    transformer: Transformer = setup_helper[0]
+    in_process_crawler: TenantAppCrawler = setup_helper[1]
+    pipeline_crawler: TenantAppCrawler = TenantAppCrawler(
+        db=PropertyDatabase(), parse_workers=2)
+    with open('tests/html/single_property_page.html', 'rb') as file:
+        detail_page: bytes = file.read()
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch("src.common.http_client.HttpClient.get_content",
+                 return_value=detail_page)
+    mocker.patch("src.common.http_client.HttpClient.get_html",
+                 side_effect=lambda url, parse_fn: parse_fn(detail_page))
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    in_process_crawler.collect_data_for_all_properties(
+        [SINGLE_PROPERTY_CARD_HTML], transformer)
+    try:
+        pipeline_crawler.collect_data_for_all_properties(
+            [SINGLE_PROPERTY_CARD_HTML], transformer)
+    finally:
+        pipeline_crawler.parse_pool.shutdown()
+
+    assert mock_save_single.call_count == 2
+    in_process_data = mock_save_single.call_args_list[0].args[0].to_dict()
+    pipeline_data = mock_save_single.call_args_list[1].args[0].to_dict()
+    for date_field in ('data_collection_date', 'ad_posted_date'):
+        in_process_data.pop(date_field)
+        pipeline_data.pop(date_field)
+    assert pipeline_data['listing_title'] is not None
+    assert pipeline_data == in_process_data
+    assert pipeline_crawler.metrics.histograms['extract'].count == 1
+
+
+def test_collect_data_for_all_properties_whenSharded_shouldOnlyScrapeOwnedListings(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    shards = [Shard(index, 2) for index in range(2)]
+    property_listings: List[str] = [str(i) for i in range(20)]
+
+    def fake_list_page(transformer, listing):
+        data: PropertyListing = PropertyListing()
+        data.property_id = listing
+        data.property_url = listing
+        return data
+
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_list_page",
+                 side_effect=fake_list_page)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.is_property_data_existed",
+                 return_value=False)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.request_html_from_url",
+                 side_effect=lambda url: url)
+    mocker.patch("src.tenantapp_crawler.TenantAppCrawler.collect_info_from_detail_page",
+                 side_effect=lambda transformer, html, data: data)
+    mock_save_single = mocker.patch(
+        'src.property_database.PropertyDatabase.save_single')
+    for shard in shards:
+        crawler: TenantAppCrawler = TenantAppCrawler(
+            db=PropertyDatabase(), shard=shard)
+        crawler.fetcher.per_host_delay = 0
+        crawler.collect_data_for_all_properties(property_listings, None)
+
+    saved_ids = [call.args[0].property_id for call in mock_save_single.call_args_list]
+    assert sorted(saved_ids) == sorted(property_listings)
+    assert 0 < shards[0].num_processed < 20
+    assert shards[0].num_processed + shards[1].num_processed == 20
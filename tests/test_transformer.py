@@ -1,3 +1,4 @@
+import copy
 import pytest
 import src
 from typing import List
@@ -192,3 +193,52 @@ def test_get_agency_address_shouldReturnCorrectAgencyAddress():
     name = 'Barry Plant (Mitchell Shire)'
     addr: str = transformer.get_agency_address(banner, name)
     assert addr == '147 Powlett Street, Kilmore, VIC 3764'
+
+
+"""
+Test extracting all detail page fields in one traversal
+"""
+def collect_detail_page_fields_with_getters(html: BeautifulSoup) -> dict:
+    return {
+        'listing_title': transformer.get_listing_title(html),
+        'listing_description': transformer.get_listing_description(html),
+        'num_bedrooms': transformer.get_num_bedrooms(html),
+        'num_bathrooms': transformer.get_num_bathrooms(html),
+        'num_garages': transformer.get_num_garages(html),
+        'property_features': transformer.get_property_features(html),
+        'google_maps_location_url': transformer.get_google_maps_location_url(html),
+        'gps_coordinates': transformer.get_gps_coordinates(html),
+        'suburb': transformer.get_suburb(html),
+        'state_and_territory': transformer.get_state_and_territory(html),
+        'postcode': transformer.get_postcode(html),
+        'agent_name': transformer.get_agent_name(html),
+        'off_market': transformer.get_off_market_status(html),
+    }
+
+
+def test_get_detail_page_fields_shouldMatchEachGetterFieldForField():
+    data: PropertyListing = transformer.get_detail_page_fields(
+        SINGLE_PROPERTY_PAGE_HTML, PropertyListing())
+    for field, value in collect_detail_page_fields_with_getters(SINGLE_PROPERTY_PAGE_HTML).items():
+        assert getattr(data, field) == value, field
+
+
+def test_get_detail_page_fields_whenAgencyDetailsOnPage_shouldMatchAgencyGetters():
+    page: BeautifulSoup = read_html_from_local_file(
+        'tests/html/single_property_page.html')
+    page.find('div', attrs={'class': 'agent-contact-card'}).append(
+        copy.copy(AGENCY_DETAILS_ON_PROPERTY_DETAIL_HTML.find('div')))
+    data: PropertyListing = transformer.get_detail_page_fields(
+        page, PropertyListing())
+    details = transformer.get_agency_details(page)
+    assert data.agency_name == transformer.get_agency_name_from_detail_page(page)
+    assert data.agency_address == transformer.get_agency_address_from_detail_page(
+        details, data.agency_name)
+    assert data.agency_name == "Boutique Property Agents Sydney"
+
+
+def test_get_detail_page_fields_whenNoAgencyDetailsOnPage_shouldLeaveAgencyFieldsUnset():
+    data: PropertyListing = transformer.get_detail_page_fields(
+        SINGLE_PROPERTY_PAGE_HTML, PropertyListing())
+    assert not hasattr(data, 'agency_name')
+    assert not hasattr(data, 'agency_address')
@@ -0,0 +1,158 @@
+import pytest
+
+from datetime import datetime
+
+from src.property_database import PropertyDatabase
+from src.common.checkpoint import CheckpointJournal
+from src.common.http_client import StreamResult
+from src.update_ad_removed_date import UpdateAdRemovedDate
+from src.off_market_probe import OffMarketProbe
+from src.transformer import Transformer
+from src.input_html_extractor import InputHtmlExtractor
+from src.update_ad_removed_date import OFF_MARKET_BANNER_BYTES
+from .test_off_market_probe import MARKER_ONLY_IN_STYLESHEET_PAGE, OFF_MARKET_PAGE, SINGLE_PROPERTY_PAGE
+
+
+def create_rows(urls: list) -> list:
+    return [{'property_url': url,
+             'property_id': url.split('/')[-1],
+             'ad_posted_date': datetime(2024, 1, 1)} for url in urls]
+
+
+@pytest.fixture
+def updater(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    return UpdateAdRemovedDate(PropertyDatabase())
+
+
+def test_update_ad_removed_date_whenBannerOnPage_shouldOnlyUpdateOffMarketListings(mocker, updater):
+    urls = {
+        'https://tenantapp.com.au/Rentals/ViewListing/1': SINGLE_PROPERTY_PAGE,
+        'https://tenantapp.com.au/Rentals/ViewListing/2': OFF_MARKET_PAGE,
+    }
+    mocker.patch("src.update_ad_removed_date.UpdateAdRemovedDate.get_properties_on_market",
+                 return_value=create_rows(urls))
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 side_effect=lambda url, detector, max_bytes: StreamResult(
+                     urls[url], False, True, len(urls[url]), 0, 0.1, 0.0))
+    mock_update = mocker.patch(
+        "src.property_database.PropertyDatabase.update_ad_removed_date")
+    updater.update_ad_removed_date('VIC')
+
+    assert mock_update.call_count == 1
+    assert mock_update.call_args.args[0] == '2'
+    assert mock_update.call_args.args[1] == True
+
+
+def test_update_ad_removed_date_whenBatchSizeSet_shouldUpdateInBulkOnceDone(mocker):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    updater = UpdateAdRemovedDate(PropertyDatabase(), update_batch_size=10)
+    urls = ['https://tenantapp.com.au/Rentals/ViewListing/{0}'.format(i) for i in range(3)]
+    mocker.patch("src.update_ad_removed_date.UpdateAdRemovedDate.get_properties_on_market",
+                 return_value=create_rows(urls))
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 return_value=StreamResult(OFF_MARKET_PAGE, True, True, len(OFF_MARKET_PAGE), 0, 0.1, 0.0))
+    mock_update = mocker.patch(
+        "src.property_database.PropertyDatabase.update_ad_removed_date")
+    mock_update_bulk = mocker.patch(
+        "src.property_database.PropertyDatabase.update_ad_removed_dates_bulk")
+    updater.update_ad_removed_date('VIC')
+
+    assert mock_update.call_count == 0
+    assert mock_update_bulk.call_count == 1
+    assert [property_id for property_id, _ in mock_update_bulk.call_args.args[0]] == ['0', '1', '2']
+
+
+def test_update_ad_removed_date_whenResumed_shouldStartAfterLastCheckedListing(mocker, tmp_path):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    url = 'https://tenantapp.com.au/Rentals/ViewListing/2'
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 return_value=StreamResult(SINGLE_PROPERTY_PAGE, False, True, len(SINGLE_PROPERTY_PAGE), 0, 0.1, 0.0))
+    mock_stream = mocker.patch("src.property_database.PropertyDatabase.stream_where_not_off_market",
+                               return_value=iter(create_rows([url])))
+    first_run = UpdateAdRemovedDate(PropertyDatabase(), checkpoint=CheckpointJournal(
+        'update_ad_removed_date-VIC', directory=str(tmp_path)))
+    # Stopped at the limit, so there may be more rows after it
+    first_run.update_ad_removed_date('VIC', limit=1)
+    assert mock_stream.call_args.kwargs['after'] is None
+
+    second_run = UpdateAdRemovedDate(PropertyDatabase(), checkpoint=CheckpointJournal(
+        'update_ad_removed_date-VIC', resume=True, directory=str(tmp_path)))
+    second_run.update_ad_removed_date('VIC')
+    assert mock_stream.call_args.kwargs['after'] == (datetime(2024, 1, 1), '2')
+
+
+def test_update_ad_removed_date_whenBatchSizeSet_shouldOnlyJournalListingsOnceFlushed(mocker, tmp_path):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    checkpoint = CheckpointJournal('update_ad_removed_date-VIC', directory=str(tmp_path))
+    updater = UpdateAdRemovedDate(PropertyDatabase(), update_batch_size=2, checkpoint=checkpoint)
+    urls = {
+        'https://tenantapp.com.au/Rentals/ViewListing/1': OFF_MARKET_PAGE,
+        'https://tenantapp.com.au/Rentals/ViewListing/2': SINGLE_PROPERTY_PAGE,
+        'https://tenantapp.com.au/Rentals/ViewListing/3': OFF_MARKET_PAGE,
+        'https://tenantapp.com.au/Rentals/ViewListing/4': OFF_MARKET_PAGE,
+    }
+    mocker.patch("src.update_ad_removed_date.UpdateAdRemovedDate.get_properties_on_market",
+                 return_value=create_rows(urls))
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 side_effect=lambda url, detector, max_bytes: StreamResult(
+                     urls[url], False, True, len(urls[url]), 0, 0.1, 0.0))
+    journaled_at_flush = []
+    mocker.patch("src.property_database.PropertyDatabase.update_ad_removed_dates_bulk",
+                 side_effect=lambda removed: journaled_at_flush.append(sorted(checkpoint.finished_urls)))
+    updater.update_ad_removed_date('VIC', limit=4)
+
+    # Listing 3 is in the first batch, so only 1 and 2 could be journaled by the time the last one is written
+    assert journaled_at_flush == [[], list(urls)[:2]]
+    assert checkpoint.finished_urls == set(urls)
+    assert checkpoint.last_key == (datetime(2024, 1, 1), '4')
+
+
+def test_request_off_market_status_whenMarkerOnlyInStylesheetBeforeBanner_shouldCheckWholePage(mocker, updater):
+    page = MARKER_ONLY_IN_STYLESHEET_PAGE.replace(
+        b'</body>', b'<div class="top-bar-limit">This property is off market</div></body>', 1)
+    streamed = page[:page.index(b'top-bar-limit') + len(b'top-bar-limit') + OFF_MARKET_BANNER_BYTES]
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 return_value=StreamResult(streamed, True, False, len(streamed), len(page) - len(streamed), 0.1, 0.1))
+    mock_get_content = mocker.patch(
+        "src.common.http_client.HttpClient.get_content", return_value=page)
+    probe = OffMarketProbe(Transformer(InputHtmlExtractor(None)))
+
+    assert updater.request_off_market_status(
+        'https://tenantapp.com.au/Rentals/ViewListing/1', probe) == True
+    assert mock_get_content.call_count == 1
+
+
+def test_request_off_market_status_whenStoppedAtMaxBytesWithoutMarker_shouldNotRefetch(mocker, updater):
+    streamed = SINGLE_PROPERTY_PAGE[:2048]
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 return_value=StreamResult(streamed, False, False, 2048, 0, 0.1, 0.0))
+    mock_get_content = mocker.patch(
+        "src.common.http_client.HttpClient.get_content")
+    probe = OffMarketProbe(Transformer(InputHtmlExtractor(None)))
+
+    assert updater.request_off_market_status(
+        'https://tenantapp.com.au/Rentals/ViewListing/1', probe) == False
+    assert mock_get_content.call_count == 0
+
+
+def test_update_ad_removed_date_whenAllRowsChecked_shouldEmptyJournalForNextPass(mocker, tmp_path):
+    mocker.patch("src.property_database.PropertyDatabase.__init__",
+                 return_value=None)
+    mocker.patch("src.common.http_client.HttpClient.stream_until",
+                 return_value=StreamResult(SINGLE_PROPERTY_PAGE, False, True, len(SINGLE_PROPERTY_PAGE), 0, 0.1, 0.0))
+    mock_stream = mocker.patch("src.property_database.PropertyDatabase.stream_where_not_off_market",
+                               side_effect=lambda *args, **kwargs: iter(create_rows(
+                                   ['https://tenantapp.com.au/Rentals/ViewListing/1'])))
+    first_run = UpdateAdRemovedDate(PropertyDatabase(), checkpoint=CheckpointJournal(
+        'update_ad_removed_date-VIC', directory=str(tmp_path)))
+    first_run.update_ad_removed_date('VIC', limit=2)
+
+    second_run = UpdateAdRemovedDate(PropertyDatabase(), checkpoint=CheckpointJournal(
+        'update_ad_removed_date-VIC', resume=True, directory=str(tmp_path)))
+    second_run.update_ad_removed_date('VIC', limit=2)
+    assert mock_stream.call_args.kwargs['after'] is None
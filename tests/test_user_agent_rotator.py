@@ -0,0 +1,61 @@
+import random
+import pytest
+from collections import Counter
+
+from src.common.user_agent_rotator import (
+    UserAgentPool,
+    get_random_user_agent,
+    get_user_agent_pool,
+)
+
+USER_AGENTS_CSV = """,User agent,Version,OS,Hardware Type,Popularity,Software,Software Type
+0,agent-windows,7.0,Windows,Computer,Very common,,
+1,agent-android,54.0,Android,Mobile - Phone,Uncommon,,
+2,agent-ios,40.1,iOS,Mobile - Tablet,Common,,
+3,agent-windows,7.0,Windows,Computer,Very common,,
+"""
+
+
+def create_pool(tmp_path) -> UserAgentPool:
+    file_name = tmp_path / 'user_agents.csv'
+    file_name.write_text(USER_AGENTS_CSV)
+    return UserAgentPool.from_csv(str(file_name))
+
+
+def test_from_csv_shouldDropDuplicatedAgents(tmp_path):
+    pool: UserAgentPool = create_pool(tmp_path)
+    assert len(pool) == 3
+
+
+def test_sample_shouldFollowPopularityWeights(tmp_path):
+    random.seed(0)
+    pool: UserAgentPool = create_pool(tmp_path)
+    counts = Counter(pool.sample() for _ in range(13000))
+    # Weights are 8 : 1 : 4
+    assert 7500 < counts['agent-windows'] < 8500
+    assert 700 < counts['agent-android'] < 1300
+    assert 3500 < counts['agent-ios'] < 4500
+
+
+def test_filter_whenHardwareTypeIsPrefix_shouldKeepAllMatchingAgents(tmp_path):
+    pool: UserAgentPool = create_pool(tmp_path)
+    mobile_pool: UserAgentPool = pool.filter(hardware_type='mobile')
+    assert set(mobile_pool.agents) == {'agent-android', 'agent-ios'}
+    assert pool.filter(hardware_type='mobile') is mobile_pool
+
+
+def test_filter_whenOsProvided_shouldOnlyKeepAgentsWithSameOs(tmp_path):
+    pool: UserAgentPool = create_pool(tmp_path)
+    assert pool.filter(os='iOS').agents == ('agent-ios',)
+
+
+def test_filter_whenNoAgentMatches_shouldRaiseClearError(tmp_path):
+    pool: UserAgentPool = create_pool(tmp_path)
+    with pytest.raises(ValueError, match="No user agent with hardware type 'Console' and OS 'iOS'"):
+        pool.filter(hardware_type='Console', os='iOS')
+
+
+def test_get_random_user_agent_shouldUseSharedPool():
+    assert get_user_agent_pool() is get_user_agent_pool()
+    headers = get_random_user_agent()
+    assert headers['User-Agent'] in get_user_agent_pool().agents